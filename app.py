@@ -1,11 +1,14 @@
 # app.py  — NEXA backend (Flask)
 
 from flasgger import Swagger
-from flask import Flask, request, jsonify, send_from_directory, send_file
+from flask import Flask, Response, request, jsonify, send_from_directory
 from flask_cors import CORS
 import os
 from dotenv import load_dotenv
 import datetime
+import gzip
+import hashlib
+import hmac
 import logging
 import sys
 import json
@@ -16,7 +19,11 @@ from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeou
 # NEW ADDITIONS: imports for PDF export, guardrails, are you human detection - no bots allowed, & file serving
 from backend.guardrails import check_input_guardrails, check_output_guardrails
 from backend.humanize_guard import score_request, handle_trust_score
-from backend.pdf_export import generate_chat_pdf
+from backend.pdf_export import render_chat_pdf, iter_pdf_chunks
+from backend.resilience import CircuitOpenError
+from backend.static_assets import StaticAssets
+from backend.state_sync import record_version, state_payload
+from backend.token_accounting import usage_snapshot
 
 # structured logging
 class JSONFormatter(logging.Formatter):
@@ -38,6 +45,7 @@ logger.addHandler(handler)
 # import AI agent directly
 from backend.ai_agent import get_response  # noqa: E402
 from backend.ai_agent import get_repository  # noqa: E402
+from backend.ai_agent import PRETTY_CAMPUS  # noqa: E402
 
 # ENV & PATHS
 ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -45,11 +53,12 @@ load_dotenv(os.path.join(ROOT_DIR, ".env"))
 REACT_DIST = os.path.join(ROOT_DIR, "frontend", "dist")
 
 # FLASK APP
+# Flask's own static route is disabled; the SPA is served from a startup manifest below.
 app = Flask(
     __name__,
-    static_folder=REACT_DIST,
-    static_url_path="/",
+    static_folder=None,
 )
+static_assets = StaticAssets(REACT_DIST)
 
 CORS(app, resources={
     r"/*": {"origins": [
@@ -96,6 +105,22 @@ _rate_hits = defaultdict(deque)
 AI_TIMEOUT_SECS = int(os.getenv("AI_TIMEOUT_SECS", "20"))
 _executor = ThreadPoolExecutor(max_workers=int(os.getenv("AI_MAX_WORKERS", "4")))
 
+# ADMIN (disabled unless a token is configured)
+ADMIN_API_TOKEN = os.getenv("ADMIN_API_TOKEN", "")
+ADMIN_MAX_PAGE_SIZE = int(os.getenv("ADMIN_MAX_PAGE_SIZE", "500"))
+ADMIN_MAX_DAYS = int(os.getenv("ADMIN_MAX_DAYS", "3650"))
+
+# RESPONSE COMPRESSION (JSON bodies at least this large are gzipped when accepted)
+GZIP_MIN_BYTES = int(os.getenv("GZIP_MIN_BYTES", "1024"))
+
+# HISTORY API
+HISTORY_MAX_PAGE_SIZE = int(os.getenv("HISTORY_MAX_PAGE_SIZE", "200"))
+
+# Database health breaker is open (see PostgresRepository._guard): fail fast instead of 500
+@app.errorhandler(CircuitOpenError)
+def database_unavailable(_e):
+    return jsonify({"error": "Database temporarily unavailable"}), 503, {"Retry-After": "10"}
+
 # HELPERS
 def new_session_id() -> str:
     return "sess_" + os.urandom(6).hex()
@@ -137,6 +162,32 @@ def rate_limit_or_429(session_id: str):
     q.append(now)
     return None
 
+def admin_auth_or_error():
+    if not ADMIN_API_TOKEN:
+        return jsonify({"error": "Not found"}), 404
+    token = request.headers.get("X-Admin-Token", "")
+    if not hmac.compare_digest(token.encode("utf-8"), ADMIN_API_TOKEN.encode("utf-8")):
+        guardrail_log("admin_auth_failed", "", {"client_ip": get_client_ip()})
+        return jsonify({"error": "Unauthorized"}), 401
+    return None
+
+def new_session_state() -> dict:
+    return {
+        "campuses": [],
+        "majors": [],
+        "completed_courses": [],
+        "completed_domains": [],
+        "categories": [],
+        # NEW ADDITION: chat history stored per session for PDF export and summary
+        "history": [],
+    }
+
+def parse_state_version(value):
+    try:
+        return int(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
 def get_response_with_timeout(user_prompt: str, session_state: dict, session_id: str):
     future = _executor.submit(get_response, user_prompt, session_state, session_id)
     return future.result(timeout=AI_TIMEOUT_SECS)
@@ -265,29 +316,30 @@ def handle_prompt():
         guardrail_log("captcha_required", session_id, {"flags": trust_flags, "score": trust_score})
         return jsonify({"captcha_required": True, "session_id": session_id}), 429
 
+    # state sync: clients send the state_version they last applied and get a delta back
+    client_state_version = parse_state_version(req_data.get("state_version"))
+    want_full_state = bool(req_data.get("full_state", False))
+
     # NEW ADDITIONS: Content guardrails - checks for profanity, abuse, crisis language, prompt injection, PII
     input_block = check_input_guardrails(user_prompt, session_id)
     if input_block:
         guardrail_log("input_blocked_by_guardrail", session_id, {"reason": input_block[:80]})
         if session_id not in sessions:
-            sessions[session_id] = {
-                "campuses": [], "completed_courses": [],
-                "completed_domains": [], "categories": [], "history": [],
-            }
+            sessions[session_id] = new_session_state()
+            record_version(session_id, sessions[session_id])
         sessions[session_id]["history"].append({"role": "user", "content": user_prompt})
         sessions[session_id]["history"].append({"role": "assistant", "content": input_block})
-        return jsonify({"response": input_block, "session_id": session_id}), 200
+        record_version(session_id, sessions[session_id])
+        return jsonify({
+            "response": input_block,
+            "session_id": session_id,
+            **state_payload(session_id, sessions[session_id], since=client_state_version, full=want_full_state),
+        }), 200
 
     # session init / retrieval
     if session_id not in sessions:
-        sessions[session_id] = {
-            "campuses": [],
-            "completed_courses": [],
-            "completed_domains": [],
-            "categories": [],
-            # NEW ADDITION: chat history stored per session for PDF export and summary
-            "history": [],
-        }
+        sessions[session_id] = new_session_state()
+        record_version(session_id, sessions[session_id])
 
     session_state = sessions[session_id]
 
@@ -321,13 +373,15 @@ def handle_prompt():
         # NEW ADDITION: saves the ai's reply to session history and persists for PDF export
         updated_state["history"].append({"role": "assistant", "content": formatted_response})
         sessions[session_id] = updated_state
+        record_version(session_id, updated_state)
 
         logger.info(json.dumps({"event": "response_generated", "session_id": session_id}))
 
+        # only what changed since the client's state_version, not the whole history
         return (jsonify({
             "response": formatted_response,
             "session_id": session_id,
-            "state": updated_state,
+            **state_payload(session_id, updated_state, since=client_state_version, full=want_full_state),
         }), 200)
 
     except ValueError as e:
@@ -335,12 +389,19 @@ def handle_prompt():
         logger.error(f"ValueError in handle_prompt: {error_msg}")
         return (jsonify({"error": error_msg, "session_id": session_id}), 400)
 
+    except CircuitOpenError:
+        guardrail_log("database_unavailable", session_id, {})
+        return (jsonify({
+            "error": "The course database is temporarily unavailable. Please try again shortly.",
+            "session_id": session_id,
+        }), 503, {"Retry-After": "10"})
+
     except Exception as e:
         logger.exception("Unhandled exception in handle_prompt")
         return (jsonify({"error": f"An error occurred: {str(e)}", "session_id": session_id}), 500)
 
 
-# NEW ADDITION: PDF download route - full chat history or AI-generated summary as a downloadable PDF
+# NEW ADDITION: PDF download route - full chat history or a deterministic summary as a downloadable PDF
 @app.post("/download-chat")
 def download_chat():
     req_data = request.get_json(silent=True)
@@ -348,48 +409,290 @@ def download_chat():
         return jsonify({"error": "Invalid request"}), 400
 
     session_id   = req_data.get("session_id", "")
-    summary_only = req_data.get("summary_only", False)
+    summary_only = bool(req_data.get("summary_only", False))
 
-    history = sessions.get(session_id, {}).get("history", [])
+    session_state = sessions.get(session_id, {})
+    history = session_state.get("history", [])
     if not history:
         try:
             repo = get_repository()
-            history = [
-                {"role": row.role, "content": row.content}
-                for row in repo.get_chat_history(session_id)
-            ]
+            transcript = repo.get_transcript(session_id)
+            if transcript is not None:
+                history = [{"role": m["role"], "content": m["content"]} for m in transcript["messages"]]
+                session_state = session_state or transcript["state"]
+            else:
+                history = [
+                    {"role": row.role, "content": row.content}
+                    for row in repo.get_chat_history(session_id)
+                ]
         except Exception:
             history = []
 
     if not history:
         return jsonify({"error": "Session not found"}), 404
 
-    if not history:
-        return jsonify({"error": "No conversation history found."}), 400
-
-    messages = history
-    title = "Chat Conversation"
-
-    pdf_buffer = generate_chat_pdf(messages, title=title)
-    return send_file(
-        pdf_buffer,
+    title = "Chat Summary" if summary_only else "Chat Conversation"
+    campuses = [PRETTY_CAMPUS.get(c, c) for c in session_state.get("campuses", [])]
+
+    # rendered up front so failures still return a 500; bytes are then streamed
+    # in chunks from the spooled file rather than held in one buffer
+    pdf_file = render_chat_pdf(
+        history,
+        title=title,
+        summary_only=summary_only,
+        campuses=campuses,
+        completed_courses=session_state.get("completed_courses", []),
+    )
+    filename = f"chat_{datetime.datetime.utcnow().strftime('%Y%m%d_%H%M')}.pdf"
+    return Response(
+        iter_pdf_chunks(pdf_file),
         mimetype="application/pdf",
-        as_attachment=True,
-        download_name=f"chat_{datetime.datetime.utcnow().strftime('%Y%m%d_%H%M')}.pdf"
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
     )
 
 
-# SPA STATIC
+# State resync: delta since a version, or the full state
+@app.get("/state")
+def get_state():
+    """
+    Fetch session state changes since a state version, or the full state.
+    ---
+    parameters:
+      - name: session_id
+        in: query
+        type: string
+        required: true
+      - name: since
+        in: query
+        type: integer
+        description: state_version the client last applied (omit for the full state)
+    responses:
+      200:
+        description: state_delta or full state, plus the current state_version
+      404:
+        description: Unknown session
+    """
+    session_id = (request.args.get("session_id") or "").strip()
+    since = parse_state_version(request.args.get("since"))
+
+    session_state = sessions.get(session_id)
+    if session_state is None:
+        # another worker served this session; rebuild from the persisted transcript
+        transcript = get_repository().get_transcript(session_id) if session_id else None
+        if transcript is None:
+            return jsonify({"error": "Session not found"}), 404
+        session_state = new_session_state()
+        session_state.update(transcript["state"] or {})
+        session_state["history"] = [{"role": m["role"], "content": m["content"]} for m in transcript["messages"]]
+        sessions[session_id] = session_state
+        record_version(session_id, session_state)
+        since = None
+
+    return jsonify({
+        "session_id": session_id,
+        **state_payload(session_id, session_state, since=since, full=since is None),
+    })
+
+
+# History: keyset-paginated messages; ETag follows the session's transcript version
+@app.get("/history")
+def history():
+    """
+    Fetch a page of a session's chat history, oldest first within the page.
+    ---
+    parameters:
+      - name: session_id
+        in: query
+        type: string
+        required: true
+      - name: limit
+        in: query
+        type: integer
+        default: 50
+      - name: before
+        in: query
+        type: string
+        description: next_cursor from the previous page (older messages)
+      - name: If-None-Match
+        in: header
+        type: string
+    responses:
+      200:
+        description: One page of messages
+        schema:
+          type: object
+          properties:
+            session_id:
+              type: string
+            messages:
+              type: array
+              items:
+                type: object
+            next_cursor:
+              type: string
+      304:
+        description: Session unchanged since the ETag was issued
+    """
+    session_id = (request.args.get("session_id") or "").strip()
+    if not session_id:
+        return jsonify({"error": "session_id is required"}), 400
+    try:
+        limit = min(max(int(request.args.get("limit", 50)), 1), HISTORY_MAX_PAGE_SIZE)
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+    before = request.args.get("before") or None
+
+    repo = get_repository()
+
+    # The version changes on every write to the session, so (version, page args)
+    # identifies the response body exactly; unchanged polls never read chat_history.
+    etag = None
+    version = repo.get_transcript_version(session_id)
+    if version is not None:
+        etag = hashlib.sha1(f"{session_id}:{version}:{limit}:{before or ''}".encode("utf-8")).hexdigest()
+        if request.if_none_match.contains(etag) or request.if_none_match.contains(f"{etag}-gzip"):
+            resp = Response(status=304)
+            resp.set_etag(etag)
+            resp.headers["Cache-Control"] = "private, no-cache"
+            return resp
+
+    try:
+        page = repo.get_chat_history_page(session_id, limit=limit, before=before)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if not page["messages"] and not before:
+        return jsonify({"error": "Session not found"}), 404
+
+    resp = jsonify({"session_id": session_id, **page})
+    if etag:
+        resp.set_etag(etag)
+    resp.headers["Cache-Control"] = "private, no-cache"
+    return resp
+
+
+# ADMIN: paginated session summaries (one grouped query per page)
+@app.get("/admin/sessions")
+def admin_sessions():
+    """
+    List recent chat sessions with message counts and a first-message preview.
+    ---
+    parameters:
+      - name: X-Admin-Token
+        in: header
+        type: string
+        required: true
+      - name: days
+        in: query
+        type: integer
+        default: 7
+        minimum: 1
+        maximum: 3650
+      - name: limit
+        in: query
+        type: integer
+        default: 50
+      - name: cursor
+        in: query
+        type: string
+        description: next_cursor from the previous page
+    responses:
+      200:
+        description: One page of session summaries, most recently active first
+        schema:
+          type: object
+          properties:
+            sessions:
+              type: array
+              items:
+                type: object
+            next_cursor:
+              type: string
+    """
+    auth_error = admin_auth_or_error()
+    if auth_error:
+        return auth_error
+
+    try:
+        days = int(request.args.get("days", 7))
+        limit = min(max(int(request.args.get("limit", 50)), 1), ADMIN_MAX_PAGE_SIZE)
+    except ValueError:
+        return jsonify({"error": "days and limit must be integers"}), 400
+    if not 1 <= days <= ADMIN_MAX_DAYS:
+        return jsonify({"error": f"days must be between 1 and {ADMIN_MAX_DAYS}"}), 400
+
+    try:
+        page = get_repository().get_session_summaries(
+            days=days,
+            limit=limit,
+            cursor=request.args.get("cursor") or None,
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    for summary in page["sessions"]:
+        summary["started_at"] = summary["started_at"].isoformat()
+        summary["last_at"] = summary["last_at"].isoformat()
+    return jsonify(page)
+
+
+
+# ADMIN: OpenAI token usage per pipeline stage (this process, since startup)
+@app.get("/admin/token-usage")
+def admin_token_usage():
+    """
+    Prompt, completion and cached token totals per LLM stage.
+    ---
+    parameters:
+      - name: X-Admin-Token
+        in: header
+        type: string
+        required: true
+    responses:
+      200:
+        description: Totals per stage (parse, format) since this worker started
+    """
+    auth_error = admin_auth_or_error()
+    if auth_error:
+        return auth_error
+    return jsonify(usage_snapshot())
+
+
+# RESPONSE COMPRESSION
+@app.after_request
+def gzip_json_response(resp):
+    if (
+        resp.mimetype != "application/json"
+        or resp.direct_passthrough
+        or resp.status_code < 200
+        or resp.status_code in (204, 304)
+        or "Content-Encoding" in resp.headers
+        or not request.accept_encodings["gzip"]
+    ):
+        return resp
+    body = resp.get_data()
+    if len(body) < GZIP_MIN_BYTES:
+        return resp
+    resp.set_data(gzip.compress(body, compresslevel=6))
+    resp.headers["Content-Encoding"] = "gzip"
+    etag, _ = resp.get_etag()
+    if etag:
+        # strong ETags differ per encoding
+        resp.set_etag(f"{etag}-gzip")
+    resp.vary.add("Accept-Encoding")
+    return resp
+
+
+# SPA STATIC (manifest lookup, precompressed variants, ETag/304, immutable hashed assets)
 @app.get("/")
 def serve_index():
-    return send_from_directory(app.static_folder, "index.html")
+    return static_assets.response("index.html") or send_from_directory(REACT_DIST, "index.html")
 
 @app.get("/<path:path>")
 def catch_all(path):
-    file_path = os.path.join(app.static_folder, path)
-    if os.path.exists(file_path):
-        return send_from_directory(app.static_folder, path)
-    return send_from_directory(app.static_folder, "index.html")
+    # unknown paths are client-side routes
+    resp = static_assets.response(path) or static_assets.response("index.html")
+    return resp or send_from_directory(REACT_DIST, "index.html")
 
 # MAIN
 if __name__ == "__main__":
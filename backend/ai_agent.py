@@ -2,7 +2,8 @@
 # Scope: Transfer-only; Campuses: UCB / UCD / UCSD
 # Adds: Multi-campus selection + Category filtering (to merge Dani's + Eleni's approaches)
 
-import os, json, re, csv, argparse, uuid, sys, logging
+import os, json, re, argparse, uuid, sys, logging, hashlib, time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from typing import Any, Dict, List, Optional, Set, Tuple
 from dotenv import load_dotenv
@@ -11,9 +12,27 @@ from openai import OpenAI
 # Handle import paths for both running directly and as a module
 try:
     from backend.database.repository import PostgresRepository
+    from backend.conversation_logger import get_conversation_logger
+    from backend.token_accounting import record_usage
+    from backend.entity_extractor import (
+        CAMPUS_ALIASES, CATEGORY_ALIASES, TYPO_FIXES, canonical_major, extract_entities, message_entities,
+        new_session_context, normalize_course_code, update_session_context, window_campuses,
+    )
+    from backend.resilience import (
+        LLM_CALL_TIMEOUT_SECONDS, LLM_SLOW_CALL_SECONDS, CircuitBreaker, CircuitOpenError, LatencyWindow, hedged_call,
+    )
 except ModuleNotFoundError:
     sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
     from backend.database.repository import PostgresRepository
+    from backend.conversation_logger import get_conversation_logger
+    from backend.token_accounting import record_usage
+    from backend.entity_extractor import (
+        CAMPUS_ALIASES, CATEGORY_ALIASES, TYPO_FIXES, canonical_major, extract_entities, message_entities,
+        new_session_context, normalize_course_code, update_session_context, window_campuses,
+    )
+    from backend.resilience import (
+        LLM_CALL_TIMEOUT_SECONDS, LLM_SLOW_CALL_SECONDS, CircuitBreaker, CircuitOpenError, LatencyWindow, hedged_call,
+    )
 
 # ============================================
 # MODULE-LEVEL INITIALIZATION (for API use)
@@ -37,6 +56,19 @@ def get_client() -> OpenAI:
         _client = OpenAI(api_key=api_key)
     return _client
 
+# One breaker for the OpenAI upstream; latency windows per stage pick the hedge delay.
+_openai_breaker = CircuitBreaker("openai", slow_call_seconds=LLM_SLOW_CALL_SECONDS)
+_llm_latencies = {"parse": LatencyWindow(), "format": LatencyWindow()}
+
+
+def _llm_call(stage: str, client: OpenAI, hedge: bool = False, **kwargs):
+    """chat.completions.create behind the OpenAI circuit breaker, with usage recorded per stage."""
+    def call():
+        resp = client.chat.completions.create(timeout=LLM_CALL_TIMEOUT_SECONDS, **kwargs)
+        record_usage(stage, resp)
+        return resp
+    return hedged_call(call, _openai_breaker, _llm_latencies.get(stage), hedge=hedge)
+
 def get_repository() -> PostgresRepository:
     """Get or create database repository (singleton pattern)."""
     global _repo
@@ -47,23 +79,47 @@ def get_repository() -> PostgresRepository:
 
 
 def _chat_history_to_dicts(history: List[Any]) -> List[Dict[str, Any]]:
-    """Normalize ChatHistory ORM rows into the dict shape used by the parser."""
+    """Normalize ChatHistory ORM rows or transcript entries into the dict shape used by the parser."""
     normalized: List[Dict[str, Any]] = []
     for msg in history:
-        role = getattr(msg, "role", None)
-        content = getattr(msg, "content", None)
+        if isinstance(msg, dict):
+            role, content, entities = msg.get("role"), msg.get("content"), msg.get("entities")
+        else:
+            role = getattr(msg, "role", None)
+            content = getattr(msg, "content", None)
+            entities = getattr(msg, "entities", None)
         if not role or content is None:
             continue
-        normalized.append({"role": str(role), "content": str(content)})
+        entry = {"role": str(role), "content": str(content)}
+        if entities:
+            entry["entities"] = entities  # stored on write; saves re-extracting for the summary
+        normalized.append(entry)
     return normalized
 
 
-def _load_persisted_history(repo: PostgresRepository, session_id: str, limit: int = 16) -> List[Dict[str, Any]]:
-    """Fetch chat history with a retry for transient Cloud SQL connection issues."""
+def _load_persisted_history(
+    repo: PostgresRepository, session_id: str, limit: int = 16
+) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    """
+    Fetch chat history, the session's entity context and the context before the
+    returned history, with a retry for transient Cloud SQL connection issues.
+    The contexts are None for sessions without a transcript.
+    """
     for attempt in (1, 2):
         try:
+            # One primary-key lookup; sessions without a transcript fall back to row reads.
+            transcript = repo.get_transcript(session_id, limit=limit)
+            if transcript is not None:
+                return (
+                    _chat_history_to_dicts(transcript["messages"]),
+                    transcript.get("context"),
+                    transcript.get("context_before"),
+                )
             persisted_history = repo.get_chat_history(session_id, limit=limit)
-            return _chat_history_to_dicts(persisted_history)
+            return _chat_history_to_dicts(persisted_history), None, None
+        except CircuitOpenError:
+            # Database is known to be down; the caller falls back to in-memory history.
+            return [], None, None
         except Exception as exc:
             logger.exception(
                 "chat_history_read_failed session_id=%s attempt=%s error=%s",
@@ -77,66 +133,25 @@ def _load_persisted_history(repo: PostgresRepository, session_id: str, limit: in
                     repo.engine.dispose()
                 except Exception:
                     pass
-    return []
+    return [], None, None
 
-#campus config (3 only)
-CAMPUS_ALIASES = {
-    "UCB": ["uc berkeley", "berkeley", "ucb", "cal"],
-    "UCD": ["uc davis", "davis", "ucd"],
-    "UCSD": ["uc san diego", "san diego", "ucsd"],
-}
 PRETTY_CAMPUS = {
     "UCB": "UC Berkeley",
     "UCD": "UC Davis",
     "UCSD": "UC San Diego",
 }
 
-#common typo fixes
-TYPO_FIXES = {
-    r"\busb\b": "uc berkeley",
-    r"\bucb\b": "uc berkeley",
-    r"\bberkley\b": "berkeley",
-    r"\bucsd\b": "uc san diego",
-    r"\buc sd\b": "uc san diego",
-}
-
+# Alias tables live in entity_extractor; the helpers below are views over one
+# cached extract_entities() scan per message.
 def normalize_typos(q: str) -> str:
-    t = q.lower()
-    for pat, repl in TYPO_FIXES.items():
-        t = re.sub(pat, repl, t)
-    return t
+    return extract_entities(q).text
 
 def detect_campus_from_query(q: str) -> Optional[str]:
-    t = normalize_typos(q)
-    for key, aliases in CAMPUS_ALIASES.items():
-        if any(a in t for a in aliases):
-            return key
-    return None
+    return extract_entities(q).campus
 
 #new: detect multiple campuses
 def detect_campuses_from_query(q: str) -> List[str]:
-    t = normalize_typos(q)
-    found: List[str] = []
-    for key, aliases in CAMPUS_ALIASES.items():
-        if any(a in t for a in aliases):
-            found.append(key)
-    return sorted(set(found))
-
-#category detection (Eleni's pathway):
-CATEGORY_ALIASES = {
-    #high-level groupings often seen in assist/grids
-    "major preparation": ["major preparation", "lower division major", "ld major"],
-    "lower division major": ["lower division major", "ld major"],
-    "general education": ["general education", "ge", "breadth"],
-    "breadth": ["breadth", "ge area", "area"],
-    "math": ["math", "mathematics"],
-    "science": ["science", "natural science"],
-    "physics": ["physics", "phys"],
-    "chemistry": ["chemistry", "chem"],
-    "biology": ["biology", "biosc", "bio"],
-    "computer science": ["computer science", "cs", "programming", "software"],
-    #add more if your JSON uses other labels (e.g., "Engineering Fundamentals", "Major Requirements")
-}
+    return sorted(extract_entities(q).campuses)
 
 def _canon_category_tokens() -> List[str]:
     #return unique canonical keys 
@@ -149,88 +164,21 @@ def normalize_categories_freeform(text: str) -> List[str]:
       1) If user writes: category: "<something>", capture inside quotes.
       2) If user says "only <phrase>" or "show <phrase> only", capture phrase.
       3) Fuzzy match known aliases and canonical keys.
+    Phrases containing a canonical key are reduced to that key.
     """
-    low = normalize_typos(text)
-    picked: Set[str] = set()
-
-    # 1)category: "..."
-    for m in re.finditer(r'category\s*:\s*["“](.+?)["”]', low):
-        phrase = m.group(1).strip()
-        if phrase:
-            picked.add(phrase)
-
-    # 2)"only <phrase>" / "show <phrase> only"
-    for m in re.finditer(r'\bonly\s+([a-z0-9 \-/&]+)', low):
-        phrase = m.group(1).strip()
-        
-        phrase = re.split(r"[.,;:!?()\[\]{}]", phrase)[0].strip()
-        if phrase:
-            picked.add(phrase)
-
-    for m in re.finditer(r'\bshow\s+([a-z0-9 \-/&]+?)\s+only\b', low):
-        phrase = m.group(1).strip()
-        if phrase:
-            picked.add(phrase)
-
-    # 3)fuzzy match against known aliases/keys
-    for canon, variants in CATEGORY_ALIASES.items():
-        if canon in low:
-            picked.add(canon)
-            continue
-        for v in variants:
-            if v in low:
-                picked.add(canon)
-                break
-
-    #normalize: keep canonical keys if they match, otherwise keep raw phrase 
-    out: Set[str] = set()
-    canon_keys = set(_canon_category_tokens())
-    for p in picked:
-        
-        matched_key = None
-        for ck in canon_keys:
-            if ck in p:
-                matched_key = ck
-                break
-        out.add(matched_key or p)
-    return sorted(out)
+    return list(extract_entities(text).categories)
 
 
 def user_explicitly_requests_categories(text: str) -> bool:
     """Return True only when the user clearly asks for category-based filtering."""
-    low = normalize_typos(text)
-    explicit_phrases = [
-        "category",
-        "categories",
-        "general education",
-        "breadth",
-        "major preparation",
-        "lower division major",
-        "science only",
-        "math only",
-        "cs only",
-        "computer science only",
-    ]
-    if any(p in low for p in explicit_phrases):
-        return True
-
-    return bool(re.search(r"\b(show|list|only)\b.*\b(category|categories)\b", low))
+    return extract_entities(text).requests_categories
 
 #local helpers 
 def _normalize_single_code(raw: str) -> str:
-    s = raw.upper().strip().replace(" ", "-")
-    if s.startswith(("CS-", "COMPSCI-", "COMSCI-", "COMPSC-")):
-        s = "COMSC-" + s.split("-", 1)[1]
-    m = re.match(r"^([A-Z&]+)[- ]?(\d+[A-Z]?)$", s)
-    if m:
-        s = f"{m.group(1)}-{m.group(2)}"
-    return s
+    return normalize_course_code(raw)
 
 def parse_completed_freeform(text: str) -> Set[str]:
-    tokens: Set[str] = set()
-    for code in re.findall(r"\b([A-Za-z]{2,}[- ]?\d+[A-Za-z]?)\b", text, flags=re.IGNORECASE):
-        tokens.add(_normalize_single_code(code))
-    return tokens
+    return set(extract_entities(text).course_codes)
 
 
 def _history_to_context_lines(history: Optional[List[Dict[str, Any]]], max_messages: int = 8) -> List[str]:
@@ -255,8 +203,161 @@ def _history_to_context_lines(history: Optional[List[Dict[str, Any]]], max_messa
     return lines
 
 
-def _detect_campuses_from_history(history: Optional[List[Dict[str, Any]]], max_messages: int = 8) -> List[str]:
+# Static parser instructions. Kept byte-identical across calls and sent first, before any
+# per-conversation content, so the provider can serve the prefix from its prompt cache.
+PARSER_SYSTEM_PROMPT = (
+    "You are an assistant that parses TRANSFER-ONLY student questions for UC transfer planning from Diablo Valley College (DVC). "
+    "Output STRICT JSON (no markdown, no commentary). Keys: intent, parameters, filters.\n"
+    "Allowed intents: find_requirements, find_equivalent_course, reverse_lookup.\n"
+    "parameters.campus: normalize to UCB, UCD, or UCSD when possible (else null) for backward compatibility.\n"
+    "parameters.campuses: ARRAY of campuses (UCB, UCD, UCSD) if multiple are requested (else empty).\n"
+    "parameters.target_course_code: only if user asks about a UC target (e.g., 'MATH-52 from UC Berkeley' or 'COMPSCI-61A'). "
+    "For reverse lookups: extract the UC course code when user asks 'What are the equivalent DVC courses for MATH-52?'\n"
+    "parameters.target_institution: the UC campus name if mentioned (e.g., 'UC Berkeley').\n"
+    "parameters.majors: ARRAY of the student's intended major(s) when they state one "
+    "(e.g., 'I'm a CS major' -> ['Computer Science'], 'majoring in applied math' -> ['Applied Mathematics']), else empty. "
+    "Course-type words ('cs courses', 'math requirements') are filters.focus_only, not a major.\n"
+    "filters.focus_only: one of 'cs','math','science','all', or null. "
+    "IMPORTANT: If the user asks for a subset like 'science courses for computer science' or 'math requirements for CS', "
+    "set focus_only to the SUBSET domain (e.g., 'science' or 'math'), NOT the major context (CS). "
+    "The major context provides background but the actual filter is the course type requested.\n"
+    "filters.required_only: boolean.\n"
+    "filters.domains_completed: list among 'cs','math','science'.\n"
+    "filters.completed_courses: array of normalized DVC course codes (DEPT-NUM) if the user lists them.\n"
+    "filters.categories: array of category names/phrases the user requests (e.g., 'major preparation','breadth','general education'). "
+    "Use the user's wording; do not invent categories.\n"
+    "Context may include a 'Conversation summary' JSON (state carried over from older turns: campuses, majors, filters, "
+    "completed_courses) followed by the most recent turns verbatim. Treat the summary like earlier conversation.\n"
+    "Interpretation precedence: "
+    "(1) explicit filter words in current message, "
+    "(2) explicit campus in current message, "
+    "(3) unresolved references from recent conversation context.\n"
+    "When prior conversation context is provided, resolve references like 'science only', 'math only', 'required only', 'that campus', 'those classes', or 'what about Davis'. "
+    "Prefer explicit details in the current user message; use history only when needed to disambiguate.\n"
+    "Follow-up constraints:\n"
+    "- If current message says 'science only' or 'math only', set filters.focus_only accordingly even if campus is only in history.\n"
+    "- If current message says 'required only', set filters.required_only=true and keep prior campus context when campus is omitted.\n"
+    "- If user asks for category filtering (e.g., 'category: major preparation', 'show breadth only'), populate filters.categories with those phrases.\n"
+    "- Do not set filters.focus_only='all' for narrow requests like 'science only' or 'math only'.\n"
+    "Examples:\n"
+    "- History: user asked about UC Berkeley CS; Current: 'science only' -> campus UCB from history, focus_only='science'.\n"
+    "- History: user asked about UC Davis; Current: 'required only' -> campus UCD from history, required_only=true.\n"
+    "- Current: 'filter by category major preparation for UCSD' -> campus UCSD, categories=['major preparation'].\n"
+    "If unsure, return null or empty arrays rather than guessing."
+)
+
+PARSER_MODEL = "gpt-4o-mini"
+# Identifies the parser prompt a cached parse was produced with.
+PARSER_PROMPT_VERSION = hashlib.sha256(f"{PARSER_MODEL}\n{PARSER_SYSTEM_PROMPT}".encode("utf-8")).hexdigest()[:12]
+# Warm parse cache for first-turn prompts, written by scripts/eval_parser.py --cache-out.
+PARSE_CACHE_PATH = os.getenv("PARSE_CACHE_PATH", "")
+
+# Older turns are folded into a structured summary; only the last few go in verbatim.
+PARSER_RECENT_MESSAGES = int(os.getenv("PARSER_RECENT_MESSAGES", "2"))
+
+
+def _summarize_history(
+    history: Optional[List[Dict[str, Any]]],
+    context: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """
+    Fold user turns into the state they established (see update_session_context),
+    starting from `context`, the state before the first of them, when it is known.
+    """
+    context = dict(context) if context else new_session_context()
+    for msg in history or []:
+        if not isinstance(msg, dict) or str(msg.get("role", "")).strip().lower() != "user":
+            continue
+        content = str(msg.get("content", "")).strip()
+        if content:
+            entities = msg["entities"] if "entities" in msg else message_entities(content)
+            context = update_session_context(context, "user", entities)
+    return context
+
+
+def _parser_messages(
+    user_message: str,
+    conversation_history: Optional[List[Dict[str, Any]]],
+    history_context: Optional[Dict[str, Any]] = None,
+) -> List[Dict[str, str]]:
+    """
+    Static system prefix, then older-turn summary, recent turns, and the current message.
+    `history_context` is the session context before conversation_history (turns older
+    than the loaded history); the summary adds the older loaded turns to it, so it never
+    includes the recent turns or the current message.
+    """
+    history = [msg for msg in conversation_history or [] if isinstance(msg, dict)]
+    recent = history[-PARSER_RECENT_MESSAGES:] if PARSER_RECENT_MESSAGES > 0 else []
+    older = history[:len(history) - len(recent)]
+
+    messages = [{"role": "system", "content": PARSER_SYSTEM_PROMPT}]
+    if older:
+        summary = _summarize_history(older, history_context)
+        summary.pop("campus_window", None)
+        if summary["user_turns"]:
+            messages.append({
+                "role": "user",
+                "content": "Conversation summary (older turns):\n" + json.dumps(summary, sort_keys=True, separators=(",", ":")),
+            })
+    history_lines = _history_to_context_lines(recent, max_messages=len(recent))
+    if history_lines:
+        messages.append({
+            "role": "user",
+            "content": "Recent conversation context (oldest to newest):\n" + "\n".join(history_lines),
+        })
+    messages.append({"role": "user", "content": "Current user message:\n" + user_message})
+    return messages
+
+
+def parse_cache_key(text: str) -> str:
+    """Case/whitespace-insensitive key for a standalone prompt."""
+    return " ".join(text.lower().split()).rstrip("?.! ")
+
+
+def _prior_turns(user_message: str, conversation_history: Optional[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """History before this message (get_response's persisted history already ends with it)."""
+    history = [msg for msg in conversation_history or [] if isinstance(msg, dict)]
+    if history and history[-1].get("role") == "user" and str(history[-1].get("content", "")).strip() == user_message.strip():
+        history = history[:-1]
+    return history
+
+
+_parse_cache: Optional[Dict[str, str]] = None
+
+
+def _load_parse_cache() -> Dict[str, str]:
+    global _parse_cache
+    if _parse_cache is None:
+        _parse_cache = {}
+        if PARSE_CACHE_PATH and os.path.exists(PARSE_CACHE_PATH):
+            try:
+                with open(PARSE_CACHE_PATH, encoding="utf-8") as f:
+                    artifact = json.load(f)
+                if artifact.get("prompt_version") == PARSER_PROMPT_VERSION:
+                    _parse_cache = artifact.get("entries") or {}
+                else:
+                    logger.warning("parse_cache_stale path=%s version=%s", PARSE_CACHE_PATH, artifact.get("prompt_version"))
+            except (OSError, ValueError) as exc:
+                logger.warning("parse_cache_unreadable path=%s error=%s", PARSE_CACHE_PATH, str(exc))
+    return _parse_cache
+
+
+def _parse_cache_lookup(user_message: str, conversation_history: Optional[List[Dict[str, Any]]]) -> Optional[str]:
+    """Raw parser JSON for a first-turn prompt seen by the eval run, or None."""
+    if not PARSE_CACHE_PATH or _prior_turns(user_message, conversation_history):
+        return None
+    return _load_parse_cache().get(parse_cache_key(user_message))
+
+
+def _detect_campuses_from_history(
+    history: Optional[List[Dict[str, Any]]],
+    max_messages: int = 8,
+    session_context: Optional[Dict[str, Any]] = None,
+) -> List[str]:
     """Infer campus context from recent user messages when current turn is underspecified."""
+    if session_context:
+        # Campuses of the last CONTEXT_CAMPUS_WINDOW messages, kept up to date on write.
+        return window_campuses(session_context)
     if not history:
         return []
 
@@ -272,10 +373,10 @@ def _detect_campuses_from_history(history: Optional[List[Dict[str, Any]]], max_m
     return sorted(set(found))
 
 def parse_preferences_seed(q: str) -> dict:
-    t = " " + q.lower().strip() + " "
-    want_cs = any(x in t for x in [" cs ", "comsc", "computer science", "programming", "data structures"])
-    want_math = any(x in t for x in [" math ", "calculus", "linear algebra", "differential equations"])
-    want_science = any(x in t for x in [" science ", "physics", "chemistry", "biology", " bio ", " chem ", " phys "])
+    entities = extract_entities(q)
+    want_cs = "cs" in entities.domains
+    want_math = "math" in entities.domains
+    want_science = "science" in entities.domains
     exclusive_domain = None
     if want_cs and not (want_math or want_science):
         exclusive_domain = "cs"
@@ -288,7 +389,7 @@ def parse_preferences_seed(q: str) -> dict:
     seed_categories = normalize_categories_freeform(q)
 
     return {
-        "required_only": any(x in t for x in ["required only", "only required", "must have", "need all"]),
+        "required_only": entities.required_only,
         "exclusive_domain": exclusive_domain,
         "want_cs": want_cs,
         "want_math": want_math,
@@ -316,6 +417,8 @@ def llm_parse_user_message(
     client: OpenAI,
     user_message: str,
     conversation_history: Optional[List[Dict[str, Any]]] = None,
+    session_context: Optional[Dict[str, Any]] = None,
+    history_context: Optional[Dict[str, Any]] = None,
 ) -> Dict[str, Any]:
     """
     Return JSON like:
@@ -325,7 +428,8 @@ def llm_parse_user_message(
         "campus": "UCB|UCD|UCSD" | null,
         "campuses": ["UCB","UCD"] | [],
         "target_course_code": "CS 61A" | null,
-        "target_institution": "UC Berkeley" | null
+        "target_institution": "UC Berkeley" | null,
+        "majors": ["Computer Science"] | []
       },
       "filters": {
         "focus_only": "cs|math|science|all|null",
@@ -336,172 +440,173 @@ def llm_parse_user_message(
       }
     }
     """
-    system = (
-        "You are an assistant that parses TRANSFER-ONLY student questions for UC transfer planning from Diablo Valley College (DVC). "
-        "Output STRICT JSON (no markdown, no commentary). Keys: intent, parameters, filters.\n"
-        "Allowed intents: find_requirements, find_equivalent_course, reverse_lookup.\n"
-        "parameters.campus: normalize to UCB, UCD, or UCSD when possible (else null) for backward compatibility.\n"
-        "parameters.campuses: ARRAY of campuses (UCB, UCD, UCSD) if multiple are requested (else empty).\n"
-        "parameters.target_course_code: only if user asks about a UC target (e.g., 'MATH-52 from UC Berkeley' or 'COMPSCI-61A'). "
-        "For reverse lookups: extract the UC course code when user asks 'What are the equivalent DVC courses for MATH-52?'\n"
-        "parameters.target_institution: the UC campus name if mentioned (e.g., 'UC Berkeley').\n"
-        "filters.focus_only: one of 'cs','math','science','all', or null. "
-        "IMPORTANT: If the user asks for a subset like 'science courses for computer science' or 'math requirements for CS', "
-        "set focus_only to the SUBSET domain (e.g., 'science' or 'math'), NOT the major context (CS). "
-        "The major context provides background but the actual filter is the course type requested.\n"
-        "filters.required_only: boolean.\n"
-        "filters.domains_completed: list among 'cs','math','science'.\n"
-        "filters.completed_courses: array of normalized DVC course codes (DEPT-NUM) if the user lists them.\n"
-        "filters.categories: array of category names/phrases the user requests (e.g., 'major preparation','breadth','general education'). "
-        "Use the user's wording; do not invent categories.\n"
-        "Interpretation precedence: "
-        "(1) explicit filter words in current message, "
-        "(2) explicit campus in current message, "
-        "(3) unresolved references from recent conversation context.\n"
-        "When prior conversation context is provided, resolve references like 'science only', 'math only', 'required only', 'that campus', 'those classes', or 'what about Davis'. "
-        "Prefer explicit details in the current user message; use history only when needed to disambiguate.\n"
-        "Follow-up constraints:\n"
-        "- If current message says 'science only' or 'math only', set filters.focus_only accordingly even if campus is only in history.\n"
-        "- If current message says 'required only', set filters.required_only=true and keep prior campus context when campus is omitted.\n"
-        "- If user asks for category filtering (e.g., 'category: major preparation', 'show breadth only'), populate filters.categories with those phrases.\n"
-        "- Do not set filters.focus_only='all' for narrow requests like 'science only' or 'math only'.\n"
-        "Examples:\n"
-        "- History: user asked about UC Berkeley CS; Current: 'science only' -> campus UCB from history, focus_only='science'.\n"
-        "- History: user asked about UC Davis; Current: 'required only' -> campus UCD from history, required_only=true.\n"
-        "- Current: 'filter by category major preparation for UCSD' -> campus UCSD, categories=['major preparation'].\n"
-        "If unsure, return null or empty arrays rather than guessing."
-    )
-
-    history_lines = _history_to_context_lines(conversation_history)
-    history_block = "\n".join(history_lines)
 
     try:
-        messages = [{"role": "system", "content": system}]
-        if history_block:
-            messages.append({
-                "role": "user",
-                "content": "Recent conversation context (oldest to newest):\n" + history_block,
-            })
-        messages.append({"role": "user", "content": "Current user message:\n" + user_message})
+        raw = _parse_cache_lookup(user_message, conversation_history)
+        if raw is None:
+            # Parsing is idempotent (temperature 0), so a slow call is hedged with a duplicate.
+            resp = _llm_call(
+                "parse",
+                client,
+                hedge=True,
+                model=PARSER_MODEL,
+                response_format={"type": "json_object"},
+                messages=_parser_messages(user_message, conversation_history, history_context),
+                temperature=0
+            )
+            raw = resp.choices[0].message.content
+        return _normalize_parsed(json.loads(raw), user_message, conversation_history, session_context)
+    except CircuitOpenError:
+        # Upstream is known to be down: answer from the local parse without waiting.
+        logger.info("llm_parse_user_message_skipped reason=circuit_open")
+    except Exception as exc:
+        logger.exception("llm_parse_user_message_failed error=%s", str(exc))
+    return _local_parse(user_message, conversation_history, session_context)
 
-        resp = client.chat.completions.create(
-            model="gpt-4o-mini",
-            response_format={"type": "json_object"},
-            messages=messages,
-            temperature=0
-        )
-        data = json.loads(resp.choices[0].message.content)
-
-        #defaults
-        data.setdefault("intent", "find_requirements")
-        data.setdefault("parameters", {})
-        data.setdefault("filters", {})
-        params = data["parameters"]
-        filt = data["filters"]
-
-        #campuses (array + single)
-        campuses_raw = params.get("campuses", [])
-        if not isinstance(campuses_raw, list):
-            campuses_raw = []
-        single_campus = params.get("campus")
-        if isinstance(single_campus, str) and single_campus.strip():
-            campuses_raw.append(single_campus)
-        campuses_raw.extend(detect_campuses_from_query(user_message))
-        if not campuses_raw:
-            campuses_raw.extend(_detect_campuses_from_history(conversation_history))
-
-        campuses_norm: List[str] = []
-        for c in campuses_raw:
-            if not isinstance(c, str):
-                continue
-            det = detect_campus_from_query(c) or c.upper().strip()
-            if det in PRETTY_CAMPUS:
-                campuses_norm.append(det)
-        campuses_norm = sorted(set(campuses_norm))
-        params["campus"] = campuses_norm[0] if campuses_norm else None
-        params["campuses"] = campuses_norm
-
-        #filters: focus / required
-        focus = filt.get("focus_only")
-        if isinstance(focus, str):
-            focus = focus.lower().strip()
-            if focus not in {"cs", "math", "science", "all"}:
-                focus = None
-        else:
+
+def _normalize_parsed(
+    data: Dict[str, Any],
+    user_message: str,
+    conversation_history: Optional[List[Dict[str, Any]]] = None,
+    session_context: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """Fill defaults in the parser's raw JSON and merge in the deterministic local parsing."""
+    #defaults
+    data.setdefault("intent", "find_requirements")
+    data.setdefault("parameters", {})
+    data.setdefault("filters", {})
+    params = data["parameters"]
+    filt = data["filters"]
+
+    #campuses (array + single)
+    campuses_raw = params.get("campuses", [])
+    if not isinstance(campuses_raw, list):
+        campuses_raw = []
+    single_campus = params.get("campus")
+    if isinstance(single_campus, str) and single_campus.strip():
+        campuses_raw.append(single_campus)
+    campuses_raw.extend(detect_campuses_from_query(user_message))
+    if not campuses_raw:
+        campuses_raw.extend(_detect_campuses_from_history(conversation_history, session_context=session_context))
+
+    campuses_norm: List[str] = []
+    for c in campuses_raw:
+        if not isinstance(c, str):
+            continue
+        det = detect_campus_from_query(c) or c.upper().strip()
+        if det in PRETTY_CAMPUS:
+            campuses_norm.append(det)
+    campuses_norm = sorted(set(campuses_norm))
+    params["campus"] = campuses_norm[0] if campuses_norm else None
+    params["campuses"] = campuses_norm
+    params["majors"] = _resolve_majors(params, user_message, session_context)
+
+    #filters: focus / required
+    focus = filt.get("focus_only")
+    if isinstance(focus, str):
+        focus = focus.lower().strip()
+        if focus not in {"cs", "math", "science", "all"}:
             focus = None
-        filt["focus_only"] = focus
-        filt["required_only"] = bool(filt.get("required_only", False))
+    else:
+        focus = None
+    filt["focus_only"] = focus
+    filt["required_only"] = bool(filt.get("required_only", False))
+
+    #domains_completed
+    domains = filt.get("domains_completed") or []
+    if isinstance(domains, list):
+        domains = {d for d in (x.lower().strip() for x in domains) if d in {"cs","math","science"}}
+    else:
+        domains = set()
+    filt["domains_completed"] = sorted(domains)
 
-        #domains_completed
-        domains = filt.get("domains_completed") or []
-        if isinstance(domains, list):
-            domains = {d for d in (x.lower().strip() for x in domains) if d in {"cs","math","science"}}
-        else:
-            domains = set()
-        filt["domains_completed"] = sorted(domains)
+    #completed_courses
+    comp = filt.get("completed_courses") or []
+    if isinstance(comp, list):
+        norm = {_normalize_single_code(x) for x in comp if isinstance(x, str)}
+    else:
+        norm = set()
+    norm |= parse_completed_freeform(user_message)
+    filt["completed_courses"] = sorted(norm)
+
+    #new: categories (LLM + local merge)
+    # Merge LLM-provided categories with local parsing
+    cats = filt.get("categories") or []
+    cats = cats if isinstance(cats, list) else []
+    cats_local = normalize_categories_freeform(user_message)
+    merged_cats = sorted(set([c for c in cats if isinstance(c, str) and c.strip()] + cats_local))
+
+    # Local fallback for explicit follow-up phrases the LLM sometimes misses.
+    # This keeps "science only", "math only", and "required only" working even in cloud deployments.
+    seed_prefs = parse_preferences_seed(user_message)
+    seed_focus = seed_prefs.get("exclusive_domain")
+    if seed_focus:
+        focus = seed_focus
+    if seed_prefs.get("required_only"):
+        filt["required_only"] = True
+    filt["focus_only"] = focus
 
-        #completed_courses
-        comp = filt.get("completed_courses") or []
-        if isinstance(comp, list):
-            norm = {_normalize_single_code(x) for x in comp if isinstance(x, str)}
-        else:
-            norm = set()
-        norm |= parse_completed_freeform(user_message)
-        filt["completed_courses"] = sorted(norm)
-
-        #new: categories (LLM + local merge)
-        # Merge LLM-provided categories with local parsing
-        cats = filt.get("categories") or []
-        cats = cats if isinstance(cats, list) else []
-        cats_local = normalize_categories_freeform(user_message)
-        merged_cats = sorted(set([c for c in cats if isinstance(c, str) and c.strip()] + cats_local))
-
-        # Local fallback for explicit follow-up phrases the LLM sometimes misses.
-        # This keeps "science only", "math only", and "required only" working even in cloud deployments.
-        seed_prefs = parse_preferences_seed(user_message)
-        seed_focus = seed_prefs.get("exclusive_domain")
-        if seed_focus:
-            focus = seed_focus
-        if seed_prefs.get("required_only"):
-            filt["required_only"] = True
-        filt["focus_only"] = focus
-
-        # Clear categories if the normalized domain focus is already set
-        focus_norm = filt.get("focus_only")
-        if isinstance(focus_norm, str):
-            focus_norm = focus_norm.lower().strip()
-        if focus_norm in {"cs", "math", "science"}:
-            merged_cats = []
-
-        filt["categories"] = merged_cats
-
-        return data
-    except Exception as exc:
-        logger.exception("llm_parse_user_message_failed error=%s", str(exc))
+    # Clear categories if the normalized domain focus is already set
+    focus_norm = filt.get("focus_only")
+    if isinstance(focus_norm, str):
+        focus_norm = focus_norm.lower().strip()
+    if focus_norm in {"cs", "math", "science"}:
+        merged_cats = []
 
-        campuses_raw = detect_campuses_from_query(user_message)
-        if not campuses_raw:
-            campuses_raw = _detect_campuses_from_history(conversation_history)
+    filt["categories"] = merged_cats
 
-        campuses_norm: List[str] = []
-        for c in campuses_raw:
-            if not isinstance(c, str):
-                continue
-            det = detect_campus_from_query(c) or c.upper().strip()
-            if det in PRETTY_CAMPUS:
-                campuses_norm.append(det)
-        campuses_norm = sorted(set(campuses_norm))
-
-        return {
-            "intent": "find_requirements",
-            "parameters": {
-                "campus": campuses_norm[0] if campuses_norm else None,
-                "campuses": campuses_norm,
-                "target_course_code": None,
-                "target_institution": None,
-            },
-            "filters": {"focus_only": None, "required_only": False, "domains_completed": [], "completed_courses": [], "categories": []}
-        }
+    return data
+
+
+def _resolve_majors(
+    params: Dict[str, Any],
+    user_message: str,
+    session_context: Optional[Dict[str, Any]] = None,
+) -> List[str]:
+    """Majors stated in this message (parser + local cues), else the session's last stated majors."""
+    majors_raw = params.get("majors", [])
+    if not isinstance(majors_raw, list):
+        majors_raw = []
+    single_major = params.get("major")
+    if isinstance(single_major, str):
+        majors_raw.append(single_major)
+    majors_raw.extend(extract_entities(user_message).majors)
+    majors = [m for m in dict.fromkeys(canonical_major(x) for x in majors_raw if isinstance(x, str)) if m]
+    if not majors and session_context:
+        majors = list(session_context.get("majors") or [])
+    return majors
+
+
+def _local_parse(
+    user_message: str,
+    conversation_history: Optional[List[Dict[str, Any]]] = None,
+    session_context: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """Deterministic parse used when the LLM call fails or its circuit is open."""
+    campuses_raw = detect_campuses_from_query(user_message)
+    if not campuses_raw:
+        campuses_raw = _detect_campuses_from_history(conversation_history, session_context=session_context)
+
+    campuses_norm: List[str] = []
+    for c in campuses_raw:
+        if not isinstance(c, str):
+            continue
+        det = detect_campus_from_query(c) or c.upper().strip()
+        if det in PRETTY_CAMPUS:
+            campuses_norm.append(det)
+    campuses_norm = sorted(set(campuses_norm))
+
+    return {
+        "intent": "find_requirements",
+        "parameters": {
+            "campus": campuses_norm[0] if campuses_norm else None,
+            "campuses": campuses_norm,
+            "target_course_code": None,
+            "target_institution": None,
+            "majors": _resolve_majors({}, user_message, session_context),
+        },
+        "filters": {"focus_only": None, "required_only": False, "domains_completed": [], "completed_courses": [], "categories": []}
+    }
 
 #LLM format
 def llm_format_response(client: OpenAI,
@@ -566,7 +671,9 @@ def llm_format_response(client: OpenAI,
     }
 
     try:
-        resp = client.chat.completions.create(
+        resp = _llm_call(
+            "format",
+            client,
             model="gpt-4o-mini",
             messages=[
                 {"role": "system", "content":
@@ -667,7 +774,6 @@ def append_logs(user_prompt: str,
                 completed_courses: Set[str],
                 completed_domains: Set[str],
                 query_id: int):
-    ensure_log_dir()
     ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     row = {
         "session_id": SESSION_ID,
@@ -681,14 +787,7 @@ def append_logs(user_prompt: str,
         "results": len(rows),
         "response": (response or "").replace("\n", "\\n"),
     }
-    new_file = not os.path.exists(LOG_CSV)
-    with open(LOG_CSV, "a", newline="", encoding="utf-8") as f:
-        w = csv.DictWriter(f, fieldnames=list(row.keys()))
-        if new_file:
-            w.writeheader()
-        w.writerow(row)
-    with open(LOG_JSONL, "a", encoding="utf-8") as f:
-        f.write(json.dumps(row, ensure_ascii=False) + "\n")
+    get_conversation_logger(LOG_CSV, LOG_JSONL).log(row)
 
 #UI helpers
 def print_lists(campus_key: str,
@@ -787,6 +886,7 @@ def interactive_session(client: OpenAI, repo: PostgresRepository, args) -> None:
     required_only = parsed["filters"]["required_only"]
     # Resolve categories in a single place for consistency
     categories_only: List[str] = resolve_categories_only(parsed["filters"], seed_prefs)
+    majors: List[str] = parsed.get("parameters", {}).get("majors") or []
 
     def recompute_remaining() -> Dict[str, List[Dict[str, Any]]]:
         # Use repository to get filtered courses
@@ -796,7 +896,8 @@ def interactive_session(client: OpenAI, repo: PostgresRepository, args) -> None:
             required_only=required_only,
             focus_only=focus_only,
             completed_courses=completed_courses,
-            completed_domains=completed_domains
+            completed_domains=completed_domains,
+            majors=majors,
         )
 
     campus_to_remaining = recompute_remaining()
@@ -927,7 +1028,13 @@ def interactive_session(client: OpenAI, repo: PostgresRepository, args) -> None:
             if categories_only:
                 print("Active categories:", ", ".join(categories_only))
 
-        #detect/merge campuses 
+        #update major if one is stated
+        new_majors = follow_parsed.get("parameters", {}).get("majors") or []
+        if new_majors and new_majors != majors:
+            majors = new_majors
+            print("Major:", ", ".join(majors))
+
+        #detect/merge campuses
         new_camps = follow_parsed.get("parameters", {}).get("campuses") or detect_campuses_from_query(follow)
         available = repo.get_campuses()
         added = False
@@ -993,6 +1100,7 @@ def get_response(prompt: str, session_state: Optional[Dict] = None, session_id:
             session_state = {}
         session_state = {
             "campuses": session_state.get("campuses", []),
+            "majors": session_state.get("majors", []),
             "completed_courses": session_state.get("completed_courses", []),
             "completed_domains": session_state.get("completed_domains", []),
             "categories": session_state.get("categories", []),
@@ -1032,6 +1140,7 @@ def get_response(prompt: str, session_state: Optional[Dict] = None, session_id:
     
     session_state = {
         "campuses": session_state.get("campuses", []),
+        "majors": session_state.get("majors", []),
         "completed_courses": session_state.get("completed_courses", []),
         "completed_domains": session_state.get("completed_domains", []),
         "categories": session_state.get("categories", []),
@@ -1040,8 +1149,12 @@ def get_response(prompt: str, session_state: Optional[Dict] = None, session_id:
     
     # Prefer persisted history so follow-up turns work across Cloud Run instances.
     conversation_history: List[Dict[str, Any]] = []
+    session_context: Optional[Dict[str, Any]] = None
+    history_context: Optional[Dict[str, Any]] = None
     if session_id:
-        conversation_history = _load_persisted_history(repo, session_id, limit=16)
+        conversation_history, session_context, history_context = _load_persisted_history(
+            repo, session_id, limit=16
+        )
 
     # Keep any in-memory history as a fallback for local/dev flows.
     if not conversation_history:
@@ -1052,7 +1165,13 @@ def get_response(prompt: str, session_state: Optional[Dict] = None, session_id:
         ]
 
     # Parse user message with context from prior turns.
-    parsed = llm_parse_user_message(client, prompt, conversation_history=conversation_history)
+    parsed = llm_parse_user_message(
+        client,
+        prompt,
+        conversation_history=conversation_history,
+        session_context=session_context,
+        history_context=history_context,
+    )
     
     # Determine campuses for this session.
     # Explicit campus mentions in the current prompt always override prior session context.
@@ -1078,6 +1197,9 @@ def get_response(prompt: str, session_state: Optional[Dict] = None, session_id:
     
     # Update session state with detected campuses
     session_state["campuses"] = campus_keys
+    # A major stated in this turn replaces the session's; otherwise the session's carries over.
+    majors: List[str] = parsed.get("parameters", {}).get("majors") or session_state.get("majors", [])
+    session_state["majors"] = majors
     
     # Persistent state across the session
     completed_courses: Set[str] = set(parsed["filters"]["completed_courses"]) | set(session_state.get("completed_courses", []))
@@ -1106,7 +1228,8 @@ def get_response(prompt: str, session_state: Optional[Dict] = None, session_id:
         required_only=required_only,
         focus_only=focus_only,
         completed_courses=completed_courses,
-        completed_domains=completed_domains
+        completed_domains=completed_domains,
+        majors=majors,
     )
 
     if seed_prefs.get("exclusive_domain"):
@@ -1142,7 +1265,7 @@ def get_response(prompt: str, session_state: Optional[Dict] = None, session_id:
     # 4. WRITE assistant response to chat history (persisted to Cloud SQL)
     if session_id:
         try:
-            repo.save_message(session_id, "assistant", formatted)
+            repo.save_message(session_id, "assistant", formatted, state=session_state)
         except Exception as exc:
             logger.exception(
                 "chat_history_write_failed role=assistant session_id=%s error=%s",
@@ -1152,6 +1275,188 @@ def get_response(prompt: str, session_state: Optional[Dict] = None, session_id:
     
     return formatted, session_state
 
+def _answer_cli_prompt(
+    client: OpenAI,
+    repo: PostgresRepository,
+    user_q: str,
+    session_state: Dict,
+    query_id: int = 1,
+    json_only: bool = False,
+    timings: Optional[Dict[str, float]] = None,
+) -> Tuple[Dict, Optional[str], Dict[str, Any]]:
+    """
+    Run one CLI prompt (parse → retrieve → format) and log it.
+    Returns (session_state, response text, parsed JSON); the text is None with json_only.
+    Stage durations in ms are recorded into `timings` when given.
+    """
+    timings = timings if timings is not None else {}
+    stage_start = time.perf_counter()
+
+    def lap(stage: str):
+        nonlocal stage_start
+        now = time.perf_counter()
+        timings[stage] = round((now - stage_start) * 1000, 1)
+        stage_start = now
+
+    parsed = llm_parse_user_message(client, user_q)
+    lap("parse")
+    if json_only:
+        campus_keys_for_log = parsed.get("parameters", {}).get("campuses") or repo.get_campuses()
+        campus_key_for_log = (campus_keys_for_log[0] if campus_keys_for_log else "UCB")
+        append_logs(user_q, parsed, "", campus_key_for_log, [], set(), set(), query_id)
+        return session_state, None, parsed
+
+    #campuses for this session
+    available = repo.get_campuses()
+    campus_keys = session_state.get("campuses", [])
+    prompt_campuses = parsed.get("parameters", {}).get("campuses") or detect_campuses_from_query(user_q)
+
+    if prompt_campuses:
+        campus_keys = prompt_campuses
+
+    if not campus_keys:
+        return session_state, "Sorry, I couldn't detect a campus. Try UC Berkeley (UCB), UC Davis (UCD), or UC San Diego (UCSD).", parsed
+
+    campus_keys = [ck for ck in campus_keys if ck in available]
+    if not campus_keys:
+        return session_state, "Could not find data for the requested campus(es).", parsed
+
+    #persistent state across the session
+    completed_courses: Set[str] = set(parsed["filters"]["completed_courses"]) | set(session_state.get("completed_courses", []))
+    completed_domains: Set[str] = set(parsed["filters"]["domains_completed"]) | set(session_state.get("completed_domains", []))
+    focus_only = parsed["filters"]["focus_only"]
+    required_only = parsed["filters"]["required_only"]
+    categories_only: List[str] = parsed["filters"].get("categories") or session_state.get("categories", [])
+    majors: List[str] = parsed.get("parameters", {}).get("majors") or session_state.get("majors", [])
+
+    # Use repository to get filtered courses
+    campus_to_remaining = repo.get_courses(
+        campus_keys=campus_keys,
+        categories=categories_only if categories_only else None,
+        required_only=required_only,
+        focus_only=focus_only,
+        completed_courses=completed_courses,
+        completed_domains=completed_domains,
+        majors=majors,
+    )
+    lap("retrieve")
+
+    # CLI callers (Flask subprocess, batch runs) always get plain formatting for consistency
+    formatted = llm_format_response_multi(
+        client,
+        campus_keys,
+        campus_to_remaining,
+        parsed,
+        completed_courses,
+        completed_domains,
+        plain=True
+    )
+    lap("format")
+
+    updated_state = {
+        "campuses": campus_keys,
+        "majors": majors,
+        "completed_courses": sorted(list(completed_courses)),
+        "completed_domains": sorted(list(completed_domains)),
+        "categories": categories_only
+    }
+
+    # Log this query
+    append_logs(
+        user_q,
+        parsed,
+        formatted,
+        "MULTI:" + ",".join(campus_keys),
+        [r for ck in campus_keys for r in campus_to_remaining.get(ck, [])],
+        completed_courses,
+        completed_domains,
+        query_id
+    )
+    return updated_state, formatted, parsed
+
+
+AI_AGENT_BATCH_WORKERS = int(os.getenv("AI_AGENT_BATCH_WORKERS", "4"))
+
+
+def _read_batch_items(source) -> List[Dict[str, Any]]:
+    """
+    Batch input lines: {"prompt": ..., "session_state": {...}, "id": ...} or a bare JSON string.
+    Unreadable lines come back as {"line": n, "error": ...} so they still get an output record.
+    """
+    items: List[Dict[str, Any]] = []
+    for line_no, line in enumerate(source, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            item = json.loads(line)
+        except json.JSONDecodeError as exc:
+            items.append({"line": line_no, "error": f"invalid JSON: {exc}"})
+            continue
+        if isinstance(item, str):
+            item = {"prompt": item}
+        if not isinstance(item, dict) or not str(item.get("prompt") or "").strip():
+            items.append({"line": line_no, "error": "missing prompt"})
+            continue
+        item["line"] = line_no
+        items.append(item)
+    return items
+
+
+def run_batch(client: OpenAI, repo: PostgresRepository, source, out,
+              workers: int = AI_AGENT_BATCH_WORKERS, json_only: bool = False) -> int:
+    """
+    Answer every prompt in a JSONL batch on a bounded worker pool that shares one
+    OpenAI client and one repository (engine). Writes one JSONL result per input
+    line, in input order, with per-stage timings. Returns the number of failures.
+    """
+    items = _read_batch_items(source)
+
+    def run_one(item: Dict[str, Any]) -> Dict[str, Any]:
+        record: Dict[str, Any] = {"id": item.get("id", item["line"]), "prompt": item.get("prompt")}
+        if "error" in item:
+            record["error"] = item["error"]
+            return record
+        session_state = item.get("session_state")
+        if isinstance(session_state, str):
+            try:
+                session_state = json.loads(session_state)
+            except json.JSONDecodeError:
+                session_state = None
+        timings: Dict[str, float] = {}
+        start = time.perf_counter()
+        try:
+            state, text, parsed = _answer_cli_prompt(
+                client, repo, item["prompt"], session_state if isinstance(session_state, dict) else {},
+                query_id=item["line"], json_only=json_only, timings=timings,
+            )
+            if json_only:
+                record["parsed"] = parsed
+            else:
+                record["session_state"] = state
+                record["response"] = text
+        except Exception as exc:
+            logger.exception("batch_prompt_failed line=%s error=%s", item["line"], str(exc))
+            record["error"] = str(exc)
+        timings["total"] = round((time.perf_counter() - start) * 1000, 1)
+        record["timings_ms"] = timings
+        return record
+
+    failures = 0
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for record in pool.map(run_one, items):
+            failures += "error" in record
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+    print(
+        f"[OK] Batch: {len(items)} prompts, {failures} failed, {time.perf_counter() - started:.1f}s "
+        f"with {max(1, workers)} workers",
+        file=sys.stderr,
+    )
+    return failures
+
+
 #start
 def main():
     load_dotenv()
@@ -1167,6 +1472,9 @@ def main():
     parser.add_argument("--plain", action="store_true", help="Bypass LLM formatter and use deterministic bullets.")
     parser.add_argument("--json-only", action="store_true", help="Only print parser JSON and exit.")
     parser.add_argument("--campuses", type=str, help="Comma-separated campuses to include (e.g., 'UCB,UCD' or 'berkeley,ucsd').")
+    parser.add_argument("--batch", metavar="PATH", help="Answer JSONL prompts from PATH ('-' for stdin), one JSONL result per line.")
+    parser.add_argument("--workers", type=int, default=AI_AGENT_BATCH_WORKERS, help="Concurrent prompts in --batch mode.")
+    parser.add_argument("--output", "-o", metavar="PATH", help="Write --batch results to PATH instead of stdout.")
     args = parser.parse_args()
 
     client = OpenAI(api_key=api_key)
@@ -1191,14 +1499,22 @@ def main():
         else:
             print("CLI campuses: none recognized; falling back to parsed input", file=sys.stderr)
 
+    if args.batch:
+        source = sys.stdin if args.batch == "-" else open(args.batch, encoding="utf-8")
+        out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+        try:
+            failures = run_batch(client, repo, source, out, workers=args.workers, json_only=args.json_only)
+        finally:
+            if source is not sys.stdin:
+                source.close()
+            if out is not sys.stdout:
+                out.close()
+        if failures:
+            sys.exit(1)
+        return
+
     # If prompt is provided as argument (from Flask), process it directly
     if args.prompt:
-        user_q = args.prompt
-        query_id = 1
-        
-        # When called from Flask as subprocess, use plain formatting for consistency
-        use_plain = True
-        
         # Load session state if provided
         session_state = {}
         if args.session_state:
@@ -1206,84 +1522,14 @@ def main():
                 session_state = json.loads(args.session_state)
             except json.JSONDecodeError:
                 pass
-        
-        parsed = llm_parse_user_message(client, user_q)
+
+        session_state, text, parsed = _answer_cli_prompt(client, repo, args.prompt, session_state, json_only=args.json_only)
         if args.json_only:
             print(json.dumps(parsed, indent=2, ensure_ascii=False))
-            campus_keys_for_log = parsed.get("parameters", {}).get("campuses") or repo.get_campuses()
-            campus_key_for_log = (campus_keys_for_log[0] if campus_keys_for_log else "UCB")
-            append_logs(user_q, parsed, "", campus_key_for_log, [], set(), set(), query_id)
             return
-
-        #campuses for this session
-        available = repo.get_campuses()
-        campus_keys = session_state.get("campuses", [])
-        prompt_campuses = parsed.get("parameters", {}).get("campuses") or detect_campuses_from_query(user_q)
-
-        if prompt_campuses:
-            campus_keys = prompt_campuses
-        
-        if not campus_keys:
-            # Output state first, then error message
-            print(json.dumps(session_state))
-            print("Sorry, I couldn't detect a campus. Try UC Berkeley (UCB), UC Davis (UCD), or UC San Diego (UCSD).")
-            return
-        
-        campus_keys = [ck for ck in campus_keys if ck in available]
-        if not campus_keys:
-            print(json.dumps(session_state))
-            print("Could not find data for the requested campus(es).")
-            return
-
-        #persistent state across the session
-        completed_courses: Set[str] = set(parsed["filters"]["completed_courses"]) | set(session_state.get("completed_courses", []))
-        completed_domains: Set[str] = set(parsed["filters"]["domains_completed"]) | set(session_state.get("completed_domains", []))
-        focus_only = parsed["filters"]["focus_only"]
-        required_only = parsed["filters"]["required_only"]
-        categories_only: List[str] = parsed["filters"].get("categories") or session_state.get("categories", [])
-
-        # Use repository to get filtered courses
-        campus_to_remaining = repo.get_courses(
-            campus_keys=campus_keys,
-            categories=categories_only if categories_only else None,
-            required_only=required_only,
-            focus_only=focus_only,
-            completed_courses=completed_courses,
-            completed_domains=completed_domains
-        )
-
-        # Format and output the response
-        formatted = llm_format_response_multi(
-            client,
-            campus_keys,
-            campus_to_remaining,
-            parsed,
-            completed_courses,
-            completed_domains,
-            plain=use_plain
-        )
-        
-        # Update and output session state first (JSON), then the response
-        updated_state = {
-            "campuses": campus_keys,
-            "completed_courses": sorted(list(completed_courses)),
-            "completed_domains": sorted(list(completed_domains)),
-            "categories": categories_only
-        }
-        print(json.dumps(updated_state))
-        print(formatted)
-        
-        # Log this query
-        append_logs(
-            user_q,
-            parsed,
-            formatted,
-            "MULTI:" + ",".join(campus_keys),
-            [r for ck in campus_keys for r in campus_to_remaining.get(ck, [])],
-            completed_courses,
-            completed_domains,
-            query_id
-        )
+        # Output session state first (JSON), then the response
+        print(json.dumps(session_state))
+        print(text)
         return
 
     # Interactive mode if no prompt provided
@@ -0,0 +1,274 @@
+# backend/conversation_logger.py — buffered conversation logging
+# Used by ai_agent.append_logs():
+# get_conversation_logger(csv_path, jsonl_path).log(row) → queues one row and returns
+# A single background thread owns every file handle, drains the queue in
+# batches, and rotates files once they pass CONVERSATION_LOG_MAX_BYTES.
+# Output formats (CONVERSATION_LOG_FORMATS, comma-separated):
+#   csv     — data/conversation_log.csv (default)
+#   jsonl   — data/user_log.jsonl (default)
+#   parquet — data/conversation_log-<stamp>-<pid>.parquet (needs pyarrow)
+#   arrow   — data/conversation_log-<stamp>-<pid>.arrow, Arrow IPC stream (needs pyarrow)
+# Columnar files are finalized on rotation, every CONVERSATION_LOG_ROLL_SECS,
+# and at exit; only finalized files are readable by analytics.
+
+import atexit
+import csv
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as pa_ipc
+    import pyarrow.parquet as pq
+except ImportError:  # optional: only needed for columnar output
+    pa = None
+
+logger = logging.getLogger(__name__)
+
+CONVERSATION_LOG_FIELDS = [
+    "session_id",
+    "query_id",
+    "timestamp",
+    "campus",
+    "prompt",
+    "parsed_json",
+    "completed_domains",
+    "completed_courses",
+    "results",
+    "response",
+]
+_INT_FIELDS = {"query_id", "results"}
+
+LOG_FORMATS = [
+    f.strip().lower()
+    for f in os.getenv("CONVERSATION_LOG_FORMATS", "csv,jsonl").split(",")
+    if f.strip()
+]
+LOG_MAX_BYTES = int(os.getenv("CONVERSATION_LOG_MAX_BYTES", str(256 * 1024 * 1024)))
+LOG_FLUSH_INTERVAL_SECS = float(os.getenv("CONVERSATION_LOG_FLUSH_INTERVAL_SECS", "1.0"))
+LOG_ROLL_SECS = float(os.getenv("CONVERSATION_LOG_ROLL_SECS", "3600"))
+LOG_MAX_QUEUE = int(os.getenv("CONVERSATION_LOG_MAX_QUEUE", "10000"))
+_BATCH_MAX_ROWS = 1000
+
+
+def _unique_path(root: str, ext: str) -> str:
+    """<root>.<ext>, or <root>.<n>.<ext> if a file with that name already exists."""
+    path, n = f"{root}.{ext}", 0
+    while os.path.exists(path):
+        n += 1
+        path = f"{root}.{n}.{ext}"
+    return path
+
+
+def _rotated_path(path: str) -> str:
+    root, ext = os.path.splitext(path)
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    return _unique_path(f"{root}.{stamp}", ext.lstrip("."))
+
+
+class _TextSink:
+    """CSV or JSONL file kept open between batches."""
+
+    def __init__(self, path: str, kind: str, max_bytes: int):
+        self.path = path
+        self.kind = kind
+        self.max_bytes = max_bytes
+        self.f = None
+        self.writer = None
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self.f = open(self.path, "a", newline="", encoding="utf-8")
+        if self.kind == "csv":
+            self.writer = csv.DictWriter(self.f, fieldnames=CONVERSATION_LOG_FIELDS)
+            if self.f.tell() == 0:
+                self.writer.writeheader()
+
+    def write(self, rows):
+        if self.f is None:
+            self._open()
+        if self.kind == "csv":
+            self.writer.writerows(rows)
+        else:
+            self.f.write("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in rows))
+        self.f.flush()
+        if self.f.tell() >= self.max_bytes:
+            self.close()
+            os.replace(self.path, _rotated_path(self.path))
+
+    def close(self):
+        if self.f is not None:
+            self.f.close()
+            self.f = None
+            self.writer = None
+
+
+class _ColumnarSink:
+    """Parquet or Arrow IPC file; each batch becomes one record batch / row group."""
+
+    def __init__(self, base_path: str, kind: str, max_bytes: int, roll_secs: float):
+        if pa is None:
+            raise ValueError(f"CONVERSATION_LOG_FORMATS includes '{kind}' but pyarrow is not installed.")
+        self.base_path = base_path
+        self.kind = kind
+        self.max_bytes = max_bytes
+        self.roll_secs = roll_secs
+        self.schema = pa.schema([
+            (name, pa.int64() if name in _INT_FIELDS else pa.string())
+            for name in CONVERSATION_LOG_FIELDS
+        ])
+        self.writer = None
+        self.path = None
+        self.opened_at = 0.0
+
+    def _open(self):
+        stamp = datetime.now().strftime("%Y%m%dT%H%M%S")
+        ext = "parquet" if self.kind == "parquet" else "arrow"
+        self.path = _unique_path(f"{self.base_path}-{stamp}-{os.getpid()}", ext)
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        if self.kind == "parquet":
+            self.writer = pq.ParquetWriter(self.path, self.schema, compression="zstd")
+        else:
+            self.writer = pa_ipc.new_stream(self.path, self.schema)
+        self.opened_at = time.monotonic()
+
+    def write(self, rows):
+        if self.writer is None:
+            self._open()
+        columns = {name: [r.get(name) for r in rows] for name in CONVERSATION_LOG_FIELDS}
+        self.writer.write_batch(pa.RecordBatch.from_pydict(columns, schema=self.schema))
+        if os.path.getsize(self.path) >= self.max_bytes:
+            self.close()
+
+    def maybe_roll(self):
+        if self.writer is not None and time.monotonic() - self.opened_at >= self.roll_secs:
+            self.close()
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+
+class ConversationLogger:
+    """Queue + single background writer for per-query conversation logs."""
+
+    def __init__(
+        self,
+        csv_path: str,
+        jsonl_path: str,
+        formats=None,
+        max_bytes: int = LOG_MAX_BYTES,
+        flush_interval: float = LOG_FLUSH_INTERVAL_SECS,
+        roll_secs: float = LOG_ROLL_SECS,
+        max_queue: int = LOG_MAX_QUEUE,
+    ):
+        formats = list(formats or LOG_FORMATS)
+        columnar_base = os.path.splitext(csv_path)[0]
+        self.sinks = []
+        for kind in formats:
+            if kind == "csv":
+                self.sinks.append(_TextSink(csv_path, "csv", max_bytes))
+            elif kind == "jsonl":
+                self.sinks.append(_TextSink(jsonl_path, "jsonl", max_bytes))
+            elif kind in ("parquet", "arrow"):
+                self.sinks.append(_ColumnarSink(columnar_base, kind, max_bytes, roll_secs))
+            else:
+                raise ValueError(f"Unknown conversation log format: {kind}")
+
+        self.flush_interval = flush_interval
+        self._write_lock = threading.Lock()
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._thread = threading.Thread(target=self._run, name="conversation-logger", daemon=True)
+        self._thread.start()
+        self._closed = False
+
+    def log(self, row: dict) -> None:
+        """Queue one row; falls back to writing inline if the queue is full."""
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            self._write([row])
+
+    def flush(self, timeout: float | None = None) -> None:
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait(timeout)
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join(timeout=10)
+
+    def _run(self):
+        while True:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                self._roll_columnar()
+                continue
+
+            rows, waiters, stop = [], [], False
+            while True:
+                if item is None:
+                    stop = True
+                elif isinstance(item, threading.Event):
+                    waiters.append(item)
+                else:
+                    rows.append(item)
+                if stop or len(rows) >= _BATCH_MAX_ROWS:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+
+            if rows:
+                self._write(rows)
+            self._roll_columnar()
+            for waiter in waiters:
+                waiter.set()
+            if stop:
+                with self._write_lock:
+                    for sink in self.sinks:
+                        sink.close()
+                return
+
+    def _write(self, rows):
+        with self._write_lock:
+            self._write_sinks(rows)
+
+    def _write_sinks(self, rows):
+        for sink in self.sinks:
+            try:
+                sink.write(rows)
+            except Exception as exc:
+                logger.exception("conversation_log_write_failed sink=%s error=%s", sink.kind, str(exc))
+
+    def _roll_columnar(self):
+        with self._write_lock:
+            for sink in self.sinks:
+                if isinstance(sink, _ColumnarSink):
+                    sink.maybe_roll()
+
+
+_logger_instance = None
+_logger_lock = threading.Lock()
+
+
+def get_conversation_logger(csv_path: str, jsonl_path: str) -> ConversationLogger:
+    """Get or create the process-wide ConversationLogger (singleton pattern)."""
+    global _logger_instance
+    if _logger_instance is None:
+        with _logger_lock:
+            if _logger_instance is None:
+                _logger_instance = ConversationLogger(csv_path, jsonl_path)
+                atexit.register(_logger_instance.close)
+    return _logger_instance
@@ -6,7 +6,7 @@ retrieval. Legacy assist_data is kept for staged migration.
 """
 
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, DateTime, Index, Text, JSON, Boolean, Numeric
+from sqlalchemy import Column, Integer, String, DateTime, Index, Text, JSON, Boolean, Numeric, LargeBinary, func, literal_column
 from sqlalchemy.ext.declarative import declarative_base
 
 Base = declarative_base()
@@ -38,6 +38,16 @@ class AssistData(Base):
         return f"<AssistData(id={self.id}, source='{self.source_college}', target='{self.target_college}', major='{self.major}')>"
 
 
+# One record per source/target/major (NULL major included); ON CONFLICT target for upserts.
+ASSIST_DATA_UNIQUE_INDEX = Index(
+    "uq_assist_source_target_major",
+    AssistData.source_college,
+    AssistData.target_college,
+    func.coalesce(AssistData.major, literal_column("''")),
+    unique=True,
+)
+
+
 class TransferRule(Base):
     """
     Table 1 (SQL-first): Transfer rule rows used by the backend query layer.
@@ -95,6 +105,60 @@ class TransferRule(Base):
         )
 
 
+# get_courses(): equality on source/target/year, rows already in category/course order.
+# On PostgreSQL the INCLUDE columns make it covering, so retrieval is an index-only scan.
+TRANSFER_RETRIEVAL_INDEX = Index(
+    "idx_transfer_retrieval",
+    TransferRule.source_college,
+    TransferRule.target_college,
+    TransferRule.academic_year,
+    TransferRule.category_name,
+    TransferRule.dvc_course_code,
+    postgresql_include=[
+        "dvc_course_title",
+        "dvc_units",
+        "uc_course_code",
+        "uc_course_title",
+        "uc_units",
+        "minimum_required",
+        "is_required",
+        "domain",
+    ],
+)
+
+
+# Per-major retrieval: one major's rules for a campus/year, however many majors are loaded.
+TRANSFER_MAJOR_INDEX = Index(
+    "idx_transfer_campus_major_year",
+    TransferRule.target_college,
+    TransferRule.major,
+    TransferRule.academic_year,
+)
+
+
+class SyncChecksum(Base):
+    """
+    Content hash of each source record last loaded by an incremental job
+    (e.g. the assist_data -> transfer_rules migration), so reruns can skip
+    sources that have not changed.
+    """
+    __tablename__ = "sync_checksums"
+
+    id = Column(Integer, primary_key=True, index=True)
+    scope = Column(String(64), nullable=False)          # e.g., "assist_to_transfer_rules"
+    source_key = Column(String(255), nullable=False)    # e.g., "DVC|UCB|Computer Science"
+    content_hash = Column(String(64), nullable=False)   # sha256 hex
+    row_count = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        Index("idx_sync_scope_key", "scope", "source_key", unique=True),
+    )
+
+    def __repr__(self):
+        return f"<SyncChecksum(scope='{self.scope}', source_key='{self.source_key}', hash='{self.content_hash[:12]}')>"
+
+
 class ChatHistory(Base):
     """
     Table 2: Dynamic Memory Storage
@@ -106,7 +170,9 @@ class ChatHistory(Base):
     id = Column(Integer, primary_key=True, index=True)
     session_id = Column(String(64), nullable=False, index=True)  # e.g., "sess_a3f2e1"
     role = Column(String(20), nullable=False)  # "user" or "assistant"
-    content = Column(Text, nullable=False)  # The actual message
+    content = Column(Text, nullable=False)  # The actual message ("" when stored in message_blobs)
+    content_hash = Column(String(64), nullable=True, index=True)  # message_blobs key for large messages
+    entities = Column(JSON, nullable=True)  # user messages: campuses/filters/courses extracted on write
     timestamp = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
 
     # Indexes for efficient session retrieval
@@ -116,3 +182,70 @@ class ChatHistory(Base):
 
     def __repr__(self):
         return f"<ChatHistory(id={self.id}, session_id='{self.session_id}', role='{self.role}', timestamp={self.timestamp})>"
+
+
+class MessageBlob(Base):
+    """
+    Content-addressed store for large message bodies (mostly assistant
+    markdown tables). Identical replies are stored once and referenced from
+    chat_history.content_hash.
+    """
+    __tablename__ = "message_blobs"
+
+    content_hash = Column(String(64), primary_key=True)  # sha256 hex of the UTF-8 content
+    content = Column(Text, nullable=False)
+    size = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    last_used_at = Column(DateTime, default=datetime.utcnow, nullable=False)  # refreshed at most daily
+
+    def __repr__(self):
+        return f"<MessageBlob(hash='{self.content_hash[:12]}', size={self.size})>"
+
+
+class SessionTranscript(Base):
+    """
+    Read model: one row per session with its recent messages, count, state and
+    entity context, so a session is rebuilt with a single primary-key lookup
+    instead of one ORM object per message. Maintained by save_message() in
+    constant work per message; chat_history stays the source of truth.
+    """
+    __tablename__ = "session_transcripts"
+
+    session_id = Column(String(64), primary_key=True)
+    # zlib-compressed JSON of the last TRANSCRIPT_WINDOW_MESSAGES
+    # [{role, content | content_hash, timestamp, entities?}]; blob bodies by hash
+    messages = Column(LargeBinary, nullable=False)
+    message_count = Column(Integer, nullable=False, default=0)  # all messages, not just the window
+    state = Column(JSON, nullable=True)  # campuses, completed_courses, completed_domains, categories
+    context = Column(JSON, nullable=True)  # rolling entity context, updated per message (entity_extractor)
+    base_context = Column(JSON, nullable=True)  # the same context folded over the messages before the window
+    version = Column(Integer, nullable=False, default=0)  # bumped on every write
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<SessionTranscript(session_id='{self.session_id}', messages={self.message_count}, version={self.version})>"
+
+
+class ChatHistoryArchive(Base):
+    """
+    Cold copy of chat_history rows moved out by the retention job when it
+    archives to a table instead of files (the SQLite / non-partitioned
+    fallback). Same columns as chat_history plus archived_at.
+    """
+    __tablename__ = "chat_history_archive"
+
+    id = Column(Integer, primary_key=True)  # original chat_history id
+    session_id = Column(String(64), nullable=False)
+    role = Column(String(20), nullable=False)
+    content = Column(Text, nullable=False)
+    content_hash = Column(String(64), nullable=True)
+    timestamp = Column(DateTime, nullable=False)
+    archived_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        Index("idx_chat_archive_session_time", "session_id", "timestamp"),
+    )
+
+    def __repr__(self):
+        return f"<ChatHistoryArchive(id={self.id}, session_id='{self.session_id}', role='{self.role}', timestamp={self.timestamp})>"
@@ -3,11 +3,129 @@ PostgreSQL Repository for Transfer Assistant.
 Queries the database for course data, equivalencies, and transfer mappings.
 """
 
-from datetime import datetime
-from typing import List, Dict, Set, Optional
-from sqlalchemy import create_engine
+import base64
+import glob
+import hashlib
+import io
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+import zlib
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from itertools import islice
+from typing import Iterable, List, Dict, Set, Optional
+from sqlalchemy import (
+    and_,
+    bindparam,
+    create_engine,
+    delete,
+    exists,
+    func,
+    insert,
+    inspect,
+    or_,
+    select,
+    text,
+    update,
+)
+from sqlalchemy.exc import IntegrityError, InterfaceError, OperationalError
 from sqlalchemy.orm import Session
-from backend.database.models import AssistData, ChatHistory, TransferRule, Base
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.schema import CreateIndex
+from backend.database.models import (
+    ASSIST_DATA_UNIQUE_INDEX,
+    AssistData,
+    Base,
+    ChatHistory,
+    ChatHistoryArchive,
+    MessageBlob,
+    SessionTranscript,
+    SyncChecksum,
+    TRANSFER_MAJOR_INDEX,
+    TRANSFER_RETRIEVAL_INDEX,
+    TransferRule,
+)
+from backend.entity_extractor import message_entities, new_session_context, update_session_context
+from backend.resilience import CLOSED, OPEN, CircuitBreaker, CircuitOpenError
+
+try:
+    import fcntl
+except ImportError:  # Windows: local dev runs a single process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+BULK_BATCH_ROWS = int(os.getenv("TRANSFER_RULES_BULK_BATCH_ROWS", "5000"))
+CHAT_PARTITION_MONTHS_AHEAD = int(os.getenv("CHAT_PARTITION_MONTHS_AHEAD", "2"))
+MESSAGE_BLOB_MIN_BYTES = int(os.getenv("MESSAGE_BLOB_MIN_BYTES", "1024"))
+# Recent messages kept in a session's transcript row; older ones are read from chat_history.
+TRANSCRIPT_WINDOW_MESSAGES = int(os.getenv("TRANSCRIPT_WINDOW_MESSAGES", "32"))
+TRANSCRIPT_STATE_KEYS = ("campuses", "majors", "completed_courses", "completed_domains", "categories")
+# How long a loaded (campus, year, major) partition of transfer_rules is served from memory.
+CATALOG_CACHE_SECONDS = float(os.getenv("CATALOG_CACHE_SECONDS", "300"))
+# Most partitions (and per-campus major lists) kept; least recently used go first.
+CATALOG_CACHE_MAX_ENTRIES = int(os.getenv("CATALOG_CACHE_MAX_ENTRIES", "1024"))
+# sync_checksums row every transfer_rules load rewrites, so other processes drop their cache.
+CATALOG_VERSION_KEY = ("catalog", "transfer_rules")
+DB_CONNECT_TIMEOUT_SECONDS = int(os.getenv("DB_CONNECT_TIMEOUT_SECONDS", "5"))
+DB_BREAKER_FAILURES = int(os.getenv("DB_BREAKER_FAILURES", "3"))
+DB_PROBE_INTERVAL_SECONDS = float(os.getenv("DB_PROBE_INTERVAL_SECONDS", "5"))
+DB_SPILL_DIR = os.getenv("DB_SPILL_DIR", "data/db_spill")
+
+# Partition key for "every major" (no major filter); None is the NULL-major partition.
+ALL_MAJORS = "*"
+
+# Errors that mean "the database is unreachable", as opposed to a bad statement.
+_CONNECTION_ERRORS = (OperationalError, InterfaceError)
+
+
+def _pid_alive(pid: int) -> bool:
+    """Whether another worker process is still running (its spill claims are its own)."""
+    if fcntl is None:
+        return False  # single-process platforms; os.kill would terminate the pid there
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass  # exists, owned by another user
+    return True
+
+
+_TRANSFER_RULE_COLUMNS = [
+    "source_college",
+    "target_college",
+    "academic_year",
+    "major",
+    "category_name",
+    "minimum_required",
+    "is_required",
+    "domain",
+    "dvc_course_code",
+    "dvc_course_title",
+    "dvc_units",
+    "uc_course_code",
+    "uc_course_title",
+    "uc_units",
+    "created_at",
+    "updated_at",
+]
+# Identity of a rule within a source/target/major scope, and the columns compared on sync.
+_TRANSFER_RULE_KEY = ("academic_year", "category_name", "dvc_course_code", "uc_course_code")
+_TRANSFER_RULE_VALUES = (
+    "minimum_required",
+    "is_required",
+    "domain",
+    "dvc_course_title",
+    "dvc_units",
+    "uc_course_title",
+    "uc_units",
+)
 
 
 class PostgresRepository:
@@ -28,6 +146,10 @@ class PostgresRepository:
             "pool_recycle": 3600,      # Recycle connections after 1 hour
         }
         
+        if database_url.startswith("postgresql"):
+            # Fail fast when the server is unreachable instead of waiting on the OS TCP timeout.
+            connect_args["connect_timeout"] = DB_CONNECT_TIMEOUT_SECONDS
+
         # If using Cloud SQL Unix socket, add special handling
         if "/cloudsql/" in database_url:
             engine_kwargs.update({
@@ -36,8 +158,219 @@ class PostgresRepository:
             })
         
         self.engine = create_engine(database_url, connect_args=connect_args, **engine_kwargs)
+
+        # Health breaker: trips after repeated connection failures. While open, message
+        # writes are spilled to a local file, history reads fail fast (CircuitOpenError),
+        # and catalog reads are served from the last successful result. Only the
+        # background prober closes it, after replaying the spill.
+        self.breaker = CircuitBreaker("database", failure_threshold=DB_BREAKER_FAILURES, half_open_probes=False)
+        self.spill_dir = DB_SPILL_DIR
+        self.spill_path = os.path.join(self.spill_dir, f"chat_spill-{os.getpid()}.jsonl")
+        self._spill_lock = threading.Lock()
+        self._prober: Optional[threading.Thread] = None
+        self._prober_lock = threading.Lock()
+        self._campus_snapshot: Optional[List[str]] = None
+        # (campus, year, major) → (loaded_at, rows), plus ("majors", campus) → known majors;
+        # past CATALOG_CACHE_SECONDS an entry is reloaded, but it is still served while the
+        # database is down. Dropped whenever the catalog version changes.
+        self._catalog_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._catalog_lock = threading.Lock()
+        self._catalog_version: Optional[str] = None
+
         # Verify tables exist
         Base.metadata.create_all(self.engine)
+        self._ensure_schema()
+        # Spills left by workers that exited (crashed, restarted, recycled) before replaying.
+        self._replay_spill_at_startup()
+
+    def _ensure_schema(self) -> None:
+        """
+        create_all() only creates missing tables; add columns and indexes
+        introduced after a table was first created to existing databases.
+        """
+        inspector = inspect(self.engine)
+        for column in (
+            ChatHistory.__table__.c.content_hash,
+            ChatHistory.__table__.c.entities,
+            ChatHistoryArchive.__table__.c.content_hash,
+            SessionTranscript.__table__.c.context,
+            SessionTranscript.__table__.c.base_context,
+        ):
+            table_name = column.table.name
+            if column.name in {c["name"] for c in inspector.get_columns(table_name)}:
+                continue
+            column_type = column.type.compile(dialect=self.engine.dialect)
+            with self.engine.begin() as conn:
+                conn.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {column.name} {column_type}"))
+
+        content_hash_index = next(
+            ix for ix in ChatHistory.__table__.indexes if list(ix.columns) == [ChatHistory.__table__.c.content_hash]
+        )
+        for index in (ASSIST_DATA_UNIQUE_INDEX, content_hash_index, TRANSFER_RETRIEVAL_INDEX, TRANSFER_MAJOR_INDEX):
+            try:
+                with self.engine.begin() as conn:
+                    conn.execute(CreateIndex(index, if_not_exists=True))
+            except Exception as exc:
+                # e.g. duplicate rows left by an older loader; upserts need this index.
+                logger.warning("schema_index_create_failed index=%s error=%s", index.name, str(exc))
+
+        try:
+            self.ensure_chat_partitions()
+        except Exception as exc:
+            logger.warning("chat_partition_create_failed error=%s", str(exc))
+
+    # ==================== DATABASE HEALTH ====================
+
+    @contextmanager
+    def _guard(self):
+        """Run a block against the database under the health breaker."""
+        if self.breaker.state != CLOSED:
+            raise CircuitOpenError("database circuit is open")
+        try:
+            yield
+        except _CONNECTION_ERRORS as exc:
+            self._record_db_failure(exc)
+            raise
+        self.breaker.record_success()
+
+    def _record_db_failure(self, exc: Exception) -> None:
+        logger.warning("db_connection_failed error=%s", str(exc).splitlines()[0] if str(exc) else type(exc).__name__)
+        self.breaker.record_failure(reason=type(exc).__name__)
+        if self.breaker.state == OPEN:
+            # Drop pooled connections to the dead server; the prober reconnects.
+            self.engine.dispose()
+            self._start_prober()
+
+    def _start_prober(self) -> None:
+        with self._prober_lock:
+            if self._prober is not None and self._prober.is_alive():
+                return
+            self._prober = threading.Thread(target=self._probe_until_healthy, name="db-prober", daemon=True)
+            self._prober.start()
+
+    def _probe_until_healthy(self) -> None:
+        """Ping until the database answers, replay every worker's spill, then close the breaker."""
+        while True:
+            time.sleep(DB_PROBE_INTERVAL_SECONDS)
+            try:
+                with self.engine.connect() as conn:
+                    conn.execute(text("SELECT 1"))
+                with self._spill_lock:
+                    replayed = self._replay_spill()
+                    self.breaker.record_success()
+            except Exception as exc:
+                logger.info("db_probe_failed error=%s", str(exc).splitlines()[0] if str(exc) else type(exc).__name__)
+                continue
+            logger.warning("db_recovered replayed_messages=%s", replayed)
+            return
+
+    def _spill_message(
+        self,
+        session_id: str,
+        role: str,
+        content: str,
+        state: Optional[Dict],
+        breaker_was_open: bool = False,
+    ) -> ChatHistory:
+        """Park a message locally while the database is down; replayed in order on recovery."""
+        timestamp = datetime.utcnow()
+        with self._spill_lock:
+            if breaker_was_open and self.breaker.state == CLOSED:
+                # The prober recovered (and replayed) while we waited for the lock.
+                return self._write_message(session_id, role, content, state)
+            entry = {
+                "session_id": session_id,
+                "role": role,
+                "content": content,
+                "state": state,
+                "timestamp": timestamp.isoformat(),
+            }
+            with self._spill_dir_lock(), open(self.spill_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False, default=list) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+        logger.info("chat_message_spilled session_id=%s role=%s", session_id, role)
+        self._start_prober()
+        return ChatHistory(session_id=session_id, role=role, content=content, timestamp=timestamp)
+
+    @contextmanager
+    def _spill_dir_lock(self):
+        """Exclusive cross-process lock on the spill directory (no-op without fcntl)."""
+        os.makedirs(self.spill_dir, exist_ok=True)
+        if fcntl is None:
+            yield
+            return
+        fd = os.open(os.path.join(self.spill_dir, ".lock"), os.O_WRONLY | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    def _claim_spills(self) -> List[str]:
+        """
+        Rename every worker's spill file to a claim of this process, plus claims left
+        by replayers that died. Renaming under the directory lock means no two
+        workers replay the same file, and a writer never appends to a claimed one.
+        """
+        claimed = []
+        if not os.path.isdir(self.spill_dir):
+            return claimed  # nothing was ever spilled here
+        with self._spill_dir_lock():
+            for path in glob.glob(os.path.join(self.spill_dir, "chat_spill-*.jsonl*")):
+                name, _, owner = path.partition(".claimed-")
+                if owner and owner != str(os.getpid()) and _pid_alive(int(owner)):
+                    continue
+                target = f"{name}.claimed-{os.getpid()}"
+                if path != target:
+                    os.replace(path, target)
+                claimed.append(target)
+        return claimed
+
+    def _replay_spill(self) -> int:
+        """Write every worker's spilled messages to the database. Caller holds _spill_lock."""
+        claimed = self._claim_spills()
+        entries = []
+        for path in claimed:
+            with open(path, encoding="utf-8") as f:
+                entries.extend(json.loads(line) for line in f if line.strip())
+        # Several workers' files interleave; replay in the order the messages were sent.
+        entries.sort(key=lambda entry: datetime.fromisoformat(entry["timestamp"]))
+        for done, entry in enumerate(entries):
+            try:
+                self._write_message(
+                    entry["session_id"],
+                    entry["role"],
+                    entry["content"],
+                    entry.get("state"),
+                    timestamp=datetime.fromisoformat(entry["timestamp"]),
+                )
+            except Exception:
+                # Hand what's left back as an unclaimed spill for the next replay.
+                with self._spill_dir_lock(), open(self.spill_path, "a", encoding="utf-8") as f:
+                    for rest in entries[done:]:
+                        f.write(json.dumps(rest, ensure_ascii=False) + "\n")
+                    f.flush()
+                    os.fsync(f.fileno())
+                    for path in claimed:
+                        os.remove(path)
+                raise
+        for path in claimed:
+            os.remove(path)
+        return len(entries)
+
+    def _replay_spill_at_startup(self) -> None:
+        try:
+            with self._spill_lock:
+                replayed = self._replay_spill()
+        except Exception as exc:
+            logger.warning("db_spill_replay_failed error=%s", str(exc).splitlines()[0] if str(exc) else type(exc).__name__)
+            return
+        if replayed:
+            logger.warning("db_spill_replayed replayed_messages=%s", replayed)
+
+    # ==================== CATALOG METHODS ====================
 
     def get_courses(
         self,
@@ -47,8 +380,17 @@ class PostgresRepository:
         focus_only: Optional[str] = None,
         completed_courses: Optional[Set[str]] = None,
         completed_domains: Optional[Set[str]] = None,
+        academic_year: Optional[str] = None,
+        majors: Optional[List[str]] = None,
     ) -> Dict[str, List[Dict]]:
-        """Retrieve SQL transfer rule rows, filtered by campus and user criteria."""
+        """
+        Retrieve SQL transfer rule rows, filtered by campus and user criteria.
+        Rules come from one academic year: `academic_year` if given, otherwise
+        each campus's latest loaded year. With `majors`, only those majors' rules
+        (each major's latest year unless `academic_year` is given) plus the
+        campus-wide (NULL major) ones of the same year are returned; a campus that
+        has no rules for any of them returns all of its rules, as without `majors`.
+        """
         completed_courses = completed_courses or set()
         completed_domains = completed_domains or set()
         completed_courses_upper = {c.upper() for c in completed_courses}
@@ -56,61 +398,195 @@ class PostgresRepository:
         focus_only = (focus_only or "").strip().lower() or None
 
         result: Dict[str, List[Dict]] = {}
+        self._refresh_catalog_version()
 
-        with Session(self.engine) as session:
-            for campus_key in campus_keys:
-                rules = (
-                    session.query(TransferRule)
-                    .filter_by(source_college="DVC", target_college=campus_key)
-                    .order_by(TransferRule.category_name.asc(), TransferRule.dvc_course_code.asc())
-                    .all()
-                )
+        for campus_key in campus_keys:
+            courses: List[Dict] = []
+            for rule in self._campus_rules(campus_key, academic_year, majors):
+                dvc_code = (rule.dvc_course_code or "").strip()
+                dvc_title = rule.dvc_course_title or ""
+                category_name = rule.category_name or ""
+                if not dvc_code:
+                    continue
 
-                courses: List[Dict] = []
-                for rule in rules:
-                    dvc_code = (rule.dvc_course_code or "").strip()
-                    dvc_title = rule.dvc_course_title or ""
-                    category_name = rule.category_name or ""
-                    if not dvc_code:
-                        continue
+                if categories_lower and category_name.strip().lower() not in categories_lower:
+                    continue
 
-                    if categories_lower and category_name.strip().lower() not in categories_lower:
-                        continue
+                if required_only and not rule.is_required:
+                    continue
 
-                    if required_only and not rule.is_required:
-                        continue
+                if dvc_code.upper() in completed_courses_upper:
+                    continue
 
-                    if dvc_code.upper() in completed_courses_upper:
-                        continue
+                domain = self._course_domain(dvc_code, dvc_title, rule.domain)
 
-                    domain = self._course_domain(dvc_code, dvc_title, rule.domain)
+                if domain in completed_domains:
+                    continue
 
-                    if domain in completed_domains:
-                        continue
+                if focus_only in {"cs", "math", "science"} and domain != focus_only:
+                    continue
 
-                    if focus_only in {"cs", "math", "science"} and domain != focus_only:
-                        continue
+                courses.append({
+                    "dvc_code": dvc_code,
+                    "dvc_title": dvc_title,
+                    "dvc_units": float(rule.dvc_units) if rule.dvc_units is not None else 0,
+                    "uc_code": rule.uc_course_code or "",
+                    "uc_title": rule.uc_course_title or "",
+                    "uc_units": float(rule.uc_units) if rule.uc_units is not None else 0,
+                    "category": category_name,
+                    "minimum_required": str(rule.minimum_required or 0),
+                })
 
-                    courses.append({
-                        "dvc_code": dvc_code,
-                        "dvc_title": dvc_title,
-                        "dvc_units": float(rule.dvc_units) if rule.dvc_units is not None else 0,
-                        "uc_code": rule.uc_course_code or "",
-                        "uc_title": rule.uc_course_title or "",
-                        "uc_units": float(rule.uc_units) if rule.uc_units is not None else 0,
-                        "category": category_name,
-                        "minimum_required": str(rule.minimum_required or 0),
-                    })
-
-                result[campus_key] = courses
+            result[campus_key] = courses
 
         return result
 
+    @staticmethod
+    def _campus_rules_query(
+        session: Session,
+        campus_key: str,
+        academic_year: Optional[str] = None,
+        major: Optional[str] = ALL_MAJORS,
+    ):
+        """Rule columns for one campus, year and major partition, in category/course order."""
+        scope = [TransferRule.source_college == "DVC", TransferRule.target_college == campus_key]
+        if major is None:
+            scope.append(TransferRule.major.is_(None))
+        elif major != ALL_MAJORS:
+            scope.append(TransferRule.major == major)
+        if academic_year is None:
+            # Latest year of this partition (a major may be loaded for an older year than
+            # the rest of the campus), resolved in the same statement with an index seek.
+            academic_year = select(func.max(TransferRule.academic_year)).where(*scope).scalar_subquery()
+        query = session.query(
+            TransferRule.dvc_course_code,
+            TransferRule.dvc_course_title,
+            TransferRule.dvc_units,
+            TransferRule.uc_course_code,
+            TransferRule.uc_course_title,
+            TransferRule.uc_units,
+            TransferRule.category_name,
+            TransferRule.minimum_required,
+            TransferRule.is_required,
+            TransferRule.domain,
+            TransferRule.academic_year,
+        ).filter(*scope, TransferRule.academic_year == academic_year)
+        return query.order_by(TransferRule.category_name.asc(), TransferRule.dvc_course_code.asc())
+
+    def _catalog_cached(self, key: tuple, load):
+        """Cached catalog value for `key`, reloaded past CATALOG_CACHE_SECONDS (old value kept while the DB is down)."""
+        with self._catalog_lock:
+            cached = self._catalog_cache.get(key)
+            if cached is not None:
+                self._catalog_cache.move_to_end(key)
+                if time.monotonic() - cached[0] < CATALOG_CACHE_SECONDS:
+                    return cached[1]
+        try:
+            value = load()
+        except (CircuitOpenError, *_CONNECTION_ERRORS):
+            if cached is None:
+                raise
+            logger.info("catalog_snapshot_used key=%s", key)
+            return cached[1]
+        now = time.monotonic()
+        with self._catalog_lock:
+            self._catalog_cache[key] = (now, value)
+            self._catalog_cache.move_to_end(key)
+            if len(self._catalog_cache) > CATALOG_CACHE_MAX_ENTRIES:
+                for stale in [k for k, (at, _) in self._catalog_cache.items() if now - at >= CATALOG_CACHE_SECONDS]:
+                    del self._catalog_cache[stale]
+            while len(self._catalog_cache) > CATALOG_CACHE_MAX_ENTRIES:
+                self._catalog_cache.popitem(last=False)
+        return value
+
+    def _rule_partition(self, campus_key: str, academic_year: Optional[str], major: Optional[str]) -> List[tuple]:
+        """One (campus, year, major) slice of the rules, from memory while fresh."""
+        def load():
+            with self._guard(), Session(self.engine) as session:
+                return self._campus_rules_query(session, campus_key, academic_year, major).all()
+
+        return self._catalog_cached((campus_key, academic_year, major), load)
+
+    def _known_majors(self, campus_key: str) -> Set[str]:
+        return self._catalog_cached(("majors", campus_key), lambda: set(self.get_majors(campus_key)))
+
+    def _refresh_catalog_version(self) -> None:
+        """Drop the cache if another process loaded transfer rules since we last looked (one point read)."""
+        table = SyncChecksum.__table__
+        scope, source_key = CATALOG_VERSION_KEY
+        try:
+            with self._guard(), self.engine.connect() as conn:
+                version = conn.execute(
+                    select(table.c.content_hash).where(table.c.scope == scope, table.c.source_key == source_key)
+                ).scalar()
+        except (CircuitOpenError, *_CONNECTION_ERRORS):
+            return  # serve what we have; the breaker/prober handle the outage
+        if version != self._catalog_version:
+            if self._catalog_version is not None or version is not None:
+                self.invalidate_catalog_cache()
+            self._catalog_version = version
+
+    def _bump_catalog_version(self, conn) -> str:
+        scope, source_key = CATALOG_VERSION_KEY
+        version = uuid.uuid4().hex
+        self._save_sync_checksum(conn, scope, source_key, version)
+        return version
+
+    def _campus_rules(
+        self, campus_key: str, academic_year: Optional[str] = None, majors: Optional[List[str]] = None
+    ) -> List[tuple]:
+        """One campus's rule rows for the given majors (all majors when none are given)."""
+        requested = [m for m in dict.fromkeys(majors or []) if m]
+        if not requested:
+            return self._rule_partition(campus_key, academic_year, ALL_MAJORS)
+        # Only majors the campus has rules for get a partition (and a cache entry);
+        # names come from user input, so unknown ones must not reach the cache.
+        known = self._known_majors(campus_key)
+        majors = [m for m in requested if m in known]
+        if not majors:
+            logger.info("major_not_found campus=%s majors=%s", campus_key, ",".join(requested)[:200])
+            return self._rule_partition(campus_key, academic_year, ALL_MAJORS)
+        # Each major is its own partition, so the number of majors loaded doesn't
+        # change the cost of looking one up.
+        selected = [self._rule_partition(campus_key, academic_year, major) for major in majors]
+        if not any(selected):
+            logger.info("major_not_found campus=%s majors=%s", campus_key, ",".join(majors))
+            return self._rule_partition(campus_key, academic_year, ALL_MAJORS)
+        # Campus-wide rules come from the same year as the majors' rules.
+        shared_year = academic_year or max(partition[0].academic_year for partition in selected if partition)
+        shared = self._rule_partition(campus_key, shared_year, None)
+        if len(selected) == 1 and not shared:
+            return selected[0]
+        rows = [rule for partition in selected for rule in partition] + list(shared)
+        return sorted(rows, key=lambda rule: (rule.category_name or "", rule.dvc_course_code or ""))
+
+    def invalidate_catalog_cache(self) -> None:
+        """Drop cached rule partitions after transfer_rules changed."""
+        with self._catalog_lock:
+            self._catalog_cache.clear()
+
     def get_campuses(self) -> List[str]:
-        """Get list of available campus codes."""
-        with Session(self.engine) as session:
-            records = session.query(TransferRule.target_college).distinct().all()
-            return sorted([r[0] for r in records if r[0]])
+        """Get list of available campus codes (last known list while the database is down)."""
+        try:
+            with self._guard(), Session(self.engine) as session:
+                records = session.query(TransferRule.target_college).distinct().all()
+        except (CircuitOpenError, *_CONNECTION_ERRORS):
+            if self._campus_snapshot is None:
+                raise
+            return list(self._campus_snapshot)
+        self._campus_snapshot = sorted([r[0] for r in records if r[0]])
+        return list(self._campus_snapshot)
+
+    def get_majors(self, campus_key: str, academic_year: Optional[str] = None) -> List[str]:
+        """Majors with rules for a campus (in one year if given); reads idx_transfer_campus_major_year only."""
+        with self._guard(), Session(self.engine) as session:
+            query = session.query(TransferRule.major).filter(
+                TransferRule.target_college == campus_key, TransferRule.major.isnot(None)
+            )
+            if academic_year:
+                query = query.filter(TransferRule.academic_year == academic_year)
+            records = query.distinct().all()
+            return sorted(r[0] for r in records if r[0])
 
     def get_categories(self, campus_key: str, year: str = "2025-2026") -> List[str]:
         """Get list of categories for a specific campus."""
@@ -171,42 +647,214 @@ class PostgresRepository:
         self,
         target_college: str,
         academic_year: str,
-        rows: List[Dict],
+        rows: Iterable[Dict],
         source_college: str = "DVC",
     ) -> int:
         """
-        Replace all transfer rows for a campus/year with the provided row list.
+        Replace all transfer rows for a campus/year with the provided rows.
         This is the SQL-first ingestion path.
         """
-        with Session(self.engine) as session:
-            session.query(TransferRule).filter_by(
-                source_college=source_college,
-                target_college=target_college,
-                academic_year=academic_year,
-            ).delete()
+        defaults = {
+            "source_college": source_college,
+            "target_college": target_college,
+            "academic_year": academic_year,
+        }
+        stats = self.bulk_load_transfer_rules(
+            ({**row, **defaults} for row in rows),
+            replace_scopes=[defaults],
+        )
+        return stats["rows"]
+
+    def bulk_load_transfer_rules(
+        self,
+        rows: Iterable[Dict],
+        replace_scopes: Optional[List[Dict]] = None,
+        batch_size: int = BULK_BATCH_ROWS,
+    ) -> Dict:
+        """
+        Stream transfer rule rows into the table in a single transaction.
+
+        replace_scopes: column/value filters (e.g. {"target_college": "UCB",
+        "academic_year": "2025-2026"}) whose existing rows are deleted first.
+        Uses COPY on PostgreSQL (psycopg2) and batched executemany INSERTs
+        elsewhere. Returns {"rows", "seconds", "rows_per_sec", "method"}.
+        """
+        table = TransferRule.__table__
+        use_copy = self.engine.dialect.name == "postgresql" and self.engine.dialect.driver == "psycopg2"
+        now = datetime.utcnow()
+        normalized = (self._transfer_rule_values(row, now) for row in rows)
+        total = 0
+        started = time.perf_counter()
+
+        with self.engine.begin() as conn:
+            if replace_scopes:
+                conn.execute(delete(table).where(or_(*[
+                    and_(*[table.c[col] == value for col, value in scope.items()])
+                    for scope in replace_scopes
+                ])))
+
+            while True:
+                batch = list(islice(normalized, batch_size))
+                if not batch:
+                    break
+                if use_copy:
+                    self._copy_transfer_rules(conn, batch)
+                else:
+                    conn.execute(insert(table), batch)
+                total += len(batch)
+            version = self._bump_catalog_version(conn)
+
+        self.invalidate_catalog_cache()
+        self._catalog_version = version
+        seconds = time.perf_counter() - started
+        return {
+            "rows": total,
+            "seconds": round(seconds, 3),
+            "rows_per_sec": round(total / seconds, 1) if seconds > 0 else float(total),
+            "method": "copy" if use_copy else "executemany",
+        }
+
+    @staticmethod
+    def _transfer_rule_values(row: Dict, now: datetime) -> Dict:
+        """Normalize one input row to the full transfer_rules column set."""
+        return {
+            "source_college": row.get("source_college") or "DVC",
+            "target_college": row["target_college"],
+            "academic_year": row["academic_year"],
+            "major": row.get("major"),
+            "category_name": row.get("category_name") or "",
+            "minimum_required": int(row.get("minimum_required") or 0),
+            "is_required": bool(row.get("is_required", False)),
+            "domain": (row.get("domain") or "other").lower(),
+            "dvc_course_code": row.get("dvc_course_code") or "",
+            "dvc_course_title": row.get("dvc_course_title") or "",
+            "dvc_units": row.get("dvc_units"),
+            "uc_course_code": row.get("uc_course_code"),
+            "uc_course_title": row.get("uc_course_title"),
+            "uc_units": row.get("uc_units"),
+            "created_at": now,
+            "updated_at": now,
+        }
+
+    @staticmethod
+    def _copy_transfer_rules(conn, batch: List[Dict]) -> None:
+        """COPY one batch through the connection's psycopg2 cursor (same transaction)."""
+        # Quote every value so '' stays an empty string; NULL is the unquoted \N.
+        buf = io.StringIO()
+        for values in batch:
+            buf.write(",".join(
+                r"\N" if values[col] is None else '"' + str(values[col]).replace('"', '""') + '"'
+                for col in _TRANSFER_RULE_COLUMNS
+            ))
+            buf.write("\n")
+        buf.seek(0)
+        cursor = conn.connection.cursor()
+        try:
+            cursor.copy_expert(
+                f"COPY transfer_rules ({', '.join(_TRANSFER_RULE_COLUMNS)}) FROM STDIN WITH (FORMAT csv, NULL '\\N')",
+                buf,
+            )
+        finally:
+            cursor.close()
+
+    def sync_transfer_rules(
+        self,
+        scope: Dict,
+        rows: Iterable[Dict],
+        checksum: Optional[Dict] = None,
+    ) -> Dict:
+        """
+        Make the transfer rules in `scope` (column/value filters, e.g.
+        source_college/target_college/major) match `rows`, touching only rows
+        that differ: new rules are inserted, changed ones updated in place and
+        missing ones deleted.
 
+        checksum: optional {"scope", "source_key", "content_hash"} recorded via
+        save_sync_checksum in the same transaction.
+        Returns {"inserted", "updated", "deleted", "unchanged"} counts.
+        """
+        table = TransferRule.__table__
+        now = datetime.utcnow()
+        where = and_(*[table.c[col] == value for col, value in scope.items()])
+
+        def rule_key(values) -> tuple:
+            return tuple(values[col] or "" for col in _TRANSFER_RULE_KEY)
+
+        with self.engine.begin() as conn:
+            current = {}
+            duplicates = []
+            for existing in conn.execute(
+                select(table.c.id, *[table.c[col] for col in _TRANSFER_RULE_KEY + _TRANSFER_RULE_VALUES]).where(where)
+            ).mappings():
+                key = rule_key(existing)
+                if key in current:
+                    duplicates.append(existing["id"])
+                else:
+                    current[key] = existing
+
+            inserts, updates, unchanged = [], [], 0
             for row in rows:
-                rule = TransferRule(
-                    source_college=source_college,
-                    target_college=target_college,
-                    academic_year=academic_year,
-                    major=row.get("major"),
-                    category_name=row.get("category_name", ""),
-                    minimum_required=int(row.get("minimum_required") or 0),
-                    is_required=bool(row.get("is_required", False)),
-                    domain=(row.get("domain") or "other").lower(),
-                    dvc_course_code=row.get("dvc_course_code", ""),
-                    dvc_course_title=row.get("dvc_course_title", ""),
-                    dvc_units=row.get("dvc_units"),
-                    uc_course_code=row.get("uc_course_code"),
-                    uc_course_title=row.get("uc_course_title"),
-                    uc_units=row.get("uc_units"),
-                    updated_at=datetime.utcnow(),
+                values = self._transfer_rule_values({**row, **scope}, now)
+                key = rule_key(values)
+                existing = current.pop(key, None)
+                if existing is None:
+                    inserts.append(values)
+                elif any(existing[col] != values[col] for col in _TRANSFER_RULE_VALUES):
+                    changed = {col: values[col] for col in _TRANSFER_RULE_VALUES}
+                    updates.append({"_id": existing["id"], **changed, "updated_at": now})
+                else:
+                    unchanged += 1
+
+            stale = duplicates + [existing["id"] for existing in current.values()]
+            for start in range(0, len(stale), BULK_BATCH_ROWS):
+                conn.execute(delete(table).where(table.c.id.in_(stale[start:start + BULK_BATCH_ROWS])))
+            if updates:
+                conn.execute(
+                    update(table)
+                    .where(table.c.id == bindparam("_id"))
+                    .values({col: bindparam(col) for col in _TRANSFER_RULE_VALUES + ("updated_at",)}),
+                    updates,
                 )
-                session.add(rule)
+            if inserts:
+                conn.execute(insert(table), inserts)
 
-            session.commit()
-            return len(rows)
+            stats = {
+                "inserted": len(inserts),
+                "updated": len(updates),
+                "deleted": len(stale),
+                "unchanged": unchanged,
+            }
+            if checksum:
+                self._save_sync_checksum(conn, row_count=len(inserts) + len(updates) + unchanged, **checksum)
+            if inserts or updates or stale:
+                self._catalog_version = self._bump_catalog_version(conn)
+        self.invalidate_catalog_cache()
+        return stats
+
+    # ==================== SYNC_CHECKSUM METHODS ====================
+
+    def get_sync_checksums(self, scope: str) -> Dict[str, str]:
+        """Return {source_key: content_hash} recorded for an incremental job."""
+        with Session(self.engine) as session:
+            records = session.query(SyncChecksum.source_key, SyncChecksum.content_hash).filter_by(scope=scope).all()
+            return {key: content_hash for key, content_hash in records}
+
+    def save_sync_checksum(self, scope: str, source_key: str, content_hash: str, row_count: int = 0) -> None:
+        """Record the content hash of a source that was just loaded."""
+        with self.engine.begin() as conn:
+            self._save_sync_checksum(conn, scope, source_key, content_hash, row_count)
+
+    @staticmethod
+    def _save_sync_checksum(conn, scope: str, source_key: str, content_hash: str, row_count: int = 0) -> None:
+        table = SyncChecksum.__table__
+        values = {"content_hash": content_hash, "row_count": row_count, "updated_at": datetime.utcnow()}
+        result = conn.execute(
+            update(table)
+            .where(table.c.scope == scope, table.c.source_key == source_key)
+            .values(**values)
+        )
+        if result.rowcount == 0:
+            conn.execute(insert(table).values(scope=scope, source_key=source_key, **values))
 
     # ==================== ASSIST_DATA METHODS ====================
 
@@ -257,6 +905,76 @@ class PostgresRepository:
                 session.refresh(new_data)
                 return new_data
 
+    def upsert_assist_data(self, records: Iterable[Dict], checksums: Optional[List[Dict]] = None) -> int:
+        """
+        Insert or update many assist_data records in one transaction.
+
+        Each record has source_college, target_college, major, agreements_json.
+        Uses INSERT ... ON CONFLICT DO UPDATE against the source/target/major
+        unique index on PostgreSQL and SQLite.
+        checksums: optional [{"scope", "source_key", "content_hash", "row_count"}]
+        recorded in the same transaction.
+        Returns the number of records written.
+        """
+        table = AssistData.__table__
+        dialect = self.engine.dialect.name
+        now = datetime.utcnow()
+        total = 0
+
+        with self.engine.begin() as conn:
+            batch: List[Dict] = []
+            for record in records:
+                batch.append({
+                    "source_college": record["source_college"],
+                    "target_college": record["target_college"],
+                    "major": record.get("major"),
+                    "agreements_json": record["agreements_json"],
+                    "created_at": now,
+                    "updated_at": now,
+                })
+                if len(batch) >= BULK_BATCH_ROWS:
+                    total += self._upsert_assist_batch(conn, table, dialect, batch)
+                    batch = []
+            if batch:
+                total += self._upsert_assist_batch(conn, table, dialect, batch)
+
+            for checksum in checksums or []:
+                self._save_sync_checksum(conn, **checksum)
+
+        return total
+
+    @staticmethod
+    def _upsert_assist_batch(conn, table, dialect: str, batch: List[Dict]) -> int:
+        if dialect in ("postgresql", "sqlite"):
+            dialect_insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+            # Collapse repeats within the batch; ON CONFLICT can't touch a row twice per statement.
+            unique = {(r["source_college"], r["target_college"], r["major"] or ""): r for r in batch}
+            stmt = dialect_insert(table).values(list(unique.values()))
+            stmt = stmt.on_conflict_do_update(
+                index_elements=list(ASSIST_DATA_UNIQUE_INDEX.expressions),
+                set_={
+                    "agreements_json": stmt.excluded.agreements_json,
+                    "updated_at": stmt.excluded.updated_at,
+                },
+            )
+            conn.execute(stmt)
+            return len(unique)
+
+        # Other databases: select-then-write, still inside the caller's transaction.
+        for record in batch:
+            result = conn.execute(
+                update(table)
+                .where(
+                    table.c.source_college == record["source_college"],
+                    table.c.target_college == record["target_college"],
+                    table.c.major == record["major"],
+                )
+                .values(agreements_json=record["agreements_json"], updated_at=record["updated_at"])
+            )
+            if result.rowcount == 0:
+                conn.execute(insert(table).values(**record))
+        return len(batch)
+
     def get_assist_data(
         self,
         target_college: Optional[str] = None,
@@ -284,28 +1002,307 @@ class PostgresRepository:
 
     # ==================== CHAT_HISTORY METHODS ====================
 
-    def save_message(self, session_id: str, role: str, content: str) -> ChatHistory:
+    def save_message(
+        self,
+        session_id: str,
+        role: str,
+        content: str,
+        state: Optional[Dict] = None,
+    ) -> ChatHistory:
         """
         Save a single chat message to history.
+        The session's transcript row is updated in the same transaction.
         
         Args:
             session_id: Unique session identifier
             role: Either "user" or "assistant"
             content: The message text
+            state: Optional session state to store on the transcript
+                (campuses, completed_courses, completed_domains, categories)
             
         Returns:
-            ChatHistory: The saved message record
+            ChatHistory: The saved message record (unsaved and detached if the
+            database is down and the message was spilled for later replay)
         """
-        with Session(self.engine) as session:
-            message = ChatHistory(
-                session_id=session_id,
-                role=role,
-                content=content
+        try:
+            with self._guard():
+                return self._write_message(session_id, role, content, state)
+        except CircuitOpenError:
+            return self._spill_message(session_id, role, content, state, breaker_was_open=True)
+        except _CONNECTION_ERRORS:
+            return self._spill_message(session_id, role, content, state)
+
+    def _write_message(
+        self,
+        session_id: str,
+        role: str,
+        content: str,
+        state: Optional[Dict],
+        timestamp: Optional[datetime] = None,
+    ) -> ChatHistory:
+        stored_content, content_hash = content, None
+        # Extracted once here, so readers never re-scan history for campuses/filters.
+        entities = (message_entities(content) or None) if role == "user" else None
+        if len(content.encode("utf-8")) >= MESSAGE_BLOB_MIN_BYTES:
+            # Large bodies (mostly repeated assistant tables) are stored once by hash.
+            content_hash = hashlib.sha256(content.encode("utf-8")).hexdigest()
+            stored_content = ""
+
+        for attempt in (1, 2):
+            with Session(self.engine) as session:
+                if content_hash:
+                    self._store_blob(session, content_hash, content)
+                message = ChatHistory(
+                    session_id=session_id,
+                    role=role,
+                    content=stored_content,
+                    content_hash=content_hash,
+                    entities=entities,
+                    timestamp=timestamp or datetime.utcnow(),
+                )
+                session.add(message)
+                session.flush()
+                self._append_to_transcript(session, message, content, state)
+                try:
+                    session.commit()
+                except IntegrityError:
+                    # Another worker created this session's transcript first; retry as an append.
+                    if attempt == 2:
+                        raise
+                    session.rollback()
+                    continue
+                session.refresh(message)
+                session.expunge(message)
+                message.content = content  # callers see the full text either way
+                return message
+
+    def _store_blob(self, session: Session, content_hash: str, content: str) -> None:
+        """Insert the blob if new; refresh last_used_at at most once a day so GC can't race a reuse."""
+        table = MessageBlob.__table__
+        now = datetime.utcnow()
+        stale = now - timedelta(days=1)
+        dialect = self.engine.dialect.name
+        if dialect in ("postgresql", "sqlite"):
+            dialect_insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+            stmt = dialect_insert(table).values(
+                content_hash=content_hash,
+                content=content,
+                size=len(content.encode("utf-8")),
+                created_at=now,
+                last_used_at=now,
             )
-            session.add(message)
-            session.commit()
-            session.refresh(message)
-            return message
+            session.execute(stmt.on_conflict_do_update(
+                index_elements=[table.c.content_hash],
+                set_={"last_used_at": now},
+                where=table.c.last_used_at < stale,
+            ))
+            return
+
+        blob = session.get(MessageBlob, content_hash)
+        if blob is None:
+            session.add(MessageBlob(
+                content_hash=content_hash,
+                content=content,
+                size=len(content.encode("utf-8")),
+                created_at=now,
+                last_used_at=now,
+            ))
+        elif blob.last_used_at < stale:
+            blob.last_used_at = now
+
+    def delete_unreferenced_message_blobs(self, unused_for: timedelta = timedelta(days=7)) -> int:
+        """Remove blobs no hot or archived message references and that haven't been used recently."""
+        blobs = MessageBlob.__table__
+        hot = ChatHistory.__table__
+        cold = ChatHistoryArchive.__table__
+        with self.engine.begin() as conn:
+            result = conn.execute(
+                delete(blobs).where(
+                    blobs.c.last_used_at < datetime.utcnow() - unused_for,
+                    ~exists().where(hot.c.content_hash == blobs.c.content_hash),
+                    ~exists().where(cold.c.content_hash == blobs.c.content_hash),
+                )
+            )
+            return result.rowcount
+
+    @staticmethod
+    def _pack_messages(messages: List[Dict]) -> bytes:
+        return zlib.compress(json.dumps(messages, ensure_ascii=False).encode("utf-8"))
+
+    @staticmethod
+    def _unpack_messages(blob: bytes) -> List[Dict]:
+        return json.loads(zlib.decompress(blob).decode("utf-8"))
+
+    @staticmethod
+    def _message_entry(
+        role: str,
+        content: str,
+        timestamp: datetime,
+        entities: Optional[Dict] = None,
+        content_hash: Optional[str] = None,
+    ) -> Dict:
+        # Blob bodies are referenced by hash, so the transcript doesn't store them again.
+        entry = {"role": role, "content_hash": content_hash} if content_hash else {"role": role, "content": content}
+        entry["timestamp"] = timestamp.isoformat()
+        if entities:
+            entry["entities"] = entities
+        return entry
+
+    @staticmethod
+    def _entry_entities(entry: Dict) -> Optional[Dict]:
+        entities = entry.get("entities")
+        if entry["role"] == "user" and entities is None and "content" in entry:
+            entities = message_entities(entry["content"]) or None  # entries from before entities were stored
+        return entities
+
+    @classmethod
+    def _window_base(cls, transcript: SessionTranscript, window: List[Dict]) -> Optional[Dict]:
+        """Context before the window's first message; None if unknown (an older transcript)."""
+        if transcript.base_context is not None:
+            return transcript.base_context
+        if (transcript.message_count or 0) == len(window):
+            return new_session_context()  # the window holds the whole session
+        return None
+
+    @staticmethod
+    def _resolve_blob_entries(session: Session, messages: List[Dict]) -> List[Dict]:
+        """Swap content_hash references for the blob bodies (one lookup for all of them)."""
+        hashes = {entry["content_hash"] for entry in messages if "content_hash" in entry}
+        if hashes:
+            bodies = dict(
+                session.query(MessageBlob.content_hash, MessageBlob.content)
+                .filter(MessageBlob.content_hash.in_(hashes))
+                .all()
+            )
+            for entry in messages:
+                if "content_hash" in entry:
+                    entry["content"] = bodies.get(entry.pop("content_hash"), "")
+        return messages
+
+    def _append_to_transcript(
+        self,
+        session: Session,
+        message: ChatHistory,
+        content: str,
+        state: Optional[Dict],
+    ) -> None:
+        """
+        Fold one message into the session's read model. The row keeps only the last
+        TRANSCRIPT_WINDOW_MESSAGES entries plus a message count, the rolling context
+        and the context before the window, so a write costs the same however long
+        the session is.
+        """
+        transcript = session.get(SessionTranscript, message.session_id, with_for_update=True)
+        if transcript is None:
+            # First write for this session (or one from before transcripts existed):
+            # seed from chat_history, which already includes the flushed message.
+            rows = (
+                session.query(
+                    ChatHistory.role,
+                    func.coalesce(MessageBlob.content, ChatHistory.content),
+                    ChatHistory.content_hash,
+                    ChatHistory.timestamp,
+                    ChatHistory.entities,
+                )
+                .outerjoin(MessageBlob, MessageBlob.content_hash == ChatHistory.content_hash)
+                .filter(ChatHistory.session_id == message.session_id)
+                .order_by(ChatHistory.timestamp.asc(), ChatHistory.id.asc())
+                .all()
+            )
+            messages, context, base = [], None, None
+            window_start = max(0, len(rows) - TRANSCRIPT_WINDOW_MESSAGES)
+            for n, (role, text_content, content_hash, timestamp, entities) in enumerate(rows):
+                if n == window_start:
+                    base = context or new_session_context()
+                if role == "user" and entities is None:
+                    entities = message_entities(text_content) or None  # rows from before entities were stored
+                messages.append(self._message_entry(role, text_content, timestamp, entities, content_hash))
+                context = update_session_context(context, role, entities)
+            message_count = len(messages)
+            transcript = SessionTranscript(session_id=message.session_id, version=0)
+            session.add(transcript)
+        else:
+            messages = self._unpack_messages(transcript.messages)
+            base = self._window_base(transcript, messages)
+            messages.append(self._message_entry(
+                message.role, content, message.timestamp, message.entities, message.content_hash
+            ))
+            message_count = (transcript.message_count or 0) + 1
+            if transcript.context is None:
+                # Transcript from before contexts were kept (it holds every message inline): fold it once.
+                context = None
+                for entry in messages:
+                    context = update_session_context(context, entry["role"], self._entry_entities(entry))
+            else:
+                context = update_session_context(transcript.context, message.role, message.entities)
+            if base is not None:
+                # Messages leaving the window move into the base context.
+                for entry in messages[:-TRANSCRIPT_WINDOW_MESSAGES]:
+                    base = update_session_context(base, entry["role"], self._entry_entities(entry))
+
+        transcript.messages = self._pack_messages(messages[-TRANSCRIPT_WINDOW_MESSAGES:])
+        transcript.message_count = message_count
+        transcript.context = context
+        transcript.base_context = base
+        transcript.version = (transcript.version or 0) + 1
+        transcript.updated_at = datetime.utcnow()
+        if state is not None:
+            transcript.state = {key: list(state.get(key) or []) for key in TRANSCRIPT_STATE_KEYS}
+
+    def get_transcript(self, session_id: str, limit: Optional[int] = None) -> Optional[Dict]:
+        """
+        Conversation plus latest session state via one primary-key lookup. Messages
+        within the transcript's recent window come from the row itself; asking for
+        more than it keeps reads the rest from chat_history.
+        
+        Args:
+            session_id: Session to retrieve
+            limit: Most recent messages to return (all when None)
+            
+        Returns:
+            {"session_id", "messages": [{"role", "content", "timestamp", "entities"?}],
+            "message_count", "state", "context", "context_before", "version",
+            "updated_at"}, or None if the session has no transcript (e.g. it predates
+            transcripts or was archived). "context" covers the whole session;
+            "context_before" is the context before the first returned message (None
+            if unknown).
+
+        Raises:
+            CircuitOpenError: the database is known to be down
+        """
+        with self._guard(), Session(self.engine) as session:
+            transcript = session.get(SessionTranscript, session_id)
+            if transcript is None:
+                return None
+            window = self._unpack_messages(transcript.messages)
+            wanted = min(limit, transcript.message_count) if limit else transcript.message_count
+            messages, context_before = None, None
+            if wanted <= len(window):
+                start = len(window) - wanted
+                context_before = self._window_base(transcript, window)
+                if context_before is not None:
+                    for entry in window[:start]:
+                        context_before = update_session_context(context_before, entry["role"], self._entry_entities(entry))
+                messages = self._resolve_blob_entries(session, window[start:])
+            elif wanted == transcript.message_count:
+                context_before = new_session_context()
+            result = {
+                "session_id": transcript.session_id,
+                "messages": messages,
+                "message_count": transcript.message_count,
+                "state": transcript.state or {},
+                "context": transcript.context,
+                "context_before": context_before,
+                "version": transcript.version,
+                "updated_at": transcript.updated_at,
+            }
+        if messages is None:
+            # Older than the kept window (exports, rebuilding a whole session).
+            result["messages"] = [
+                self._message_entry(row.role, row.content, row.timestamp, getattr(row, "entities", None))
+                for row in self.get_chat_history(session_id, limit=limit)
+            ]
+        return result
 
     def get_chat_history(
         self, 
@@ -321,16 +1318,35 @@ class PostgresRepository:
             
         Returns:
             List of ChatHistory records, oldest first
-        """
-        with Session(self.engine) as session:
-            query = session.query(ChatHistory).filter_by(session_id=session_id)
 
-            if limit:
-                # Fetch most recent N first, then reverse to keep oldest->newest order.
-                rows = query.order_by(ChatHistory.timestamp.desc()).limit(limit).all()
-                return list(reversed(rows))
+        Raises:
+            CircuitOpenError: the database is known to be down
+        """
+        with self._guard(), Session(self.engine) as session:
+            # Hot table first; sessions moved out by the retention job live in the archive table.
+            for model in (ChatHistory, ChatHistoryArchive):
+                query = (
+                    session.query(model, MessageBlob.content)
+                    .outerjoin(MessageBlob, MessageBlob.content_hash == model.content_hash)
+                    .filter(model.session_id == session_id)
+                )
 
-            return query.order_by(ChatHistory.timestamp.asc()).all()
+                if limit:
+                    # Fetch most recent N first, then reverse to keep oldest->newest order.
+                    pairs = query.order_by(model.timestamp.desc()).limit(limit).all()
+                    pairs.reverse()
+                else:
+                    pairs = query.order_by(model.timestamp.asc()).all()
+                if pairs:
+                    # Detach before swapping in blob content so nothing is written back.
+                    session.expunge_all()
+                    rows = []
+                    for row, blob_content in pairs:
+                        if blob_content is not None:
+                            row.content = blob_content
+                        rows.append(row)
+                    return rows
+            return []
 
     def delete_chat_history(self, session_id: str) -> int:
         """
@@ -344,9 +1360,171 @@ class PostgresRepository:
         """
         with Session(self.engine) as session:
             count = session.query(ChatHistory).filter_by(session_id=session_id).delete()
+            count += session.query(ChatHistoryArchive).filter_by(session_id=session_id).delete()
+            session.query(SessionTranscript).filter_by(session_id=session_id).delete()
             session.commit()
             return count
 
+    def get_session_summaries(
+        self,
+        days: int = 7,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+        preview_chars: int = 60,
+    ) -> Dict:
+        """
+        Summarize sessions active in the last N days in one grouped query.
+
+        Args:
+            days: Number of days to look back
+            limit: Maximum number of sessions per page
+            cursor: Opaque next_cursor from the previous page
+            preview_chars: Length of the first-message preview
+
+        Returns:
+            {"sessions": [{"session_id", "message_count", "started_at",
+            "last_at", "preview"}], "next_cursor": str or None},
+            most recently active first
+
+        Raises:
+            CircuitOpenError: the database is known to be down
+        """
+        cutoff = datetime.utcnow() - timedelta(days=days)
+        active = (
+            select(ChatHistory.session_id)
+            .where(ChatHistory.timestamp >= cutoff)
+            .distinct()
+        )
+        grouped = (
+            select(
+                ChatHistory.session_id.label("session_id"),
+                func.count(ChatHistory.id).label("message_count"),
+                func.min(ChatHistory.timestamp).label("started_at"),
+                func.max(ChatHistory.timestamp).label("last_at"),
+                func.min(ChatHistory.id).label("first_id"),
+            )
+            .where(ChatHistory.session_id.in_(active))
+            .group_by(ChatHistory.session_id)
+        )
+        if cursor:
+            last_at, last_session = self._decode_cursor(cursor)
+            last_session = str(last_session)
+            last_ts = func.max(ChatHistory.timestamp)
+            grouped = grouped.having(or_(
+                last_ts < last_at,
+                and_(last_ts == last_at, ChatHistory.session_id < last_session),
+            ))
+        grouped = grouped.subquery()
+
+        first = ChatHistory.__table__.alias("first_message")
+        query = (
+            select(
+                grouped.c.session_id,
+                grouped.c.message_count,
+                grouped.c.started_at,
+                grouped.c.last_at,
+                func.substr(func.coalesce(MessageBlob.content, first.c.content), 1, preview_chars).label("preview"),
+            )
+            .join(first, first.c.id == grouped.c.first_id)
+            .outerjoin(MessageBlob, MessageBlob.content_hash == first.c.content_hash)
+            .order_by(grouped.c.last_at.desc(), grouped.c.session_id.desc())
+            .limit(limit + 1)
+        )
+
+        with self._guard(), self.engine.connect() as conn:
+            rows = conn.execute(query).mappings().all()
+
+        page = [dict(row) for row in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            next_cursor = self._encode_cursor(page[-1]["last_at"], page[-1]["session_id"])
+        return {"sessions": page, "next_cursor": next_cursor}
+
+    @staticmethod
+    def _encode_cursor(timestamp: datetime, key) -> str:
+        """Opaque keyset cursor for (timestamp, tiebreak key) pagination."""
+        raw = json.dumps([timestamp.isoformat(), key]).encode("utf-8")
+        return base64.urlsafe_b64encode(raw).decode("ascii")
+
+    @staticmethod
+    def _decode_cursor(cursor: str):
+        try:
+            timestamp, key = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+            return datetime.fromisoformat(timestamp), key
+        except Exception:
+            raise ValueError("Invalid cursor")
+
+    def get_chat_history_page(
+        self,
+        session_id: str,
+        limit: int = 50,
+        before: Optional[str] = None,
+    ) -> Dict:
+        """
+        One page of a session's messages using keyset pagination over
+        (session_id, timestamp, id): the newest `limit` messages, or those
+        just older than the `before` cursor.
+        
+        Args:
+            session_id: Session to read
+            limit: Maximum number of messages to return
+            before: next_cursor from a previous page
+            
+        Returns:
+            {"messages": [{"id", "role", "content", "timestamp"}] oldest first,
+            "next_cursor": cursor for the older page, or None at the start}
+
+        Raises:
+            CircuitOpenError: the database is known to be down
+        """
+        before_key = None
+        if before:
+            before_ts, before_id = self._decode_cursor(before)
+            before_key = (before_ts, int(before_id))
+
+        rows = []
+        with self._guard(), self.engine.connect() as conn:
+            # Archived rows are older than the hot ones and keep their chat_history ids,
+            # so once the hot table runs out the same keyset continues in the archive.
+            for model in (ChatHistory, ChatHistoryArchive):
+                table = model.__table__
+                query = (
+                    select(
+                        table.c.id,
+                        table.c.role,
+                        func.coalesce(MessageBlob.content, table.c.content).label("content"),
+                        table.c.timestamp,
+                    )
+                    .outerjoin(MessageBlob, MessageBlob.content_hash == table.c.content_hash)
+                    .where(table.c.session_id == session_id)
+                    .order_by(table.c.timestamp.desc(), table.c.id.desc())
+                    .limit(limit + 1 - len(rows))
+                )
+                if before_key:
+                    query = query.where(or_(
+                        table.c.timestamp < before_key[0],
+                        and_(table.c.timestamp == before_key[0], table.c.id < before_key[1]),
+                    ))
+                rows += conn.execute(query).mappings().all()
+                if len(rows) > limit:
+                    break
+
+        page = [dict(row) for row in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            next_cursor = self._encode_cursor(page[-1]["timestamp"], page[-1]["id"])
+        page.reverse()
+        for message in page:
+            message["timestamp"] = message["timestamp"].isoformat()
+        return {"messages": page, "next_cursor": next_cursor}
+
+    def get_transcript_version(self, session_id: str) -> Optional[int]:
+        """Current transcript version for a session (bumped on every write), or None."""
+        with self._guard(), self.engine.connect() as conn:
+            return conn.execute(
+                select(SessionTranscript.version).where(SessionTranscript.session_id == session_id)
+            ).scalar()
+
     def get_recent_sessions(self, days: int = 7) -> List[str]:
         """
         Get list of session IDs with activity in the last N days.
@@ -368,3 +1546,189 @@ class PostgresRepository:
                 .all()
             )
             return [s[0] for s in sessions]
+
+    # ==================== CHAT_HISTORY RETENTION METHODS ====================
+
+    def get_archivable_sessions(self, older_than: datetime, limit: Optional[int] = 500) -> List[str]:
+        """Session IDs whose most recent message is older than the cutoff, oldest first (limit=None: all)."""
+        last_ts = func.max(ChatHistory.timestamp)
+        query = (
+            select(ChatHistory.session_id)
+            .group_by(ChatHistory.session_id)
+            .having(last_ts < older_than)
+            .order_by(last_ts.asc())
+            .limit(limit)
+        )
+        with self.engine.connect() as conn:
+            return [row[0] for row in conn.execute(query)]
+
+    def get_messages_for_sessions(self, session_ids: List[str], older_than: datetime) -> List[Dict]:
+        """Hot-table messages of the given sessions before the cutoff, grouped by session, oldest first."""
+        table = ChatHistory.__table__
+        blobs = MessageBlob.__table__
+        query = (
+            select(
+                table.c.id,
+                table.c.session_id,
+                table.c.role,
+                func.coalesce(blobs.c.content, table.c.content).label("content"),
+                table.c.timestamp,
+            )
+            .outerjoin(blobs, blobs.c.content_hash == table.c.content_hash)
+            .where(table.c.session_id.in_(session_ids), table.c.timestamp < older_than)
+            .order_by(table.c.session_id, table.c.timestamp, table.c.id)
+        )
+        with self.engine.connect() as conn:
+            return [dict(row) for row in conn.execute(query).mappings()]
+
+    def delete_sessions(self, session_ids: List[str], older_than: datetime) -> int:
+        """
+        Delete the given sessions' messages before the cutoff from the hot
+        table in one short transaction. The cutoff keeps a message that
+        arrives mid-archive (and was not archived) in place.
+        """
+        table = ChatHistory.__table__
+        with self.engine.begin() as conn:
+            result = conn.execute(
+                delete(table).where(table.c.session_id.in_(session_ids), table.c.timestamp < older_than)
+            )
+            self._drop_transcripts(conn, session_ids)
+            return result.rowcount
+
+    def move_sessions_to_archive_table(self, session_ids: List[str], older_than: datetime) -> int:
+        """Move the sessions' messages before the cutoff into chat_history_archive, atomically."""
+        hot = ChatHistory.__table__
+        cold = ChatHistoryArchive.__table__
+        selected = and_(hot.c.session_id.in_(session_ids), hot.c.timestamp < older_than)
+        with self.engine.begin() as conn:
+            conn.execute(
+                insert(cold).from_select(
+                    ["id", "session_id", "role", "content", "content_hash", "timestamp", "archived_at"],
+                    select(hot.c.id, hot.c.session_id, hot.c.role, hot.c.content, hot.c.content_hash,
+                           hot.c.timestamp, func.current_timestamp())
+                    .where(selected),
+                )
+            )
+            result = conn.execute(delete(hot).where(selected))
+            self._drop_transcripts(conn, session_ids)
+            return result.rowcount
+
+    @staticmethod
+    def _drop_transcripts(conn, session_ids: List[str]) -> None:
+        # Archived sessions leave the read model too; get_chat_history still finds
+        # rows moved to the archive table, and a later save_message re-seeds it.
+        table = SessionTranscript.__table__
+        conn.execute(delete(table).where(table.c.session_id.in_(session_ids)))
+
+    # PostgreSQL only: chat_history as a parent table RANGE-partitioned by month.
+
+    def chat_history_is_partitioned(self) -> bool:
+        if self.engine.dialect.name != "postgresql":
+            return False
+        with self.engine.connect() as conn:
+            relkind = conn.execute(
+                text("SELECT relkind FROM pg_class WHERE relname = 'chat_history' AND relkind IN ('r', 'p')")
+            ).scalar()
+        return relkind == "p"
+
+    @staticmethod
+    def _month_start(value: datetime, offset: int = 0) -> datetime:
+        month_index = value.year * 12 + value.month - 1 + offset
+        return datetime(month_index // 12, month_index % 12 + 1, 1)
+
+    @staticmethod
+    def _partition_name(month: datetime) -> str:
+        return f"chat_history_p{month:%Y_%m}"
+
+    def _create_month_partition(self, conn, month: datetime) -> None:
+        conn.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {self._partition_name(month)} PARTITION OF chat_history "
+            f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{self._month_start(month, 1):%Y-%m-%d}')"
+        ))
+
+    def ensure_chat_partitions(self, months_ahead: int = CHAT_PARTITION_MONTHS_AHEAD) -> List[str]:
+        """Create this month's and the next N months' partitions if chat_history is partitioned."""
+        if not self.chat_history_is_partitioned():
+            return []
+        this_month = self._month_start(datetime.utcnow())
+        months = [self._month_start(this_month, i) for i in range(months_ahead + 1)]
+        with self.engine.begin() as conn:
+            for month in months:
+                self._create_month_partition(conn, month)
+        return [self._partition_name(month) for month in months]
+
+    def partition_chat_history(self) -> int:
+        """
+        One-time conversion of a plain chat_history table into a monthly
+        RANGE-partitioned one (PostgreSQL). Rows are copied in one transaction.
+        Returns the number of rows copied.
+        """
+        if self.engine.dialect.name != "postgresql":
+            raise ValueError("chat_history partitioning requires PostgreSQL; use the archive table instead.")
+        if self.chat_history_is_partitioned():
+            return 0
+
+        with self.engine.begin() as conn:
+            bounds = conn.execute(text("SELECT min(timestamp), max(timestamp) FROM chat_history")).one()
+            conn.execute(text("ALTER TABLE chat_history RENAME TO chat_history_unpartitioned"))
+            conn.execute(text(
+                "ALTER TABLE chat_history_unpartitioned RENAME CONSTRAINT chat_history_pkey TO chat_history_pkey_old"
+            ))
+            for index in ChatHistory.__table__.indexes:
+                conn.execute(text(f"ALTER INDEX IF EXISTS {index.name} RENAME TO {index.name}_old"))
+            conn.execute(text("ALTER SEQUENCE chat_history_id_seq OWNED BY NONE"))
+            conn.execute(text(
+                "CREATE TABLE chat_history (LIKE chat_history_unpartitioned INCLUDING DEFAULTS) "
+                "PARTITION BY RANGE (timestamp)"
+            ))
+            # The partition key must be part of the primary key.
+            conn.execute(text("ALTER TABLE chat_history ADD PRIMARY KEY (id, timestamp)"))
+            conn.execute(text("ALTER SEQUENCE chat_history_id_seq OWNED BY chat_history.id"))
+
+            now = datetime.utcnow()
+            month = self._month_start(bounds[0] or now)
+            last = self._month_start(now, CHAT_PARTITION_MONTHS_AHEAD)
+            if bounds[1] and bounds[1] > last:
+                last = self._month_start(bounds[1])
+            while month <= last:
+                self._create_month_partition(conn, month)
+                month = self._month_start(month, 1)
+            conn.execute(text("CREATE TABLE IF NOT EXISTS chat_history_default PARTITION OF chat_history DEFAULT"))
+
+            copied = conn.execute(text(
+                "INSERT INTO chat_history SELECT * FROM chat_history_unpartitioned"
+            )).rowcount
+            conn.execute(text("DROP TABLE chat_history_unpartitioned"))
+            for index in ChatHistory.__table__.indexes:
+                index.create(conn)
+        return copied
+
+    def drop_empty_chat_partitions(self, older_than: datetime) -> List[str]:
+        """
+        Detach and drop monthly partitions that end before the cutoff and are
+        empty (their sessions were archived). Dropping is instant, unlike DELETE.
+        """
+        if not self.chat_history_is_partitioned():
+            return []
+        dropped = []
+        with self.engine.begin() as conn:
+            names = conn.execute(text(
+                "SELECT c.relname FROM pg_inherits i "
+                "JOIN pg_class c ON c.oid = i.inhrelid "
+                "JOIN pg_class p ON p.oid = i.inhparent "
+                "WHERE p.relname = 'chat_history' AND c.relname LIKE 'chat_history_p%'"
+            )).scalars().all()
+            for name in sorted(names):
+                try:
+                    month = datetime.strptime(name, "chat_history_p%Y_%m")
+                except ValueError:
+                    continue
+                if self._month_start(month, 1) > older_than:
+                    continue
+                if conn.execute(text(f"SELECT 1 FROM {name} LIMIT 1")).first():
+                    continue
+                conn.execute(text(f"ALTER TABLE chat_history DETACH PARTITION {name}"))
+                conn.execute(text(f"DROP TABLE {name}"))
+                dropped.append(name)
+        return dropped
+
@@ -0,0 +1,378 @@
+# backend/entity_extractor.py — one-pass entity extraction for user messages
+# Used by ai_agent.py (detect_campuses_from_query, normalize_categories_freeform,
+# parse_preferences_seed, parse_completed_freeform, ... are thin views over it):
+# extract_entities(text) → Entities with every campus / category / domain keyword /
+#   required-only phrase hit and its position in the normalized text, plus course codes
+# The text is lowercased and typo-fixed once (one regex pass for all TYPO_FIXES),
+# then scanned once by a single compiled automaton over every alias and keyword.
+# Matching keeps the original substring semantics ("cal" still matches inside
+# "calculus", "cs" inside "physics"): the automaton is a lookahead alternation,
+# longest pattern first, so it reports the longest pattern starting at each
+# position; every shorter pattern starting there is a prefix of that one and is
+# added from a precomputed prefix table. Results are cached per text, so the
+# helpers can be called repeatedly on the same prompt/history message for free.
+#
+# Per-session context (used by the repository when a message is written):
+# message_entities(text) → compact {campuses, majors, focus_only, required_only,
+#   categories, completed_courses} for one user message, stored with the message
+# update_session_context(context, role, entities) → the session's rolling context
+#   with one more message folded in; constant work per message
+
+import re
+from functools import lru_cache
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+#campus config (3 only)
+CAMPUS_ALIASES = {
+    "UCB": ["uc berkeley", "berkeley", "ucb", "cal"],
+    "UCD": ["uc davis", "davis", "ucd"],
+    "UCSD": ["uc san diego", "san diego", "ucsd"],
+}
+
+#common typo fixes
+TYPO_FIXES = {
+    r"\busb\b": "uc berkeley",
+    r"\bucb\b": "uc berkeley",
+    r"\bberkley\b": "berkeley",
+    r"\bucsd\b": "uc san diego",
+    r"\buc sd\b": "uc san diego",
+}
+
+#category detection (Eleni's pathway):
+CATEGORY_ALIASES = {
+    #high-level groupings often seen in assist/grids
+    "major preparation": ["major preparation", "lower division major", "ld major"],
+    "lower division major": ["lower division major", "ld major"],
+    "general education": ["general education", "ge", "breadth"],
+    "breadth": ["breadth", "ge area", "area"],
+    "math": ["math", "mathematics"],
+    "science": ["science", "natural science"],
+    "physics": ["physics", "phys"],
+    "chemistry": ["chemistry", "chem"],
+    "biology": ["biology", "biosc", "bio"],
+    "computer science": ["computer science", "cs", "programming", "software"],
+    #add more if your JSON uses other labels (e.g., "Engineering Fundamentals", "Major Requirements")
+}
+
+# Majors as stored in transfer_rules.major / assist_data.major, with the ways students name them.
+MAJOR_ALIASES = {
+    "Computer Science": ["computer science", "cs", "compsci", "comp sci", "computer sci"],
+    "Computer Engineering": ["computer engineering", "cpe", "comp e"],
+    "Data Science": ["data science", "data sci"],
+    "Mathematics": ["mathematics", "math", "maths"],
+    "Applied Mathematics": ["applied mathematics", "applied math"],
+    "Statistics": ["statistics", "stats", "stat"],
+    "Physics": ["physics"],
+    "Chemistry": ["chemistry", "chem"],
+    "Biology": ["biology", "bio", "biological sciences"],
+    "Cognitive Science": ["cognitive science", "cogsci", "cog sci"],
+    "Economics": ["economics", "econ"],
+    "Electrical Engineering": ["electrical engineering", "ee"],
+    "Mechanical Engineering": ["mechanical engineering", "mech e", "me"],
+}
+
+# Domain keywords for parse_preferences_seed; padded entries only match whole words.
+DOMAIN_KEYWORDS = {
+    "cs": [" cs ", "comsc", "computer science", "programming", "data structures"],
+    "math": [" math ", "calculus", "linear algebra", "differential equations"],
+    "science": [" science ", "physics", "chemistry", "biology", " bio ", " chem ", " phys "],
+}
+REQUIRED_ONLY_PHRASES = ["required only", "only required", "must have", "need all"]
+# Phrases that mean the user is asking for category filtering.
+CATEGORY_REQUEST_PHRASES = [
+    "category",
+    "categories",
+    "general education",
+    "breadth",
+    "major preparation",
+    "lower division major",
+    "science only",
+    "math only",
+    "cs only",
+    "computer science only",
+]
+
+_TYPO_PATTERN = re.compile("|".join(f"(?:{pat})" for pat in TYPO_FIXES))
+_TYPO_REPLACEMENTS = [(re.compile(pat), repl) for pat, repl in TYPO_FIXES.items()]
+_COURSE_CODE_RE = re.compile(r"\b([A-Za-z]{2,}[- ]?\d+[A-Za-z]?)\b", re.IGNORECASE)
+_CATEGORY_QUOTED_RE = re.compile(r'category\s*:\s*["“](.+?)["”]')
+_ONLY_PHRASE_RE = re.compile(r'\bonly\s+([a-z0-9 \-/&]+)')
+_SHOW_ONLY_RE = re.compile(r'\bshow\s+([a-z0-9 \-/&]+?)\s+only\b')
+_PHRASE_CUT_RE = re.compile(r"[.,;:!?()\[\]{}]")
+# Course codes only count as completed when the message says so.
+_COMPLETED_CUE_RE = re.compile(r"\b(completed|complete|took|taken|finished|done with|passed)\b", re.IGNORECASE)
+# A major only counts when stated as one ("cs major", "majoring in math", "major: physics");
+# "cs courses" is a course domain, and "major preparation" is a category.
+# Aliases that are also plain words ("give me major requirements") only count after
+# a determiner: "an ee major", "my me major".
+AMBIGUOUS_MAJOR_ALIASES = {"me", "ee"}
+_MAJOR_ALIAS_TO_NAME = {alias: name for name, aliases in MAJOR_ALIASES.items() for alias in aliases}
+
+
+def _alternation(aliases) -> str:
+    return "|".join(sorted(map(re.escape, aliases), key=len, reverse=True))
+
+
+_MAJOR_ALT = _alternation(a for a in _MAJOR_ALIAS_TO_NAME if a not in AMBIGUOUS_MAJOR_ALIASES)
+_AMBIGUOUS_MAJOR_ALT = _alternation(AMBIGUOUS_MAJOR_ALIASES)
+_MAJOR_CUE_RE = re.compile(
+    rf"\b(?P<before>{_MAJOR_ALT})\s+(?:majors?|majoring)\b(?!\s+prep)"
+    rf"|\b(?:an?|my|the|our|their)\s+(?P<short>{_AMBIGUOUS_MAJOR_ALT})\s+majors?\b(?!\s+prep)"
+    rf"|\b(?:major(?:ing)?\s+in|major\s*[:=]|major\s+is)\s+(?P<after>{_MAJOR_ALT})\b"
+)
+# Messages whose campus mentions back a campus-less follow-up (both roles count).
+CONTEXT_CAMPUS_WINDOW = 8
+
+
+def _build_automaton():
+    """pattern → [(kind, key)] plus the compiled scanner and prefix table."""
+    targets: Dict[str, List[Tuple[str, str]]] = {}
+    for key, aliases in CAMPUS_ALIASES.items():
+        for alias in aliases:
+            targets.setdefault(alias, []).append(("campus", key))
+    for canon, variants in CATEGORY_ALIASES.items():
+        for variant in [canon] + variants:
+            targets.setdefault(variant, []).append(("category", canon))
+    for domain, keywords in DOMAIN_KEYWORDS.items():
+        for keyword in keywords:
+            targets.setdefault(keyword, []).append(("domain", domain))
+    for phrase in REQUIRED_ONLY_PHRASES:
+        targets.setdefault(phrase, []).append(("required", "required_only"))
+    for phrase in CATEGORY_REQUEST_PHRASES:
+        targets.setdefault(phrase, []).append(("category_request", phrase))
+
+    for pattern, entries in targets.items():
+        # a canonical category is usually listed among its own variants too
+        targets[pattern] = list(dict.fromkeys(entries))
+
+    patterns = sorted(targets, key=len, reverse=True)
+    scanner = re.compile("(?=(" + "|".join(re.escape(p) for p in patterns) + "))")
+    prefixes = {p: [q for q in patterns if p.startswith(q)] for p in patterns}
+    return targets, scanner, prefixes
+
+
+_TARGETS, _SCANNER, _PREFIXES = _build_automaton()
+
+
+def normalize_course_code(raw: str) -> str:
+    s = raw.upper().strip().replace(" ", "-")
+    if s.startswith(("CS-", "COMPSCI-", "COMSCI-", "COMPSC-")):
+        s = "COMSC-" + s.split("-", 1)[1]
+    m = re.match(r"^([A-Z&]+)[- ]?(\d+[A-Z]?)$", s)
+    if m:
+        s = f"{m.group(1)}-{m.group(2)}"
+    return s
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase and apply every TYPO_FIXES rule in one pass."""
+    low = text.lower()
+
+    def fix(m):
+        word = m.group(0)
+        for pat, repl in _TYPO_REPLACEMENTS:
+            if pat.fullmatch(word):
+                return repl
+        return word
+
+    return _TYPO_PATTERN.sub(fix, low)
+
+
+class Entities:
+    """Everything extract_entities found in one message. Treat as read-only (shared via cache)."""
+
+    __slots__ = (
+        "text",
+        "hits",
+        "campuses",
+        "categories",
+        "majors",
+        "domains",
+        "required_only",
+        "requests_categories",
+        "course_codes",
+        "course_spans",
+    )
+
+    def __init__(self, text, hits, campuses, categories, majors, domains, required_only, requests_categories,
+                 course_codes, course_spans):
+        self.text: str = text
+        # (kind, key, start, end) in `text`, ordered by position; kind is campus,
+        # category, domain, required or category_request
+        self.hits: Tuple[Tuple[str, str, int, int], ...] = hits
+        # campus keys in CAMPUS_ALIASES order
+        self.campuses: Tuple[str, ...] = campuses
+        # normalize_categories_freeform's answer, sorted
+        self.categories: Tuple[str, ...] = categories
+        # canonical MAJOR_ALIASES names the message states as the student's major, in order
+        self.majors: Tuple[str, ...] = majors
+        self.domains: FrozenSet[str] = domains
+        self.required_only: bool = required_only
+        self.requests_categories: bool = requests_categories
+        # normalized DEPT-NUM codes in order of appearance (duplicates kept)
+        self.course_codes: Tuple[str, ...] = course_codes
+        # (code, start, end) in the original, un-normalized message
+        self.course_spans: Tuple[Tuple[str, int, int], ...] = course_spans
+
+    @property
+    def campus(self) -> Optional[str]:
+        return self.campuses[0] if self.campuses else None
+
+    @property
+    def exclusive_domain(self) -> Optional[str]:
+        """The one domain (cs/math/science) the message singles out, if exactly one."""
+        return next(iter(self.domains)) if len(self.domains) == 1 else None
+
+
+def _canonical_category(phrase: str) -> str:
+    # An exact canonical key wins; otherwise the first key (in CATEGORY_ALIASES order)
+    # contained in the phrase, e.g. "science courses" → "science".
+    if phrase in CATEGORY_ALIASES:
+        return phrase
+    for key in CATEGORY_ALIASES:
+        if key in phrase:
+            return key
+    return phrase
+
+
+def canonical_major(name: str) -> Optional[str]:
+    """MAJOR_ALIASES name for a major as written ("cs" → "Computer Science"); unknown names are title-cased."""
+    cleaned = " ".join(str(name or "").lower().split())
+    if cleaned.endswith(" major"):
+        cleaned = cleaned[:-len(" major")]
+    if not cleaned:
+        return None
+    return _MAJOR_ALIAS_TO_NAME.get(cleaned) or cleaned.title()
+
+
+@lru_cache(maxsize=4096)
+def extract_entities(text: str) -> Entities:
+    norm = normalize_text(text)
+    stripped = norm.strip()
+    # Pad so " cs "-style keywords match at the edges; shift positions back into `norm`.
+    offset = len(norm) - len(norm.lstrip()) - 1
+    padded = f" {stripped} "
+
+    hits = []
+    seen_keys = set()
+    for m in _SCANNER.finditer(padded):
+        start = m.start()
+        for pattern in _PREFIXES[m.group(1)]:
+            for kind, key in _TARGETS[pattern]:
+                hits.append((kind, key, max(start + offset, 0), start + offset + len(pattern)))
+                seen_keys.add((kind, key))
+
+    hits.sort(key=lambda h: (h[2], h[3]))
+
+    # Course codes are matched in the original text so typo fixes can't rewrite a
+    # department token ("usb 110" stays USB-110).
+    course_spans = tuple(
+        (normalize_course_code(m.group(1)), m.start(1), m.end(1)) for m in _COURSE_CODE_RE.finditer(text)
+    )
+
+    # Free-form category phrases ("category: \"x\"", "only x", "show x only") plus alias hits.
+    picked = set()
+    for m in _CATEGORY_QUOTED_RE.finditer(norm):
+        phrase = m.group(1).strip()
+        if phrase:
+            picked.add(phrase)
+    for m in _ONLY_PHRASE_RE.finditer(norm):
+        phrase = _PHRASE_CUT_RE.split(m.group(1).strip())[0].strip()
+        if phrase:
+            picked.add(phrase)
+    for m in _SHOW_ONLY_RE.finditer(norm):
+        phrase = m.group(1).strip()
+        if phrase:
+            picked.add(phrase)
+    picked.update(key for kind, key in seen_keys if kind == "category")
+
+    majors, major_spans = [], []
+    for m in _MAJOR_CUE_RE.finditer(norm):
+        major = _MAJOR_ALIAS_TO_NAME[m.group("before") or m.group("short") or m.group("after")]
+        major_spans.append(m.span())
+        if major not in majors:
+            majors.append(major)
+    # "a physics major" names the major; it doesn't ask for physics courses only.
+    domains = frozenset(
+        key for kind, key, start, end in hits
+        if kind == "domain" and not any(start < span_end and end > span_start for span_start, span_end in major_spans)
+    )
+
+    return Entities(
+        text=norm,
+        hits=tuple(hits),
+        campuses=tuple(key for key in CAMPUS_ALIASES if ("campus", key) in seen_keys),
+        categories=tuple(sorted({_canonical_category(p) for p in picked})),
+        majors=tuple(majors),
+        domains=domains,
+        required_only=any(kind == "required" for kind, _ in seen_keys),
+        requests_categories=any(kind == "category_request" for kind, _ in seen_keys),
+        course_codes=tuple(code for code, _, _ in course_spans),
+        course_spans=course_spans,
+    )
+
+
+def message_entities(text: str) -> Dict:
+    """What one user message establishes, in the compact form stored with the message."""
+    entities = extract_entities(text)
+    focus = entities.exclusive_domain
+    record = {
+        "campuses": sorted(entities.campuses),
+        "majors": list(entities.majors),
+        "focus_only": focus,
+        "required_only": entities.required_only,
+        # mirrors parse_preferences_seed: categories only when asked for and no single domain
+        "categories": list(entities.categories) if entities.requests_categories and not focus else [],
+        "completed_courses": sorted(set(entities.course_codes)) if _COMPLETED_CUE_RE.search(text) else [],
+    }
+    return {key: value for key, value in record.items() if value}
+
+
+def new_session_context() -> Dict:
+    return {
+        "campuses": [],
+        "majors": [],
+        "focus_only": None,
+        "required_only": False,
+        "categories": [],
+        "completed_courses": [],
+        "user_turns": 0,
+        "campus_window": [],
+    }
+
+
+def update_session_context(context: Optional[Dict], role: str, entities: Optional[Dict]) -> Dict:
+    """
+    Fold one message into the session context: latest campus and major mentions,
+    latest focus/category filters, sticky required_only, accumulated completed courses,
+    and the campuses of the last CONTEXT_CAMPUS_WINDOW messages.
+    """
+    updated = new_session_context()
+    updated.update(context or {})
+    entities = entities if role == "user" else None
+    window = list(updated["campus_window"]) + [(entities or {}).get("campuses", [])]
+    updated["campus_window"] = window[-CONTEXT_CAMPUS_WINDOW:]
+    if role != "user":
+        return updated
+
+    updated["user_turns"] += 1
+    if not entities:
+        return updated
+    if entities.get("campuses"):
+        updated["campuses"] = entities["campuses"]
+    if entities.get("majors"):
+        updated["majors"] = entities["majors"]
+    if entities.get("focus_only"):
+        updated["focus_only"] = entities["focus_only"]
+    if entities.get("required_only"):
+        updated["required_only"] = True
+    if entities.get("categories"):
+        updated["categories"] = entities["categories"]
+    if entities.get("completed_courses"):
+        updated["completed_courses"] = sorted(set(updated["completed_courses"]) | set(entities["completed_courses"]))
+    return updated
+
+
+def window_campuses(context: Dict) -> List[str]:
+    """Every campus mentioned in the context's recent-message window."""
+    return sorted({campus for campuses in context.get("campus_window") or [] for campus in campuses})
@@ -1,13 +1,24 @@
 # backend/pdf_export.py — NEXA PDF export
-# Provides one function called from app.py:
-# generate_chat_pdf(messages, title) → io.BytesIO
-# uses reportlab to build the PDF entirely in memory (no temp files).
-# safe for GCP Cloud Run / App Engine read-only filesystems.
+# Provides the functions called from app.py:
+# render_chat_pdf(messages, title, summary_only, ...) → spooled file
+# iter_pdf_chunks(pdf_file) → chunks for a streamed response
+# generate_chat_pdf(messages, title, ...) → io.BytesIO (whole PDF in memory)
+# the story is fed to reportlab lazily and output only spills to a temp file
+# past PDF_SPOOL_MAX_BYTES, so small exports never touch the filesystem.
+# styles are built once per process and each message's parsed markdown is
+# memoized by content hash, so re-exporting a growing chat only parses the
+# messages that are new since the last download.
 
 
 import io
+import os
 import re
 import datetime
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict, deque
+from functools import lru_cache
 from reportlab.lib.pagesizes import letter
 from reportlab.lib import colors
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
@@ -18,6 +29,7 @@ from reportlab.platypus import (
 
 
 # STYLES
+@lru_cache(maxsize=1)
 def _build_styles():
     base = getSampleStyleSheet()
 
@@ -132,8 +144,43 @@ def _build_styles():
     }
 
 
+# table styles are shared by every table in every export
+_TABLE_CELL_STYLE = ParagraphStyle(
+    "TableCell",
+    fontName="Helvetica",
+    fontSize=8.5,
+    textColor=colors.HexColor("#111827"),
+    leading=11,
+)
+_TABLE_HEADER_STYLE = ParagraphStyle(
+    "TableHeader",
+    fontName="Helvetica-Bold",
+    fontSize=8.5,
+    textColor=colors.HexColor("#111827"),
+    leading=11,
+)
+_TABLE_STYLE = TableStyle([
+    ("BACKGROUND",     (0, 0), (-1, 0),  colors.HexColor("#e8f0fe")),
+    ("TEXTCOLOR",      (0, 0), (-1, 0),  colors.HexColor("#1f2937")),
+    ("FONTNAME",       (0, 0), (-1, 0),  "Helvetica-Bold"),
+    ("ROWBACKGROUNDS", (0, 1), (-1, -1), [colors.white, colors.HexColor("#f9fafb")]),
+    ("GRID",           (0, 0), (-1, -1), 0.4, colors.HexColor("#d1d5db")),
+    ("VALIGN",         (0, 0), (-1, -1), "TOP"),
+    ("TOPPADDING",     (0, 0), (-1, -1), 4),
+    ("BOTTOMPADDING",  (0, 0), (-1, -1), 4),
+    ("LEFTPADDING",    (0, 0), (-1, -1), 5),
+    ("RIGHTPADDING",   (0, 0), (-1, -1), 5),
+])
+
+
 # MARKDOWN HELPERS
 
+_BOLD_RE      = re.compile(r'\*\*(.+?)\*\*')
+_ITALIC_RE    = re.compile(r'\*(.+?)\*')
+_SEPARATOR_RE = re.compile(r'^[\s|:\-]+$')
+_BULLET_RE    = re.compile(r'^[-*•]\s+')
+_NUMBERED_RE  = re.compile(r'^(\d+)\.\s+')
+
 def _escape_xml(text: str) -> str:
     """Escape characters that break ReportLab's XML parser."""
     return (
@@ -146,8 +193,8 @@ def _escape_xml(text: str) -> str:
 
 def _apply_inline_markdown(text: str) -> str:
     """Convert **bold** and *italic* to ReportLab XML tags."""
-    text = re.sub(r'\*\*(.+?)\*\*', r'<b>\1</b>', text)
-    text = re.sub(r'\*(.+?)\*', r'<i>\1</i>', text)
+    text = _BOLD_RE.sub(r'<b>\1</b>', text)
+    text = _ITALIC_RE.sub(r'<i>\1</i>', text)
     return text
 
 
@@ -156,7 +203,7 @@ def _is_table_row(line: str) -> bool:
 
 
 def _is_separator_row(line: str) -> bool:
-    return _is_table_row(line) and re.match(r'^[\s|:\-]+$', line)
+    return _is_table_row(line) and _SEPARATOR_RE.match(line)
 
 
 def _parse_table(lines: list[str]) -> list[list[str]]:
@@ -166,72 +213,36 @@ def _parse_table(lines: list[str]) -> list[list[str]]:
         if _is_separator_row(line):
             continue
         cells = [cell.strip() for cell in line.strip().strip("|").split("|")]
-        cells = [re.sub(r'\*\*(.+?)\*\*', r'\1', cell) for cell in cells]
+        cells = [_BOLD_RE.sub(r'\1', cell) for cell in cells]
         rows.append(cells)
     return rows
 
 
-def _build_table_flowable(rows: list[list[str]], available_width: float) -> Table:
-    """Turn a 2D list into a styled ReportLab Table."""
+def _build_table_flowable(rows: list, available_width: float) -> Table:
+    """Turn a 2D list of prepared cells into a styled ReportLab Table."""
     if not rows:
         return None
 
-    num_cols = max(len(r) for r in rows)
-    padded = [r + [""] * (num_cols - len(r)) for r in rows]
-
-    cell_style = ParagraphStyle(
-        "TableCell",
-        fontName="Helvetica",
-        fontSize=8.5,
-        textColor=colors.HexColor("#111827"),
-        leading=11,
-    )
-    header_style = ParagraphStyle(
-        "TableHeader",
-        fontName="Helvetica-Bold",
-        fontSize=8.5,
-        textColor=colors.HexColor("#111827"),
-        leading=11,
-    )
-
-    para_rows = []
-    for i, row in enumerate(padded):
-        style = header_style if i == 0 else cell_style
-        para_rows.append([Paragraph(_escape_xml(cell), style) for cell in row])
+    num_cols = len(rows[0])
+    para_rows = [[_paragraph_from(cell) for cell in row] for row in rows]
 
     col_width = available_width / num_cols
 
     tbl = Table(para_rows, colWidths=[col_width] * num_cols, repeatRows=1)
-    tbl.setStyle(TableStyle([
-        ("BACKGROUND",     (0, 0), (-1, 0),  colors.HexColor("#e8f0fe")),
-        ("TEXTCOLOR",      (0, 0), (-1, 0),  colors.HexColor("#1f2937")),
-        ("FONTNAME",       (0, 0), (-1, 0),  "Helvetica-Bold"),
-        ("ROWBACKGROUNDS", (0, 1), (-1, -1), [colors.white, colors.HexColor("#f9fafb")]),
-        ("GRID",           (0, 0), (-1, -1), 0.4, colors.HexColor("#d1d5db")),
-        ("VALIGN",         (0, 0), (-1, -1), "TOP"),
-        ("TOPPADDING",     (0, 0), (-1, -1), 4),
-        ("BOTTOMPADDING",  (0, 0), (-1, -1), 4),
-        ("LEFTPADDING",    (0, 0), (-1, -1), 5),
-        ("RIGHTPADDING",   (0, 0), (-1, -1), 5),
-    ]))
+    tbl.setStyle(_TABLE_STYLE)
     return tbl
 
 
-def _render_markdown_to_flowables(
-    content: str,
-    styles: dict,
-    is_user: bool,
-    available_width: float,
-) -> list:
+def _parse_markdown_blocks(content: str) -> tuple:
     """
-    Convert a markdown string into a list of ReportLab flowables.
+    Parse a markdown string into immutable (kind, payload) blocks.
     Handles: ## headings, ### subheadings, bullet lists, numbered lists,
              markdown tables, bold/italic inline, and plain paragraphs.
+    Text payloads are already escaped and converted to ReportLab XML.
     """
-    text_style = styles["user_text"] if is_user else styles["assistant_text"]
-    flowables  = []
-    lines      = content.split("\n")
-    i          = 0
+    blocks = []
+    lines  = content.split("\n")
+    i      = 0
 
     while i < len(lines):
         line     = lines[i]
@@ -244,17 +255,15 @@ def _render_markdown_to_flowables(
 
         # Heading
         if stripped.startswith("## "):
-            text = _escape_xml(stripped[3:].strip())
-            text = _apply_inline_markdown(text)
-            flowables.append(Paragraph(text, styles["heading"]))
+            text = _apply_inline_markdown(_escape_xml(stripped[3:].strip()))
+            blocks.append(("heading", text))
             i += 1
             continue
 
         # Subheading
         if stripped.startswith("### "):
-            text = _escape_xml(stripped[4:].strip())
-            text = _apply_inline_markdown(text)
-            flowables.append(Paragraph(text, styles["subheading"]))
+            text = _apply_inline_markdown(_escape_xml(stripped[4:].strip()))
+            blocks.append(("subheading", text))
             i += 1
             continue
 
@@ -266,88 +275,265 @@ def _render_markdown_to_flowables(
                 i += 1
             rows = _parse_table(table_lines)
             if rows:
-                tbl = _build_table_flowable(rows, available_width - 24)
-                if tbl:
-                    flowables.append(Spacer(1, 4))
-                    flowables.append(tbl)
-                    flowables.append(Spacer(1, 6))
+                blocks.append(("table", tuple(tuple(r) for r in rows)))
             continue
 
         # bullet point
-        if re.match(r'^[-*•]\s+', stripped):
-            text = re.sub(r'^[-*•]\s+', '', stripped)
-            text = _escape_xml(text)
-            text = _apply_inline_markdown(text)
-            flowables.append(Paragraph(f"• {text}", styles["bullet"]))
+        bullet = _BULLET_RE.match(stripped)
+        if bullet:
+            text = _apply_inline_markdown(_escape_xml(stripped[bullet.end():]))
+            blocks.append(("bullet", f"• {text}"))
             i += 1
             continue
 
         # numbered list
-        if re.match(r'^\d+\.\s+', stripped):
-            text = re.sub(r'^\d+\.\s+', '', stripped)
-            num  = re.match(r'^(\d+)\.', stripped).group(1)
-            text = _escape_xml(text)
-            text = _apply_inline_markdown(text)
-            flowables.append(Paragraph(f"{num}. {text}", styles["bullet"]))
+        numbered = _NUMBERED_RE.match(stripped)
+        if numbered:
+            text = _apply_inline_markdown(_escape_xml(stripped[numbered.end():]))
+            blocks.append(("bullet", f"{numbered.group(1)}. {text}"))
             i += 1
             continue
 
         # plain paragraph
-        text = _escape_xml(stripped)
-        text = _apply_inline_markdown(text)
-        flowables.append(Paragraph(text, text_style))
+        blocks.append(("paragraph", _apply_inline_markdown(_escape_xml(stripped))))
         i += 1
 
+    return tuple(blocks)
+
+
+# PARSED MESSAGE CACHE
+# ReportLab flowables keep per-build layout state (wrap/split results), so they
+# cannot be shared between concurrent downloads. What we memoize instead is
+# everything up to the flowable: the markdown blocks and each paragraph's
+# parsed XML fragments, which ReportLab accepts back via Paragraph(frags=...).
+
+_BLOCK_CACHE_MAX = int(os.getenv("PDF_BLOCK_CACHE_SIZE", "4096"))
+_block_cache: "OrderedDict[str, tuple]" = OrderedDict()
+_block_cache_lock = threading.Lock()
+
+
+def _message_key(content: str, is_user: bool) -> str:
+    prefix = "user" if is_user else "assistant"
+    return hashlib.sha1(f"{prefix}\x00{content}".encode("utf-8")).hexdigest()
+
+
+def _prepare_paragraph(text: str, style: ParagraphStyle) -> tuple:
+    """Parse ReportLab markup once and keep the fragments for reuse."""
+    para = Paragraph(text, style)
+    return (para.text, para.style, para.frags)
+
+
+def _paragraph_from(prepared: tuple) -> Paragraph:
+    text, style, frags = prepared
+    return Paragraph(text, style, frags=frags)
+
+
+def _prepare_blocks(content: str, styles: dict, is_user: bool) -> tuple:
+    text_style = styles["user_text"] if is_user else styles["assistant_text"]
+    prepared = []
+
+    for kind, payload in _parse_markdown_blocks(content):
+        if kind == "table":
+            num_cols = max(len(r) for r in payload)
+            rows = tuple(
+                tuple(
+                    _prepare_paragraph(
+                        _escape_xml(cell),
+                        _TABLE_HEADER_STYLE if i == 0 else _TABLE_CELL_STYLE,
+                    )
+                    for cell in row + ("",) * (num_cols - len(row))
+                )
+                for i, row in enumerate(payload)
+            )
+            prepared.append(("table", rows))
+        elif kind == "paragraph":
+            prepared.append(("paragraph", _prepare_paragraph(payload, text_style)))
+        else:
+            prepared.append((kind, _prepare_paragraph(payload, styles[kind])))
+
+    return tuple(prepared)
+
+
+def _cached_blocks(content: str, styles: dict, is_user: bool) -> tuple:
+    """Return prepared blocks for a message, parsing only on a cache miss."""
+    key = _message_key(content, is_user)
+    with _block_cache_lock:
+        blocks = _block_cache.get(key)
+        if blocks is not None:
+            _block_cache.move_to_end(key)
+            return blocks
+
+    blocks = _prepare_blocks(content, styles, is_user)
+
+    with _block_cache_lock:
+        _block_cache[key] = blocks
+        while len(_block_cache) > _BLOCK_CACHE_MAX:
+            _block_cache.popitem(last=False)
+    return blocks
+
+
+def _clear_block_cache() -> None:
+    with _block_cache_lock:
+        _block_cache.clear()
+
+
+def _render_markdown_to_flowables(
+    content: str,
+    styles: dict,
+    is_user: bool,
+    available_width: float,
+) -> list:
+    """Convert a markdown string into a list of ReportLab flowables."""
+    flowables = []
+
+    for kind, payload in _cached_blocks(content, styles, is_user):
+        if kind == "table":
+            tbl = _build_table_flowable(payload, available_width - 24)
+            if tbl:
+                flowables.append(Spacer(1, 4))
+                flowables.append(tbl)
+                flowables.append(Spacer(1, 6))
+        else:
+            flowables.append(_paragraph_from(payload))
+
     return flowables
 
 
-# MAIN EXPORT FUNCTION
+# LAZY STORY
 
-def generate_chat_pdf(
-    messages: list[dict],
-    title: str = "Chat Conversation",
-) -> io.BytesIO:
+class _LazyStory:
+    """
+    List-like view over a flowable iterator, passed to doc.build().
+    ReportLab only works at the head of the story (index, delete, and insert
+    split remainders at the front), so flowables are pulled from the iterator
+    in small batches as layout reaches them instead of all up front.
     """
-    Builds a PDF from a list of chat messages entirely in memory.
 
-    Parameters:
-        messages — list of {"role": "user"|"assistant", "content": "..."}
-        title    — heading shown at the top of the PDF
+    def __init__(self, flowables, lookahead: int = 32):
+        self._source    = iter(flowables)
+        self._buffer    = deque()
+        self._lookahead = lookahead
 
-    Returns:
-        io.BytesIO buffer — ready to pass directly to Flask's send_file()
+    def _fill(self, count: int) -> None:
+        while self._source is not None and len(self._buffer) < count:
+            try:
+                self._buffer.append(next(self._source))
+            except StopIteration:
+                self._source = None
+
+    def __len__(self) -> int:
+        # keepWithNext handling looks a few flowables ahead of the head
+        self._fill(self._lookahead)
+        return len(self._buffer)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            self._fill(key.stop if key.stop is not None else self._lookahead)
+            return list(self._buffer)[key]
+        self._fill(key + 1)
+        return self._buffer[key]
+
+    def __delitem__(self, key):
+        if isinstance(key, slice):
+            for _ in range(len(range(*key.indices(len(self._buffer))))):
+                self._buffer.popleft()
+            return
+        del self._buffer[key]
+
+    def __setitem__(self, key, value):
+        if not (isinstance(key, slice) and key.start in (0, None) and key.stop == 0):
+            raise TypeError("_LazyStory only supports inserting at the front")
+        self._buffer.extendleft(reversed(list(value)))
+
+    def insert(self, index: int, value) -> None:
+        self._fill(index)
+        self._buffer.insert(index, value)
+
+
+# SUMMARY DIGEST
+
+_CAMPUS_HEADING_PREFIX = "Transfer Preparation for "
+
+
+def summarize_chat(
+    messages: list[dict],
+    campuses: list[str] | None = None,
+    completed_courses: list[str] | None = None,
+) -> dict:
+    """
+    Deterministic digest of a conversation for summary-only exports:
+    the campuses asked about, the most recent course table shown for each
+    campus, and the courses the student has said they completed.
+    Tables are read newest-first and scanning stops once every known campus
+    has one, so long transcripts are mostly skipped.
     """
+    styles = _build_styles()
+    wanted = list(campuses or [])
+    tables: dict = {}
 
-    buffer = io.BytesIO()
+    for msg in reversed(messages):
+        if msg.get("role") != "assistant":
+            continue
+        content = msg.get("content", "").strip()
+        current = None
+        for kind, payload in _cached_blocks(content, styles, is_user=False):
+            if kind == "heading":
+                heading = payload[0]
+                current = heading[len(_CAMPUS_HEADING_PREFIX):] if heading.startswith(_CAMPUS_HEADING_PREFIX) else None
+            elif kind == "table" and current and current not in tables:
+                tables[current] = payload
+        if wanted and all(c in tables for c in wanted):
+            break
+
+    ordered = [c for c in wanted if c in tables] + sorted(c for c in tables if c not in wanted)
+    return {
+        "campuses": wanted or ordered,
+        "tables": [(campus, tables[campus]) for campus in ordered],
+        "completed_courses": sorted(set(completed_courses or [])),
+    }
 
-    left_margin     = 0.85 * inch
-    right_margin    = 0.85 * inch
-    page_width      = letter[0]
-    available_width = page_width - left_margin - right_margin
 
-    doc = SimpleDocTemplate(
-        buffer,
-        pagesize=letter,
-        rightMargin=right_margin,
-        leftMargin=left_margin,
-        topMargin=0.85 * inch,
-        bottomMargin=0.85 * inch,
-    )
+# MAIN EXPORT FUNCTION
+
+_LEFT_MARGIN     = 0.85 * inch
+_RIGHT_MARGIN    = 0.85 * inch
+_AVAILABLE_WIDTH = letter[0] - _LEFT_MARGIN - _RIGHT_MARGIN
+
+PDF_SPOOL_MAX_BYTES   = int(os.getenv("PDF_SPOOL_MAX_BYTES", str(1024 * 1024)))
+PDF_STREAM_CHUNK_BYTES = int(os.getenv("PDF_STREAM_CHUNK_BYTES", str(64 * 1024)))
+
+
+def _header_flowables(title: str, styles: dict) -> list:
+    return [
+        Paragraph(_escape_xml(title), styles["title"]),
+        Paragraph(
+            f"Downloaded: {datetime.datetime.utcnow().strftime('%B %d, %Y at %H:%M UTC')}",
+            styles["meta"]
+        ),
+        HRFlowable(
+            width="100%", thickness=1,
+            color=colors.HexColor("#e5e7eb"),
+            spaceAfter=14,
+        ),
+    ]
+
 
+def _footer_flowables(styles: dict) -> list:
+    return [
+        Spacer(1, 20),
+        Paragraph(
+            "Generated by NEXA — for reference purposes only.",
+            styles["footer"]
+        ),
+    ]
+
+
+def _iter_story(messages, title: str):
+    """Yield the document's flowables one message at a time."""
     styles = _build_styles()
-    story  = []
 
     # header
-    story.append(Paragraph(_escape_xml(title), styles["title"]))
-    story.append(Paragraph(
-        f"Downloaded: {datetime.datetime.utcnow().strftime('%B %d, %Y at %H:%M UTC')}",
-        styles["meta"]
-    ))
-    story.append(HRFlowable(
-        width="100%", thickness=1,
-        color=colors.HexColor("#e5e7eb"),
-        spaceAfter=14,
-    ))
+    yield from _header_flowables(title, styles)
 
     # messages
     for msg in messages:
@@ -355,30 +541,130 @@ def generate_chat_pdf(
         content = msg.get("content", "").strip()
 
         if role == "user":
-            story.append(Paragraph("You:", styles["user_label"]))
-            story.extend(_render_markdown_to_flowables(
-                content, styles, is_user=True, available_width=available_width
-            ))
+            yield Paragraph("You:", styles["user_label"])
+            yield from _render_markdown_to_flowables(
+                content, styles, is_user=True, available_width=_AVAILABLE_WIDTH
+            )
         else:
-            story.append(Paragraph("NEXA:", styles["assistant_label"]))
-            story.extend(_render_markdown_to_flowables(
-                content, styles, is_user=False, available_width=available_width
-            ))
+            yield Paragraph("NEXA:", styles["assistant_label"])
+            yield from _render_markdown_to_flowables(
+                content, styles, is_user=False, available_width=_AVAILABLE_WIDTH
+            )
 
-        story.append(Spacer(1, 6))
-        story.append(HRFlowable(
+        yield Spacer(1, 6)
+        yield HRFlowable(
             width="100%", thickness=0.5,
             color=colors.HexColor("#e5e7eb"),
             spaceAfter=8,
-        ))
+        )
 
     # footer
-    story.append(Spacer(1, 20))
-    story.append(Paragraph(
-        "Generated by NEXA — for reference purposes only.",
-        styles["footer"]
-    ))
+    yield from _footer_flowables(styles)
+
+
+def _iter_summary_story(digest: dict, title: str):
+    """Yield flowables for a summary-only export built from summarize_chat()."""
+    styles = _build_styles()
+
+    yield from _header_flowables(title, styles)
+
+    yield Paragraph("Campuses discussed", styles["heading"])
+    for campus in digest["campuses"] or ["None detected"]:
+        yield Paragraph(f"• {_escape_xml(campus)}", styles["bullet"])
+
+    yield Paragraph("Completed courses", styles["heading"])
+    for course in digest["completed_courses"] or ["None recorded"]:
+        yield Paragraph(f"• {_escape_xml(course)}", styles["bullet"])
 
-    doc.build(story)
+    yield Paragraph("Latest course tables", styles["heading"])
+    if not digest["tables"]:
+        yield Paragraph("No course tables were shown in this conversation.", styles["assistant_text"])
+    for campus, rows in digest["tables"]:
+        yield Paragraph(_escape_xml(campus), styles["subheading"])
+        yield Spacer(1, 4)
+        yield _build_table_flowable(rows, _AVAILABLE_WIDTH - 24)
+        yield Spacer(1, 6)
+
+    yield from _footer_flowables(styles)
+
+
+def _build_pdf(target, story) -> None:
+    doc = SimpleDocTemplate(
+        target,
+        pagesize=letter,
+        rightMargin=_RIGHT_MARGIN,
+        leftMargin=_LEFT_MARGIN,
+        topMargin=0.85 * inch,
+        bottomMargin=0.85 * inch,
+    )
+    doc.build(_LazyStory(story))
+
+
+def _select_story(messages, title, summary_only, campuses, completed_courses):
+    if summary_only:
+        return _iter_summary_story(summarize_chat(messages, campuses, completed_courses), title)
+    return _iter_story(messages, title)
+
+
+def generate_chat_pdf(
+    messages: list[dict],
+    title: str = "Chat Conversation",
+    summary_only: bool = False,
+    campuses: list[str] | None = None,
+    completed_courses: list[str] | None = None,
+) -> io.BytesIO:
+    """
+    Builds a PDF from a list of chat messages entirely in memory.
+
+    Parameters:
+        messages          — list of {"role": "user"|"assistant", "content": "..."}
+        title             — heading shown at the top of the PDF
+        summary_only      — render the summarize_chat() digest instead of the transcript
+        campuses          — campus names for the digest (optional)
+        completed_courses — completed course codes for the digest (optional)
+
+    Returns:
+        io.BytesIO buffer — ready to pass directly to Flask's send_file()
+    """
+
+    buffer = io.BytesIO()
+    _build_pdf(buffer, _select_story(messages, title, summary_only, campuses, completed_courses))
     buffer.seek(0)
-    return buffer
\ No newline at end of file
+    return buffer
+
+
+def render_chat_pdf(
+    messages: list[dict],
+    title: str = "Chat Conversation",
+    summary_only: bool = False,
+    campuses: list[str] | None = None,
+    completed_courses: list[str] | None = None,
+):
+    """
+    Builds the PDF into a spooled temp file and returns it rewound.
+    Flowables are produced lazily, a message at a time, so the whole story is
+    never built up front, and output past PDF_SPOOL_MAX_BYTES spills to disk.
+    ReportLab still keeps the laid-out pages until the document is saved, so
+    memory grows with the length of the history. The caller owns (and must
+    close) the returned file.
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=PDF_SPOOL_MAX_BYTES)
+    try:
+        _build_pdf(spool, _select_story(messages, title, summary_only, campuses, completed_courses))
+    except Exception:
+        spool.close()
+        raise
+    spool.seek(0)
+    return spool
+
+
+def iter_pdf_chunks(pdf_file, chunk_size: int = PDF_STREAM_CHUNK_BYTES):
+    """Yield a rendered PDF in chunks for a streamed response, then close it."""
+    try:
+        while True:
+            chunk = pdf_file.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        pdf_file.close()
@@ -0,0 +1,176 @@
+# backend/resilience.py — circuit breaker and hedged calls for slow upstreams
+# Used by ai_agent.py around OpenAI calls:
+# CircuitBreaker(name, ...) → allow() / record_success(seconds) / record_failure()
+#   closed → open after `failure_threshold` consecutive failures or slow calls;
+#   open → half_open after `reset_seconds`, letting one probe call through;
+#   half_open → closed when the probe succeeds, back to open when it fails.
+#   With half_open_probes=False, callers never probe: an external health check closes
+#   the breaker by calling record_success() (see PostgresRepository's prober).
+# hedged_call(fn, breaker, latencies) → fn's result, or raises CircuitOpenError
+#   Runs fn; if it hasn't returned within the hedge delay (recent p95 by default),
+#   starts a second identical call and returns whichever finishes first.
+#   The loser keeps running in the pool and its result is dropped.
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+logger = logging.getLogger(__name__)
+
+LLM_HEDGE_AFTER_MS = int(os.getenv("LLM_HEDGE_AFTER_MS", "0"))  # 0 = recent p95
+LLM_HEDGE_MIN_MS = int(os.getenv("LLM_HEDGE_MIN_MS", "800"))
+LLM_HEDGE_MAX_MS = int(os.getenv("LLM_HEDGE_MAX_MS", "4000"))
+LLM_CALL_TIMEOUT_SECONDS = float(os.getenv("LLM_CALL_TIMEOUT_SECONDS", "20"))
+LLM_SLOW_CALL_SECONDS = float(os.getenv("LLM_SLOW_CALL_SECONDS", "8"))
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_RESET_SECONDS = float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30"))
+LLM_HEDGE_WORKERS = int(os.getenv("LLM_HEDGE_WORKERS", "16"))
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling an upstream whose breaker is open."""
+
+
+class CircuitBreaker:
+    def __init__(self, name, failure_threshold=LLM_BREAKER_FAILURES,
+                 reset_seconds=LLM_BREAKER_RESET_SECONDS, slow_call_seconds=None, half_open_probes=True):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.slow_call_seconds = slow_call_seconds
+        self.half_open_probes = half_open_probes
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """True if a call may go through now. In half_open only one probe is let through."""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and self.half_open_probes and time.monotonic() - self.opened_at >= self.reset_seconds:
+                self._transition(HALF_OPEN)
+            if self.state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    @property
+    def probing(self):
+        return self.state == HALF_OPEN
+
+    def record_success(self, seconds=0.0):
+        if self.slow_call_seconds and seconds > self.slow_call_seconds:
+            self.record_failure(reason="slow")
+            return
+        with self._lock:
+            self.failures = 0
+            self._probe_in_flight = False
+            if self.state != CLOSED:
+                self._transition(CLOSED)
+
+    def record_failure(self, reason="error"):
+        with self._lock:
+            self.failures += 1
+            self._probe_in_flight = False
+            if self.state == HALF_OPEN or (self.state == CLOSED and self.failures >= self.failure_threshold):
+                self.opened_at = time.monotonic()
+                self._transition(OPEN, reason)
+
+    def _transition(self, state, reason=None):
+        logger.warning("circuit_%s name=%s failures=%s reason=%s", state, self.name, self.failures, reason)
+        self.state = state
+
+    def snapshot(self):
+        with self._lock:
+            return {"name": self.name, "state": self.state, "failures": self.failures}
+
+
+class LatencyWindow:
+    """Recent call durations, for picking the hedge delay."""
+
+    def __init__(self, size=200):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, pct):
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * pct / 100))]
+
+
+_pool = ThreadPoolExecutor(max_workers=LLM_HEDGE_WORKERS, thread_name_prefix="hedge")
+
+
+def hedge_delay(latencies):
+    """Seconds to wait before sending the duplicate call."""
+    if LLM_HEDGE_AFTER_MS > 0:
+        return LLM_HEDGE_AFTER_MS / 1000
+    p95 = latencies.percentile(95) if latencies is not None else None
+    if p95 is None:
+        return LLM_HEDGE_MAX_MS / 1000
+    return min(max(p95 * 1000, LLM_HEDGE_MIN_MS), LLM_HEDGE_MAX_MS) / 1000
+
+
+def _timed(fn):
+    start = time.monotonic()
+    result = fn()
+    return result, time.monotonic() - start
+
+
+def hedged_call(fn, breaker, latencies=None, timeout=LLM_CALL_TIMEOUT_SECONDS, hedge=True):
+    """
+    Call fn() (no arguments, safe to run twice) under the breaker, hedging slow calls.
+    Raises CircuitOpenError without calling fn while the breaker is open, TimeoutError
+    when neither call finished within `timeout`, or the last call's exception.
+    """
+    if not breaker.allow():
+        raise CircuitOpenError(f"{breaker.name} circuit is open")
+
+    start = time.monotonic()
+    pending = {_pool.submit(_timed, fn)}
+    # A half-open probe is a single call: it exists to test the upstream, not to win.
+    hedged = not hedge or breaker.probing
+    error = None
+    while pending:
+        elapsed = time.monotonic() - start
+        wait_for = timeout - elapsed if hedged else min(hedge_delay(latencies), timeout) - elapsed
+        done, pending = wait(pending, timeout=max(wait_for, 0), return_when=FIRST_COMPLETED)
+        for future in done:
+            try:
+                result, seconds = future.result()
+            except Exception as exc:
+                error = exc
+                continue
+            if latencies is not None:
+                latencies.add(seconds)
+            breaker.record_success(time.monotonic() - start)
+            return result
+        if not done and not hedged and time.monotonic() - start < timeout:
+            hedged = True
+            logger.info("hedge_sent name=%s after_ms=%d", breaker.name, (time.monotonic() - start) * 1000)
+            pending.add(_pool.submit(_timed, fn))
+        elif not done:
+            break
+        elif not pending and not hedged and time.monotonic() - start < timeout:
+            # the first call failed fast; the duplicate is a cheap retry
+            hedged = True
+            pending.add(_pool.submit(_timed, fn))
+
+    breaker.record_failure(reason="timeout" if error is None else "error")
+    if error is not None:
+        raise error
+    raise TimeoutError(f"{breaker.name} call timed out after {timeout}s")
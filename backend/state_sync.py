@@ -0,0 +1,104 @@
+# backend/state_sync.py — versioned session-state deltas for /prompt and /state
+# Used by app.py:
+# record_version(session_id, state) → bumps the session's state version after a change
+# state_payload(session_id, state, since, full) → {"state_version", "state_delta"} or
+#   {"state_version", "state"} (full resync)
+# A delta holds the messages appended since the client's version plus whichever of
+# campuses / majors / completed_courses / completed_domains / categories changed, so
+# response size no longer grows with the conversation. Clients send back the state_version
+# they last applied; an unknown or expired version gets a full resync instead.
+
+import os
+import threading
+from collections import OrderedDict, deque
+
+STATE_FIELDS = ("campuses", "majors", "completed_courses", "completed_domains", "categories")
+STATE_SYNC_MAX_SESSIONS = int(os.getenv("STATE_SYNC_MAX_SESSIONS", "10000"))
+STATE_SYNC_VERSIONS_KEPT = int(os.getenv("STATE_SYNC_VERSIONS_KEPT", "32"))
+
+
+def _fields(state):
+    # order-insensitive snapshot (completed courses/domains come from sets)
+    return {field: sorted(map(str, state.get(field) or [])) for field in STATE_FIELDS}
+
+
+class _SessionLog:
+    __slots__ = ("version", "snapshots")
+
+    def __init__(self):
+        self.version = 0
+        # (version, history_len, fields) for the most recent versions
+        self.snapshots = deque(maxlen=STATE_SYNC_VERSIONS_KEPT)
+
+    def find(self, version):
+        for snapshot in self.snapshots:
+            if snapshot[0] == version:
+                return snapshot
+        return None
+
+
+_logs: "OrderedDict[str, _SessionLog]" = OrderedDict()
+_logs_lock = threading.Lock()
+
+
+def _log_for(session_id, create=False):
+    with _logs_lock:
+        log = _logs.get(session_id)
+        if log is None and create:
+            log = _logs[session_id] = _SessionLog()
+            if len(_logs) > STATE_SYNC_MAX_SESSIONS:
+                _logs.popitem(last=False)
+        if log is not None:
+            _logs.move_to_end(session_id)
+        return log
+
+
+def record_version(session_id, state):
+    """Snapshot the session after a change and return its new state version."""
+    log = _log_for(session_id, create=True)
+    with _logs_lock:
+        log.version += 1
+        log.snapshots.append((log.version, len(state.get("history") or []), _fields(state)))
+        return log.version
+
+
+def full_state(state, version):
+    payload = {field: list(state.get(field) or []) for field in STATE_FIELDS}
+    payload["history"] = list(state.get("history") or [])
+    payload["version"] = version
+    return payload
+
+
+def state_payload(session_id, state, since=None, full=False):
+    """
+    Response fields describing the session state.
+    since: the version the client last applied; None means "the version before the
+    latest change" (legacy clients that don't track versions just get this turn).
+    """
+    log = _log_for(session_id)
+    if log is None:
+        version = record_version(session_id, state)
+        return {"state_version": version, "state": full_state(state, version)}
+
+    with _logs_lock:
+        version = log.version
+        base = log.find(version - 1 if since is None else since)
+
+    if full or base is None:
+        return {"state_version": version, "state": full_state(state, version)}
+
+    history = state.get("history") or []
+    current = _fields(state)
+    return {
+        "state_version": version,
+        "state_delta": {
+            "base_version": base[0],
+            "version": version,
+            "messages": history[base[1]:],
+            "changed": {
+                field: list(state.get(field) or [])
+                for field in STATE_FIELDS
+                if current[field] != base[2][field]
+            },
+        },
+    }
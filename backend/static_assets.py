@@ -0,0 +1,167 @@
+# backend/static_assets.py — manifest-backed static serving for frontend/dist
+# Used by app.py:
+# StaticAssets(dist_dir) → scans the build once at startup (no per-request stat calls)
+# assets.response(path) → Flask Response, 304, or None if the path isn't a built file
+# Each file gets a strong content ETag. Compressible files are served as .br / .gz:
+#   - precompressed siblings (file.js.br, file.js.gz) from the build are used as-is
+#     (python -m backend.static_assets frontend/dist writes them; see Dockerfile)
+#   - otherwise the variant is compressed on first request and kept in memory
+# Vite's content-hashed assets (assets/index-3f2a9c1b.js) are cached as immutable;
+# everything else (index.html) must revalidate.
+
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import sys
+import threading
+
+from flask import Response, request
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only without it
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = {".html", ".js", ".mjs", ".css", ".svg", ".json", ".map", ".txt", ".xml", ".ico"}
+MIN_COMPRESS_BYTES = int(os.getenv("STATIC_MIN_COMPRESS_BYTES", "1024"))
+IMMUTABLE_MAX_AGE = 31536000  # one year
+_HASHED_NAME_RE = re.compile(r"[.-][A-Za-z0-9_-]{8,}\.[a-z0-9]+$")
+# Content-Encoding token → precompressed file suffix, in preference order
+_ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+class _Asset:
+    __slots__ = ("path", "mimetype", "etag", "immutable", "compressible", "variants", "lock")
+
+    def __init__(self, path, mimetype, etag, immutable, compressible):
+        self.path = path
+        self.mimetype = mimetype
+        self.etag = etag
+        self.immutable = immutable
+        self.compressible = compressible
+        # encoding → file path (precompressed) or bytes (compressed on first request)
+        self.variants = {}
+        self.lock = threading.Lock()
+
+
+def _file_etag(path):
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(65536), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:20]
+
+
+def _compress(data, encoding):
+    if encoding == "br":
+        return brotli.compress(data, quality=11)
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+class StaticAssets:
+    """In-memory manifest of a built SPA directory."""
+
+    def __init__(self, root):
+        self.root = root
+        self.manifest = {}
+        self._scan()
+
+    def _scan(self):
+        if not os.path.isdir(self.root):
+            return
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                if name.endswith((".br", ".gz")):
+                    continue
+                path = os.path.join(dirpath, name)
+                rel = os.path.relpath(path, self.root).replace(os.sep, "/")
+                ext = os.path.splitext(name)[1].lower()
+                asset = _Asset(
+                    path=path,
+                    mimetype=mimetypes.guess_type(name)[0] or "application/octet-stream",
+                    etag=_file_etag(path),
+                    immutable=rel.startswith("assets/") and bool(_HASHED_NAME_RE.search(name)),
+                    compressible=ext in COMPRESSIBLE_EXTENSIONS and os.path.getsize(path) >= MIN_COMPRESS_BYTES,
+                )
+                for encoding, suffix in _ENCODINGS:
+                    if os.path.isfile(path + suffix):
+                        asset.variants[encoding] = path + suffix
+                self.manifest[rel] = asset
+
+    def __contains__(self, path):
+        return path in self.manifest
+
+    def _pick_encoding(self, asset):
+        if not asset.compressible:
+            return None
+        for encoding, _ in _ENCODINGS:
+            if encoding == "br" and brotli is None and "br" not in asset.variants:
+                continue
+            if request.accept_encodings[encoding]:
+                return encoding
+        return None
+
+    def _variant_body(self, asset, encoding):
+        variant = asset.variants.get(encoding)
+        if variant is None:
+            with asset.lock:
+                variant = asset.variants.get(encoding)
+                if variant is None:
+                    with open(asset.path, "rb") as f:
+                        variant = _compress(f.read(), encoding)
+                    asset.variants[encoding] = variant
+        if isinstance(variant, bytes):
+            return variant
+        with open(variant, "rb") as f:
+            return f.read()
+
+    def response(self, path):
+        """Response for a built file (200 or 304), or None if it isn't in the manifest."""
+        asset = self.manifest.get(path)
+        if asset is None:
+            return None
+
+        encoding = self._pick_encoding(asset)
+        etag = f"{asset.etag}-{encoding}" if encoding else asset.etag
+
+        if request.if_none_match.contains(etag):
+            resp = Response(status=304)
+        elif encoding:
+            resp = Response(self._variant_body(asset, encoding), mimetype=asset.mimetype)
+            resp.headers["Content-Encoding"] = encoding
+        else:
+            with open(asset.path, "rb") as f:
+                resp = Response(f.read(), mimetype=asset.mimetype)
+
+        resp.set_etag(etag)
+        if asset.compressible:
+            resp.headers["Vary"] = "Accept-Encoding"
+        if asset.immutable:
+            resp.headers["Cache-Control"] = f"public, max-age={IMMUTABLE_MAX_AGE}, immutable"
+        else:
+            resp.headers["Cache-Control"] = "no-cache"
+        return resp
+
+
+def precompress(root):
+    """Write .gz (and .br when brotli is installed) next to every compressible file."""
+    written = 0
+    for asset in StaticAssets(root).manifest.values():
+        if not asset.compressible:
+            continue
+        with open(asset.path, "rb") as f:
+            data = f.read()
+        for encoding, suffix in _ENCODINGS:
+            if encoding == "br" and brotli is None:
+                continue
+            with open(asset.path + suffix, "wb") as out:
+                out.write(_compress(data, encoding))
+            written += 1
+    return written
+
+
+if __name__ == "__main__":
+    target = sys.argv[1] if len(sys.argv) > 1 else "frontend/dist"
+    print(f"Precompressed {precompress(target)} file(s) in {target}")
@@ -0,0 +1,78 @@
+# backend/token_accounting.py — per-stage token usage for every OpenAI call
+# Used by ai_agent.py (and app.py's /admin/token-usage):
+# record_usage(stage, resp) → adds resp.usage to the stage's running totals and logs one line
+# usage_snapshot() → {stage: {calls, prompt_tokens, completion_tokens, cached_tokens, ...}}
+# Stages are short names for where the call came from ("parse", "format").
+# cached_tokens is usage.prompt_tokens_details.cached_tokens: the part of the prompt
+# the provider served from its prompt cache (only prompts ≥1024 tokens whose prefix
+# matches an earlier call byte-for-byte), so cached_ratio shows whether the static
+# prefixes are actually being reused.
+
+import logging
+import threading
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+_COUNTERS = ("calls", "prompt_tokens", "completion_tokens", "cached_tokens", "total_tokens")
+
+_totals = {}
+_totals_lock = threading.Lock()
+_started_at = datetime.utcnow()
+
+
+def _usage_counts(usage):
+    prompt = getattr(usage, "prompt_tokens", 0) or 0
+    completion = getattr(usage, "completion_tokens", 0) or 0
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached = getattr(details, "cached_tokens", 0) or 0
+    total = getattr(usage, "total_tokens", 0) or prompt + completion
+    return prompt, completion, cached, total
+
+
+def record_usage(stage, resp, model=None):
+    """Add one completion's usage to the stage totals. Never raises."""
+    usage = getattr(resp, "usage", None)
+    if usage is None:
+        return None
+    try:
+        prompt, completion, cached, total = _usage_counts(usage)
+    except Exception:
+        return None
+
+    with _totals_lock:
+        stats = _totals.get(stage)
+        if stats is None:
+            stats = _totals[stage] = dict.fromkeys(_COUNTERS, 0)
+        stats["calls"] += 1
+        stats["prompt_tokens"] += prompt
+        stats["completion_tokens"] += completion
+        stats["cached_tokens"] += cached
+        stats["total_tokens"] += total
+
+    logger.info(
+        "llm_usage stage=%s model=%s prompt_tokens=%s completion_tokens=%s cached_tokens=%s",
+        stage,
+        model or getattr(resp, "model", None),
+        prompt,
+        completion,
+        cached,
+    )
+    return {"prompt_tokens": prompt, "completion_tokens": completion, "cached_tokens": cached}
+
+
+def usage_snapshot():
+    """Totals per stage since startup, with averages and the cached share of prompt tokens."""
+    with _totals_lock:
+        stages = {stage: dict(stats) for stage, stats in _totals.items()}
+    for stats in stages.values():
+        calls = stats["calls"] or 1
+        stats["avg_prompt_tokens"] = round(stats["prompt_tokens"] / calls, 1)
+        stats["avg_completion_tokens"] = round(stats["completion_tokens"] / calls, 1)
+        stats["cached_ratio"] = round(stats["cached_tokens"] / stats["prompt_tokens"], 3) if stats["prompt_tokens"] else 0.0
+    return {"since": _started_at.isoformat(), "stages": stages}
+
+
+def reset_usage():
+    with _totals_lock:
+        _totals.clear()
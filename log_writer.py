@@ -1,21 +1,358 @@
-import json, os, datetime
+"""
+Append-only JSONL event log.
+
+log_event(data, folder) hands the entry to a per-folder EventLog whose
+background thread batches entries and appends them to
+<folder>/nexa_log_<date>.jsonl. Files roll over at midnight and once they
+pass max_bytes (nexa_log_<date>.1.jsonl, .2.jsonl, ...). Each batch is one
+O_APPEND write made under an exclusive lock, so gunicorn workers sharing a
+folder never interleave lines or disagree about the current segment.
+A failed write is reported through logging and retried with backoff, with
+the entries kept in order. iter_events() streams entries back lazily,
+oldest first.
+"""
+
+import atexit
+import datetime
+import json
+import logging
+import os
+import queue
+import re
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: local dev runs a single process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PREFIX = "nexa_log"
+DEFAULT_MAX_BYTES = int(os.getenv("EVENT_LOG_MAX_BYTES", str(64 * 1024 * 1024)))
+DEFAULT_FLUSH_INTERVAL_SECS = float(os.getenv("EVENT_LOG_FLUSH_INTERVAL_SECS", "0.5"))
+DEFAULT_FSYNC_INTERVAL_SECS = float(os.getenv("EVENT_LOG_FSYNC_INTERVAL_SECS", "2.0"))
+DEFAULT_MAX_QUEUE = int(os.getenv("EVENT_LOG_MAX_QUEUE", "100000"))
+_BATCH_MAX_EVENTS = 5000
+# A failed batch is retried with exponential backoff, starting at flush_interval.
+_RETRY_MAX_SECS = 30.0
+_IDLE = object()
+
+
+def _segment_name(prefix: str, date_str: str, index: int) -> str:
+    if index == 0:
+        return f"{prefix}_{date_str}.jsonl"
+    return f"{prefix}_{date_str}.{index}.jsonl"
+
+
+class EventLog:
+    """Buffered, rotating, append-only JSONL writer for one folder."""
+
+    def __init__(
+        self,
+        folder: str = "logs",
+        prefix: str = DEFAULT_PREFIX,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL_SECS,
+        fsync_interval: float = DEFAULT_FSYNC_INTERVAL_SECS,
+        max_queue: int = DEFAULT_MAX_QUEUE,
+    ):
+        self.folder = folder
+        self.prefix = prefix
+        self.max_bytes = max_bytes
+        self.flush_interval = flush_interval
+        self.fsync_interval = fsync_interval
+        self.max_queue = max_queue
+
+        self._write_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._pid = None
+        self._queue = None
+        self._thread = None
+        self._closed = False
+
+        # (date_str, index, fd) of the segment this process last wrote to
+        self._segment = None
+        self._last_fsync = time.monotonic()
+        self._dirty = False
+
+    # ---------- public API ----------
+
+    def log(self, data) -> None:
+        """Queue one entry. Never blocks on disk unless the queue is full."""
+        if self._closed:
+            raise RuntimeError("EventLog is closed")
+        item = (datetime.date.today().isoformat(), data)
+        self._ensure_writer()
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            # Back-pressure: write inline rather than drop the event.
+            self._write_batch([item])
+
+    def flush(self, timeout: float | None = None) -> None:
+        """Block until everything queued so far is written and fsynced (writes failing: until timeout)."""
+        if self._queue is None or self._pid != os.getpid():
+            return
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait(timeout)
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self.flush(timeout=_RETRY_MAX_SECS)
+        self._closed = True
+        if self._queue is not None and self._pid == os.getpid():
+            self._queue.put(None)
+            self._thread.join(timeout=5)
+        with self._write_lock:
+            self._close_segment()
+
+    # ---------- writer thread ----------
+
+    def _ensure_writer(self) -> None:
+        # Started lazily and per process so it survives gunicorn's fork.
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self._queue = queue.Queue(maxsize=self.max_queue)
+            self._segment = None
+            self._thread = threading.Thread(
+                target=self._run, name=f"event-log-{self.prefix}", daemon=True
+            )
+            self._pid = os.getpid()
+            self._thread.start()
+
+    def _run(self) -> None:
+        # Entries not written yet because a write failed; they go out before newer ones.
+        pending, waiters, backoff, retry_at = [], [], 0.0, 0.0
+        while True:
+            timeout = self.flush_interval
+            if pending:
+                timeout = min(timeout, max(0.0, retry_at - time.monotonic()))
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = _IDLE
+
+            stop = False
+            while item is not _IDLE:
+                if item is None:
+                    stop = True
+                elif isinstance(item, threading.Event):
+                    waiters.append(item)
+                else:
+                    pending.append(item)
+                if stop or len(pending) >= _BATCH_MAX_EVENTS:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+
+            if pending and (stop or time.monotonic() >= retry_at):
+                try:
+                    self._write_batch(pending)
+                except Exception as exc:  # keep the writer alive and the entries queued
+                    backoff = min(max(backoff * 2, self.flush_interval), _RETRY_MAX_SECS)
+                    retry_at = time.monotonic() + backoff
+                    logger.error(
+                        "event_log_write_failed folder=%s pending=%s retry_in=%.1fs error=%s",
+                        self.folder, len(pending), backoff, exc,
+                    )
+                    if len(pending) > self.max_queue:
+                        dropped = len(pending) - self.max_queue
+                        del pending[:dropped]
+                        logger.error("event_log_dropped folder=%s entries=%s", self.folder, dropped)
+                else:
+                    if backoff:
+                        logger.warning("event_log_write_recovered folder=%s", self.folder)
+                    backoff = 0.0
+            try:
+                self._maybe_fsync(force=bool(waiters) or stop)
+            except OSError as exc:
+                logger.error("event_log_fsync_failed folder=%s error=%s", self.folder, exc)
+            if not pending or stop:
+                # flush() returns once its entries are on disk, not after a failed attempt.
+                for waiter in waiters:
+                    waiter.set()
+                waiters = []
+            if stop:
+                if pending:
+                    logger.error("event_log_unwritten_at_close folder=%s entries=%s", self.folder, len(pending))
+                return
+
+    # ---------- file handling ----------
+
+    def _write_batch(self, batch) -> None:
+        """Append entries to their day's segment; on failure `batch` keeps only the unwritten ones."""
+        by_date: dict = {}
+        for item in list(batch):
+            date_str, data = item
+            try:
+                line = json.dumps(data, ensure_ascii=False, default=str)
+            except (TypeError, ValueError) as exc:
+                # Retrying can't fix this one; don't let it hold up the rest.
+                logger.error("event_log_unserializable folder=%s error=%s", self.folder, exc)
+                batch.remove(item)
+                continue
+            by_date.setdefault(date_str, []).append(line)
+
+        with self._write_lock:
+            os.makedirs(self.folder, exist_ok=True)
+            for date_str, lines in by_date.items():
+                payload = ("\n".join(lines) + "\n").encode("utf-8")
+                with self._folder_lock(date_str):
+                    fd = self._segment_for(date_str, len(payload))
+                    os.write(fd, payload)
+                self._dirty = True
+                batch[:] = [item for item in batch if item[0] != date_str]
+
+    def _segment_for(self, date_str: str, incoming: int) -> int:
+        """Return an fd for the segment to append to. Caller holds the folder lock."""
+        if self._segment and self._segment[0] != date_str:
+            self._close_segment()
+
+        index = self._segment[1] if self._segment else self._latest_index(date_str)
+        # Another worker may have rolled over since our last write.
+        while os.path.exists(self._path(date_str, index + 1)):
+            index += 1
+
+        path = self._path(date_str, index)
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        if size and size + incoming > self.max_bytes:
+            index += 1
+
+        if not self._segment or self._segment[1] != index:
+            self._close_segment()
+            fd = os.open(self._path(date_str, index), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            self._segment = (date_str, index, fd)
+        return self._segment[2]
+
+    def _latest_index(self, date_str: str) -> int:
+        pattern = re.compile(
+            rf"^{re.escape(self.prefix)}_{re.escape(date_str)}(?:\.(\d+))?\.jsonl$"
+        )
+        latest = 0
+        for name in os.listdir(self.folder):
+            m = pattern.match(name)
+            if m and m.group(1):
+                latest = max(latest, int(m.group(1)))
+        return latest
+
+    def _path(self, date_str: str, index: int) -> str:
+        return os.path.join(self.folder, _segment_name(self.prefix, date_str, index))
+
+    def _folder_lock(self, date_str: str):
+        return _FileLock(os.path.join(self.folder, f".{self.prefix}_{date_str}.lock"))
+
+    def _maybe_fsync(self, force: bool) -> None:
+        with self._write_lock:
+            if not self._dirty or not self._segment:
+                return
+            if force or time.monotonic() - self._last_fsync >= self.fsync_interval:
+                os.fsync(self._segment[2])
+                self._last_fsync = time.monotonic()
+                self._dirty = False
+
+    def _close_segment(self) -> None:
+        if not self._segment:
+            return
+        fd = self._segment[2]
+        if self._dirty:
+            os.fsync(fd)
+            self._dirty = False
+        os.close(fd)
+        self._segment = None
+
+
+class _FileLock:
+    """Exclusive cross-process lock on a sidecar file (no-op without fcntl)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.fd = None
+
+    def __enter__(self):
+        if fcntl is not None:
+            self.fd = os.open(self.path, os.O_WRONLY | os.O_CREAT, 0o644)
+            fcntl.flock(self.fd, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if self.fd is not None:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+            os.close(self.fd)
+            self.fd = None
+        return False
+
+
+def iter_events(
+    folder: str = "logs",
+    start_date: str | None = None,
+    end_date: str | None = None,
+    prefix: str = DEFAULT_PREFIX,
+):
+    """
+    Lazily yield logged entries, oldest first.
+    start_date / end_date are inclusive ISO dates (YYYY-MM-DD).
+    A torn final line (e.g. after a crash) is skipped.
+    """
+    if not os.path.isdir(folder):
+        return
+    pattern = re.compile(rf"^{re.escape(prefix)}_(\d{{4}}-\d{{2}}-\d{{2}})(?:\.(\d+))?\.jsonl$")
+    segments = []
+    for name in os.listdir(folder):
+        m = pattern.match(name)
+        if not m:
+            continue
+        date_str = m.group(1)
+        if start_date and date_str < start_date:
+            continue
+        if end_date and date_str > end_date:
+            continue
+        segments.append((date_str, int(m.group(2) or 0), name))
+
+    for _, _, name in sorted(segments):
+        with open(os.path.join(folder, name), "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+
+
+_logs: dict = {}
+_logs_lock = threading.Lock()
+
+
+def get_event_log(folder: str = "logs") -> EventLog:
+    """Get or create the shared EventLog for a folder (singleton per folder)."""
+    key = os.path.abspath(folder)
+    with _logs_lock:
+        if key not in _logs:
+            _logs[key] = EventLog(folder)
+        return _logs[key]
+
 
 def log_event(data, folder="logs"):
-    """Appends a JSON entry to a file in the logs folder."""
-    os.makedirs(folder, exist_ok=True)
-    date_str = datetime.date.today().isoformat()
-    path = os.path.join(folder, f"nexa_log_{date_str}.json")
+    """Appends a JSON entry to today's event log in the logs folder."""
+    get_event_log(folder).log(data)
+
 
-    # Load existing logs if file exists
-    if os.path.exists(path):
+@atexit.register
+def _close_all():
+    with _logs_lock:
+        logs = list(_logs.values())
+    for event_log in logs:
         try:
-            with open(path, "r", encoding="utf-8") as f:
-                logs = json.load(f)
-        except json.JSONDecodeError:
-            logs = []
-    else:
-        logs = []
-
-    logs.append(data)
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(logs, f, ensure_ascii=False, indent=2)
+            event_log.close()
+        except Exception:
+            pass
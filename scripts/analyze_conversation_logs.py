@@ -0,0 +1,348 @@
+"""
+Streaming analytics over conversation logs.
+
+Reads data/user_log.jsonl (plus its rotated siblings) or any CSV / JSONL /
+Parquet / Arrow log files, one row at a time, and computes in a single pass:
+campus mix, filter mix, zero-result rate, results per query, response-size
+distribution, busiest hours, and the most frequent normalized prompts.
+Files are processed in parallel worker processes and their partial
+aggregates merged, so memory stays bounded by the aggregate size rather
+than the log size.
+
+The JSON report's "warmup" list (top prompts with their campuses) can be fed
+to cache warm-up, and "capacity" summarizes peak load for planning.
+"""
+
+import csv
+import glob
+import json
+import math
+import os
+import re
+import sys
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backend.conversation_logger import CONVERSATION_LOG_FIELDS  # noqa: E402
+
+DEFAULT_LOG = "data/user_log.jsonl"
+TOP_K = 50
+_CAMPUS_NAMES = {"UC Berkeley": "UCB", "UC Davis": "UCD", "UC San Diego": "UCSD"}
+
+
+# ---------- readers ----------
+
+def _iter_jsonl(path: str) -> Iterator[Dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+
+def _iter_csv(path: str) -> Iterator[Dict]:
+    csv.field_size_limit(sys.maxsize)
+    with open(path, "r", newline="", encoding="utf-8") as f:
+        for values in csv.reader(f):
+            if values == CONVERSATION_LOG_FIELDS:
+                continue  # header row (older files were written without one)
+            yield dict(zip(CONVERSATION_LOG_FIELDS, values))
+
+
+def _iter_columnar(path: str) -> Iterator[Dict]:
+    try:
+        import pyarrow.ipc as pa_ipc
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise SystemExit(f"pyarrow is required to read {path}")
+
+    if path.endswith(".parquet"):
+        batches = pq.ParquetFile(path).iter_batches(batch_size=4096)
+    else:
+        batches = iter(pa_ipc.open_stream(path))
+    for batch in batches:
+        yield from batch.to_pylist()
+
+
+def iter_log_rows(path: str) -> Iterator[Dict]:
+    """Yield raw log rows from one file, choosing the reader by extension."""
+    if path.endswith(".jsonl"):
+        return _iter_jsonl(path)
+    if path.endswith(".csv"):
+        return _iter_csv(path)
+    if path.endswith((".parquet", ".arrow")):
+        return _iter_columnar(path)
+    raise ValueError(f"Unsupported log file: {path}")
+
+
+# ---------- normalization ----------
+
+_PUNCT_RE = re.compile(r"[^\w\s\-]+")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace so near-duplicates group."""
+    text = _PUNCT_RE.sub(" ", (prompt or "").lower())
+    return _SPACE_RE.sub(" ", text).strip()
+
+
+def _row_campuses(row: Dict, parsed: Dict) -> List[str]:
+    campuses = (parsed.get("parameters") or {}).get("campuses") or []
+    if campuses:
+        return sorted({str(c) for c in campuses})
+    raw = str(row.get("campus") or "")
+    if raw.startswith("MULTI:"):
+        return sorted({c for c in raw[len("MULTI:"):].split(",") if c})
+    return [_CAMPUS_NAMES.get(raw, raw)] if raw else []
+
+
+def _row_filters(parsed: Dict) -> List[str]:
+    filters = parsed.get("filters") or {}
+    out = []
+    focus = filters.get("focus_only")
+    if focus:
+        out.append(f"focus:{focus}")
+    if filters.get("required_only"):
+        out.append("required_only")
+    for cat in filters.get("categories") or []:
+        out.append(f"category:{cat}")
+    if filters.get("completed_courses"):
+        out.append("completed_courses")
+    if filters.get("domains_completed"):
+        out.append("domains_completed")
+    return out or ["none"]
+
+
+def _parsed_json(row: Dict) -> Dict:
+    parsed = row.get("parsed_json")
+    if isinstance(parsed, dict):
+        return parsed
+    try:
+        value = json.loads(parsed or "{}")
+        return value if isinstance(value, dict) else {}
+    except (TypeError, json.JSONDecodeError):
+        return {}
+
+
+# ---------- aggregation ----------
+
+class _TopK:
+    """Bounded frequent-items counter: prunes to the top `capacity` when it doubles."""
+
+    def __init__(self, capacity: int = 1000):
+        self.capacity = capacity
+        self.counts: Counter = Counter()
+        self.extra: Dict[str, Counter] = {}
+
+    def add(self, key: str, extra: Iterable[str] = (), n: int = 1) -> None:
+        self.counts[key] += n
+        if extra:
+            self.extra.setdefault(key, Counter()).update(extra)
+        if len(self.counts) > 2 * self.capacity:
+            self._prune()
+
+    def _prune(self) -> None:
+        keep = dict(self.counts.most_common(self.capacity))
+        self.counts = Counter(keep)
+        self.extra = {k: v for k, v in self.extra.items() if k in keep}
+
+    def merge(self, other: "_TopK") -> None:
+        self.counts.update(other.counts)
+        for key, extra in other.extra.items():
+            self.extra.setdefault(key, Counter()).update(extra)
+        if len(self.counts) > 2 * self.capacity:
+            self._prune()
+
+    def top(self, k: int) -> List[Dict]:
+        return [
+            {"prompt": key, "count": count, "campuses": sorted(self.extra.get(key, {}))}
+            for key, count in self.counts.most_common(k)
+        ]
+
+
+def _log2_bucket(value: int) -> int:
+    return 0 if value <= 0 else 1 << int(math.log2(value))
+
+
+class LogStats:
+    """Mergeable single-pass aggregates over conversation log rows."""
+
+    def __init__(self):
+        self.rows = 0
+        self.zero_results = 0
+        self.results_total = 0
+        self.campus_mix: Counter = Counter()
+        self.filter_mix: Counter = Counter()
+        self.results_hist: Counter = Counter()
+        self.response_hist: Counter = Counter()
+        self.per_hour: Counter = Counter()
+        self.top_prompts = _TopK()
+        self.zero_prompts = _TopK()
+
+    def add(self, row: Dict) -> None:
+        parsed = _parsed_json(row)
+        campuses = _row_campuses(row, parsed)
+        try:
+            results = int(row.get("results") or 0)
+        except (TypeError, ValueError):
+            results = 0
+        prompt = normalize_prompt(str(row.get("prompt") or ""))
+
+        self.rows += 1
+        self.results_total += results
+        self.campus_mix.update(campuses or ["none"])
+        self.filter_mix.update(_row_filters(parsed))
+        self.results_hist[min(results, 100)] += 1
+        self.response_hist[_log2_bucket(len(str(row.get("response") or "")))] += 1
+        self.per_hour[str(row.get("timestamp") or "")[:13]] += 1
+        if prompt:
+            self.top_prompts.add(prompt, campuses)
+            if results == 0:
+                self.zero_results += 1
+                self.zero_prompts.add(prompt, campuses)
+        elif results == 0:
+            self.zero_results += 1
+
+    def merge(self, other: "LogStats") -> "LogStats":
+        self.rows += other.rows
+        self.zero_results += other.zero_results
+        self.results_total += other.results_total
+        for name in ("campus_mix", "filter_mix", "results_hist", "response_hist", "per_hour"):
+            getattr(self, name).update(getattr(other, name))
+        self.top_prompts.merge(other.top_prompts)
+        self.zero_prompts.merge(other.zero_prompts)
+        return self
+
+    @staticmethod
+    def _hist_quantile(hist: Counter, q: float) -> int:
+        total = sum(hist.values())
+        if not total:
+            return 0
+        target, seen = q * total, 0
+        for bucket in sorted(hist):
+            seen += hist[bucket]
+            if seen >= target:
+                return bucket
+        return max(hist)
+
+    def report(self, top_k: int = TOP_K) -> Dict:
+        rows = self.rows or 1
+        busiest = self.per_hour.most_common(1)
+        return {
+            "rows": self.rows,
+            "campus_mix": dict(self.campus_mix.most_common()),
+            "filter_mix": dict(self.filter_mix.most_common()),
+            "zero_result_rate": round(self.zero_results / rows, 4),
+            "results_per_query": {
+                "mean": round(self.results_total / rows, 2),
+                "p50": self._hist_quantile(self.results_hist, 0.5),
+                "p90": self._hist_quantile(self.results_hist, 0.9),
+                "histogram": {str(k): v for k, v in sorted(self.results_hist.items())},
+            },
+            "response_chars": {
+                # log2 buckets: each value is the lower bound of its bucket
+                "p50": self._hist_quantile(self.response_hist, 0.5),
+                "p90": self._hist_quantile(self.response_hist, 0.9),
+                "p99": self._hist_quantile(self.response_hist, 0.99),
+                "histogram": {str(k): v for k, v in sorted(self.response_hist.items())},
+            },
+            "capacity": {
+                "active_hours": len(self.per_hour),
+                "mean_queries_per_active_hour": round(self.rows / max(len(self.per_hour), 1), 2),
+                "peak_hour": busiest[0][0] if busiest else None,
+                "peak_queries_per_hour": busiest[0][1] if busiest else 0,
+            },
+            "top_prompts": self.top_prompts.top(top_k),
+            "zero_result_prompts": self.zero_prompts.top(top_k),
+            "warmup": self.top_prompts.top(top_k),
+        }
+
+
+def analyze_file(path: str) -> LogStats:
+    stats = LogStats()
+    for row in iter_log_rows(path):
+        stats.add(row)
+    return stats
+
+
+def analyze_files(paths: List[str], jobs: Optional[int] = None) -> LogStats:
+    """Aggregate several files, one worker process per file."""
+    total = LogStats()
+    if len(paths) <= 1 or jobs == 1:
+        for path in paths:
+            total.merge(analyze_file(path))
+        return total
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        for stats in pool.map(analyze_file, paths):
+            total.merge(stats)
+    return total
+
+
+def default_paths() -> List[str]:
+    root, ext = os.path.splitext(DEFAULT_LOG)
+    return sorted(p for p in glob.glob(f"{root}*{ext}") if os.path.isfile(p))
+
+
+def _print_text(report: Dict) -> None:
+    print("=" * 60)
+    print(f"  Conversation log analytics ({report['rows']} queries)")
+    print("=" * 60)
+    print("\nCampus mix:")
+    for k, v in report["campus_mix"].items():
+        print(f"  {k:<24} {v}")
+    print("\nFilter mix:")
+    for k, v in report["filter_mix"].items():
+        print(f"  {k:<24} {v}")
+    rpq = report["results_per_query"]
+    print(f"\nZero-result rate: {report['zero_result_rate']:.1%}")
+    print(f"Results per query: mean {rpq['mean']}, p50 {rpq['p50']}, p90 {rpq['p90']}")
+    rc = report["response_chars"]
+    print(f"Response size (chars, log2 buckets): p50 {rc['p50']}, p90 {rc['p90']}, p99 {rc['p99']}")
+    cap = report["capacity"]
+    print(f"Peak hour: {cap['peak_hour']} ({cap['peak_queries_per_hour']} queries)")
+    print("\nTop prompts:")
+    for item in report["top_prompts"][:10]:
+        print(f"  {item['count']:>5}  {item['prompt'][:70]}")
+    print("\nTop zero-result prompts:")
+    for item in report["zero_result_prompts"][:10]:
+        print(f"  {item['count']:>5}  {item['prompt'][:70]}")
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Single-pass analytics over conversation logs")
+    parser.add_argument("paths", nargs="*", help="Log files (.jsonl/.csv/.parquet/.arrow). "
+                        "Default: data/user_log*.jsonl. Don't mix a CSV and JSONL of the same log; "
+                        "they hold the same rows.")
+    parser.add_argument("--jobs", "-j", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--top", type=int, default=TOP_K, help="How many top prompts to report")
+    parser.add_argument("--json", action="store_true", help="Print the full report as JSON")
+    parser.add_argument("--output", "-o", help="Also write the JSON report to this file")
+    args = parser.parse_args()
+
+    paths = args.paths or default_paths()
+    if not paths:
+        print(f"❌ No log files found (looked for {DEFAULT_LOG})")
+        sys.exit(1)
+
+    report = analyze_files(paths, jobs=args.jobs).report(top_k=args.top)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        _print_text(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Chat history retention: move sessions older than N days out of chat_history.
+
+Sessions whose last message is older than the cutoff are archived in batches:
+each batch is appended to a gzipped JSONL file as its own gzip member and
+fsynced, then deleted from the hot table in one short transaction. On
+PostgreSQL with a partitioned chat_history, monthly partitions left empty
+are then detached and dropped, and upcoming partitions are created.
+Message blobs no longer referenced by any message are removed last.
+
+--to-table moves sessions into the chat_history_archive table instead of
+files (the SQLite / non-partitioned fallback; still readable through
+get_chat_history). --setup-partitions converts chat_history to monthly
+partitions once (PostgreSQL).
+"""
+
+import gzip
+import json
+import os
+import sys
+from datetime import datetime, timedelta
+
+from dotenv import load_dotenv
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backend.database.repository import PostgresRepository  # noqa: E402
+
+RETENTION_DAYS = int(os.getenv("CHAT_RETENTION_DAYS", "90"))
+ARCHIVE_DIR = os.getenv("CHAT_ARCHIVE_DIR", "data/chat_archive")
+BATCH_SESSIONS = int(os.getenv("CHAT_ARCHIVE_BATCH_SESSIONS", "500"))
+
+
+def append_gzip_jsonl(path, rows):
+    """Append rows as one complete gzip member, durable before returning."""
+    with open(path, "ab") as raw:
+        with gzip.GzipFile(fileobj=raw, mode="wb") as gz:
+            for row in rows:
+                line = json.dumps(row, ensure_ascii=False, default=str) + "\n"
+                gz.write(line.encode("utf-8"))
+        raw.flush()
+        os.fsync(raw.fileno())
+
+
+def iter_archived_messages(archive_dir=ARCHIVE_DIR, session_id=None):
+    """Read archived messages back (optionally for one session), file by file."""
+    if not os.path.isdir(archive_dir):
+        return
+    for name in sorted(os.listdir(archive_dir)):
+        if not name.endswith(".jsonl.gz"):
+            continue
+        with gzip.open(os.path.join(archive_dir, name), "rt", encoding="utf-8") as f:
+            for line in f:
+                row = json.loads(line)
+                if session_id is None or row["session_id"] == session_id:
+                    yield row
+
+
+def archive(repo, older_than_days=RETENTION_DAYS, batch_sessions=BATCH_SESSIONS,
+            archive_dir=ARCHIVE_DIR, to_table=False, dry_run=False):
+    """Returns (sessions_archived, messages_archived, archive_file or None)."""
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    if dry_run:
+        return len(repo.get_archivable_sessions(cutoff, limit=None)), 0, None
+
+    path = None
+    if not to_table:
+        os.makedirs(archive_dir, exist_ok=True)
+        path = os.path.join(archive_dir, f"chat_history_{datetime.utcnow():%Y%m%d-%H%M%S}.jsonl.gz")
+
+    sessions = messages = 0
+    while True:
+        session_ids = repo.get_archivable_sessions(cutoff, limit=batch_sessions)
+        if not session_ids:
+            break
+
+        if to_table:
+            messages += repo.move_sessions_to_archive_table(session_ids, cutoff)
+        else:
+            rows = repo.get_messages_for_sessions(session_ids, cutoff)
+            append_gzip_jsonl(path, rows)  # written and fsynced before the delete
+            messages += repo.delete_sessions(session_ids, cutoff)
+        sessions += len(session_ids)
+        print(f"  📦 Archived {sessions} session(s), {messages} message(s) so far")
+
+    return sessions, messages, path if messages else None
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Archive old chat sessions out of chat_history")
+    parser.add_argument("--older-than-days", type=int, default=RETENTION_DAYS,
+                        help=f"Archive sessions idle for more than N days (default: {RETENTION_DAYS})")
+    parser.add_argument("--batch-sessions", type=int, default=BATCH_SESSIONS,
+                        help=f"Sessions per batch/transaction (default: {BATCH_SESSIONS})")
+    parser.add_argument("--archive-dir", default=ARCHIVE_DIR, help=f"Where gzip files go (default: {ARCHIVE_DIR})")
+    parser.add_argument("--to-table", action="store_true", help="Move into chat_history_archive instead of files")
+    parser.add_argument("--setup-partitions", action="store_true",
+                        help="Convert chat_history to monthly partitions first (PostgreSQL, one time)")
+    parser.add_argument("--dry-run", action="store_true", help="Count archivable sessions without moving them")
+    args = parser.parse_args()
+
+    load_dotenv()
+    database_url = os.getenv("DATABASE_URL")
+    if not database_url:
+        print("❌ DATABASE_URL not found in environment")
+        sys.exit(1)
+
+    repo = PostgresRepository(database_url)
+
+    if args.setup_partitions:
+        copied = repo.partition_chat_history()
+        print(f"✅ chat_history is partitioned by month ({copied} row(s) copied)")
+
+    print("=" * 60)
+    print(f"  Archiving sessions idle for more than {args.older_than_days} day(s)")
+    print("=" * 60)
+
+    sessions, messages, path = archive(
+        repo,
+        older_than_days=args.older_than_days,
+        batch_sessions=args.batch_sessions,
+        archive_dir=args.archive_dir,
+        to_table=args.to_table,
+        dry_run=args.dry_run,
+    )
+
+    if args.dry_run:
+        print(f"\n📊 Archivable sessions: {sessions}")
+        return
+
+    print(f"\n✅ Archived {sessions} session(s), {messages} message(s)")
+    if path:
+        print(f"   → {path}")
+
+    cutoff = datetime.utcnow() - timedelta(days=args.older_than_days)
+    for name in repo.drop_empty_chat_partitions(cutoff):
+        print(f"   🗑️  Dropped empty partition {name}")
+    purged = repo.delete_unreferenced_message_blobs(unused_for=timedelta(days=args.older_than_days))
+    if purged:
+        print(f"   🗑️  Removed {purged} unreferenced message blob(s)")
+    repo.ensure_chat_partitions()
+
+
+if __name__ == "__main__":
+    main()
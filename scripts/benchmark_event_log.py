@@ -0,0 +1,110 @@
+"""
+Benchmark the append-only event log against the legacy rewrite-the-file log.
+
+The legacy writer re-reads and rewrites the whole day's JSON array on every
+event, so it is only run for a small count and its per-event cost is shown
+alongside; the JSONL writer is run at the full count (100k by default),
+optionally from several processes at once, and then read back with
+iter_events() to check that nothing was lost or torn.
+"""
+
+import datetime
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from multiprocessing import Process
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from log_writer import EventLog, iter_events  # noqa: E402
+
+
+def _sample_event(n: int, worker: int = 0) -> dict:
+    return {
+        "event": "prompt_received",
+        "worker": worker,
+        "seq": n,
+        "session_id": f"sess_{n % 5000:06x}",
+        "prompt_length": 40 + n % 200,
+        "timestamp": datetime.datetime.utcnow().isoformat(),
+    }
+
+
+def legacy_log_event(data, folder):
+    """The previous log_writer.log_event: load, append, rewrite."""
+    path = os.path.join(folder, f"nexa_log_{datetime.date.today().isoformat()}.json")
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            logs = json.load(f)
+    else:
+        logs = []
+    logs.append(data)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(logs, f, ensure_ascii=False, indent=2)
+
+
+def _write_events(folder: str, count: int, worker: int, max_bytes: int) -> None:
+    event_log = EventLog(folder, max_bytes=max_bytes)
+    for n in range(count):
+        event_log.log(_sample_event(n, worker))
+    event_log.close()
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark the JSONL event log")
+    parser.add_argument("--events", type=int, default=100_000, help="Events per day for the JSONL writer")
+    parser.add_argument("--legacy-events", type=int, default=1_000, help="Events for the legacy writer")
+    parser.add_argument("--workers", type=int, default=4, help="Processes writing concurrently")
+    parser.add_argument("--max-bytes", type=int, default=8 * 1024 * 1024, help="Segment size before rotation")
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix="event_log_bench_")
+    try:
+        legacy_dir = os.path.join(root, "legacy")
+        os.makedirs(legacy_dir)
+        start = time.perf_counter()
+        for n in range(args.legacy_events):
+            legacy_log_event(_sample_event(n), legacy_dir)
+        legacy_secs = time.perf_counter() - start
+
+        single_dir = os.path.join(root, "single")
+        start = time.perf_counter()
+        _write_events(single_dir, args.events, 0, args.max_bytes)
+        single_secs = time.perf_counter() - start
+
+        multi_dir = os.path.join(root, "multi")
+        per_worker = args.events // args.workers
+        procs = [
+            Process(target=_write_events, args=(multi_dir, per_worker, w, args.max_bytes))
+            for w in range(args.workers)
+        ]
+        start = time.perf_counter()
+        for p in procs:
+            p.start()
+        for p in procs:
+            p.join()
+        multi_secs = time.perf_counter() - start
+
+        start = time.perf_counter()
+        read_back = sum(1 for _ in iter_events(multi_dir))
+        read_secs = time.perf_counter() - start
+        segments = len([n for n in os.listdir(multi_dir) if n.endswith(".jsonl")])
+
+        print(f"legacy   : {args.legacy_events:>7} events in {legacy_secs:7.2f}s "
+              f"({args.legacy_events / legacy_secs:>9.0f} ev/s, last event cost grows with file size)")
+        print(f"jsonl x1 : {args.events:>7} events in {single_secs:7.2f}s "
+              f"({args.events / single_secs:>9.0f} ev/s)")
+        print(f"jsonl x{args.workers} : {per_worker * args.workers:>7} events in {multi_secs:7.2f}s "
+              f"({per_worker * args.workers / multi_secs:>9.0f} ev/s, {segments} segment(s))")
+        print(f"read back: {read_back:>7} events in {read_secs:7.2f}s "
+              f"({'ok' if read_back == per_worker * args.workers else 'MISMATCH'})")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
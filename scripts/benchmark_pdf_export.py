@@ -0,0 +1,95 @@
+"""
+Benchmark PDF export for growing conversations.
+
+For each transcript size it times a cold export (empty parse cache), then a
+re-export after one more turn is appended, which is what happens when a
+student downloads the chat again later in the same session.
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backend import pdf_export  # noqa: E402
+
+
+SAMPLE_TABLE = "\n".join(
+    ["| DVC Course | DVC Title | UC Course | UC Title | Units |", "|---|---|---|---|---|"]
+    + [
+        f"| **COMSC-{110 + n}** | Programming Concepts {n} | **COMPSCI-{61 + n}A** | Structure {n} | 4.0 |"
+        for n in range(12)
+    ]
+)
+
+
+def build_transcript(turns: int) -> list[dict]:
+    """Build a transcript of `turns` messages that alternates user/assistant."""
+    messages = []
+    for n in range(turns):
+        if n % 2 == 0:
+            messages.append({"role": "user", "content": f"What do I need for UC Berkeley CS? (question {n})"})
+        else:
+            messages.append({
+                "role": "assistant",
+                "content": (
+                    f"## Transfer Preparation for UC Berkeley (turn {n})\n\n"
+                    "### Course Equivalencies\n\n"
+                    f"{SAMPLE_TABLE}\n\n"
+                    "### Next Steps\n"
+                    "1. Review the courses above\n"
+                    "2. Plan your **semester** enrollment\n"
+                    "- Ask about *specific* courses"
+                ),
+            })
+    return messages
+
+
+def _timed(fn, *args) -> float:
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+
+def _build_story(messages: list[dict]) -> list:
+    return list(pdf_export._iter_story(messages, "Chat Conversation"))
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark cold vs. incremental PDF export")
+    parser.add_argument("--sizes", default="10,100,1000", help="Comma-separated message counts")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+
+    header = (
+        f"{'messages':>9} | {'story cold (s)':>14} | {'story warm (s)':>14} | "
+        f"{'pdf cold (s)':>12} | {'pdf warm (s)':>12} | {'parse misses':>12}"
+    )
+    print(header)
+    print("-" * len(header))
+    for size in sizes:
+        messages = build_transcript(size)
+
+        pdf_export._clear_block_cache()
+        story_cold = _timed(_build_story, messages)
+        pdf_export._clear_block_cache()
+        pdf_cold = _timed(pdf_export.generate_chat_pdf, messages)
+
+        # One more turn arrives, then the student downloads again.
+        messages = messages + build_transcript(size + 2)[size:]
+        before = len(pdf_export._block_cache)
+        pdf_warm = _timed(pdf_export.generate_chat_pdf, messages)
+        misses = len(pdf_export._block_cache) - before
+        story_warm = _timed(_build_story, messages)
+
+        print(
+            f"{size:>9} | {story_cold:>14.3f} | {story_warm:>14.3f} | "
+            f"{pdf_cold:>12.3f} | {pdf_warm:>12.3f} | {misses:>12}"
+        )
+
+
+if __name__ == "__main__":
+    main()
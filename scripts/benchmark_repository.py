@@ -0,0 +1,215 @@
+"""
+Benchmark PostgresRepository methods at growing data sizes.
+
+For each scale (10×, 100× and 1000× the data/archived row count by default) it
+builds a fresh database from generate_synthetic_data.py, times the bulk load,
+then runs every read/write path the app uses a number of times and reports the
+p50/p95 latency and the peak Python memory of one call (tracemalloc). Reading
+the rows for one method down the scales gives its latency and memory curve.
+
+SQLite (a temp file) always runs. PostgreSQL runs when --postgres-url or
+BENCH_POSTGRES_URL is set; its tables are dropped and recreated for every
+scale, so point it at a throwaway database.
+"""
+
+import json
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from sqlalchemy import insert  # noqa: E402
+
+from backend.database.models import Base, ChatHistory  # noqa: E402
+from backend.database.repository import PostgresRepository  # noqa: E402
+from backend.entity_extractor import message_entities  # noqa: E402
+from generate_synthetic_data import generate_chat_histories, generate_transfer_rules, scale_profile  # noqa: E402
+
+BENCH_POSTGRES_URL = os.getenv("BENCH_POSTGRES_URL", "")
+
+
+def _fresh_repository(url: str) -> PostgresRepository:
+    if not url.startswith("sqlite"):
+        repo = PostgresRepository(url)
+        Base.metadata.drop_all(repo.engine)
+        repo.engine.dispose()
+    return PostgresRepository(url)
+
+
+def _load_chat_rows(repo: PostgresRepository, messages, batch_size: int = 5000) -> Tuple[int, List[str]]:
+    """
+    Insert generated messages directly (save_message per row would dominate the
+    setup time). Returns (rows inserted, session ids in first-seen order).
+    """
+    total, session_ids, batch = 0, {}, []
+    with repo.engine.begin() as conn:
+        for session_id, role, content, at in messages:
+            session_ids.setdefault(session_id, None)
+            batch.append({
+                "session_id": session_id,
+                "role": role,
+                "content": content,
+                "entities": (message_entities(content) or None) if role == "user" else None,
+                "timestamp": at,
+            })
+            if len(batch) >= batch_size:
+                conn.execute(insert(ChatHistory.__table__), batch)
+                total, batch = total + len(batch), []
+        if batch:
+            conn.execute(insert(ChatHistory.__table__), batch)
+            total += len(batch)
+    return total, list(session_ids)
+
+
+def _measure(fn: Callable, repeat: int) -> Dict:
+    fn()  # warm-up: connection pool, statement cache, transcript seeding
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    samples.sort()
+    return {
+        "p50_ms": round(statistics.median(samples), 3),
+        "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 3),
+        "peak_kib": round(peak / 1024, 1),
+    }
+
+
+def bench_scale(url: str, scale: int, repeat: int, messages_per_session: int, seed: int) -> List[Dict]:
+    profile = scale_profile(scale)
+    campuses, years = profile["campuses"], profile["years"]
+    rules = lambda: generate_transfer_rules(  # noqa: E731
+        campuses, years, profile["majors"], seed=seed,
+        shared_categories=profile["shared_categories"], lagging_majors=profile["lagging_majors"],
+    )
+    # a major with the newest year loaded, and one only loaded for older years (when there are any)
+    major = profile["majors"][0]
+    older_major = (profile["lagging_majors"] or profile["majors"])[-1]
+    rng = random.Random(seed)
+    repo = _fresh_repository(url)
+    results = []
+    try:
+        tracemalloc.start()
+        stats = repo.bulk_load_transfer_rules(rules())
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        rows = stats["rows"]
+        results.append({"op": "bulk_load_transfer_rules", "p50_ms": round(stats["seconds"] * 1000, 1),
+                        "p95_ms": None, "peak_kib": round(peak / 1024, 1)})
+
+        sessions = 20 * scale
+        messages, session_ids = _load_chat_rows(repo, generate_chat_histories(
+            sessions, messages_per_session, campuses, seed=seed,
+        ))
+        # Steady state: the sessions being read/written already have a transcript.
+        session_ids = rng.sample(session_ids, min(len(session_ids), 50))
+        for session_id in session_ids:
+            repo.save_message(session_id, "user", "and what about UC Berkeley?")
+
+        campus, year = campuses[0], years[0]
+        scope_rows = [r for r in rules() if r["target_college"] == campus and r["academic_year"] == year]
+        ops = {
+            "replace_transfer_rules_for_campus": lambda: repo.replace_transfer_rules_for_campus(campus, year, scope_rows),
+            "get_campuses": repo.get_campuses,
+            "get_categories": lambda: repo.get_categories(campus, year),
+            "get_courses (1 campus)": lambda: repo.get_courses([campus]),
+            "get_courses (filtered)": lambda: repo.get_courses(
+                [campus], required_only=True, focus_only="cs", completed_courses={"COMSC-110"},
+            ),
+            "get_courses (all campuses)": lambda: repo.get_courses(campuses),
+            "get_courses (1 major)": lambda: repo.get_courses([campus], majors=[major]),
+            "get_courses (1 campus, uncached)": lambda: (repo.invalidate_catalog_cache(), repo.get_courses([campus])),
+            "get_courses (1 major, uncached)": lambda: (
+                repo.invalidate_catalog_cache(), repo.get_courses([campus], majors=[major]),
+            ),
+            "get_courses (older-year major, uncached)": lambda: (
+                repo.invalidate_catalog_cache(), repo.get_courses([campus], majors=[older_major]),
+            ),
+            "get_majors": lambda: repo.get_majors(campus),
+            "save_message": lambda: repo.save_message(rng.choice(session_ids), "user", "what about UC Davis?"),
+            "get_chat_history": lambda: repo.get_chat_history(rng.choice(session_ids), limit=16),
+            "get_transcript": lambda: repo.get_transcript(rng.choice(session_ids)),
+            "get_chat_history_page": lambda: repo.get_chat_history_page(rng.choice(session_ids), limit=50),
+            "get_session_summaries": lambda: repo.get_session_summaries(days=60, limit=50),
+        }
+        for name, fn in ops.items():
+            results.append({"op": name, **_measure(fn, repeat)})
+    finally:
+        repo.engine.dispose()
+
+    backend = repo.engine.dialect.name
+    for result in results:
+        result.update(backend=backend, scale=scale, rules=rows, messages=messages)
+    return results
+
+
+def _print_table(results: List[Dict]) -> None:
+    header = (
+        f"{'backend':<10} | {'scale':>5} | {'rules':>7} | {'messages':>8} | {'operation':<40} | "
+        f"{'p50 ms':>9} | {'p95 ms':>9} | {'peak KiB':>9}"
+    )
+    print(header)
+    print("-" * len(header))
+    for r in sorted(results, key=lambda r: (r["backend"], r["op"], r["scale"])):
+        p95 = "" if r["p95_ms"] is None else f"{r['p95_ms']:>9.2f}"
+        print(
+            f"{r['backend']:<10} | {r['scale']:>5} | {r['rules']:>7} | {r['messages']:>8} | {r['op']:<40} | "
+            f"{r['p50_ms']:>9.2f} | {p95:>9} | {r['peak_kib']:>9.1f}"
+        )
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark repository methods at 10×/100×/1000× data")
+    parser.add_argument("--scales", default="10,100,1000", help="Comma-separated multiples of the data/archived size")
+    parser.add_argument("--repeat", type=int, default=20, help="Timed calls per operation")
+    parser.add_argument("--messages-per-session", type=int, default=10)
+    parser.add_argument("--postgres-url", default=BENCH_POSTGRES_URL, help="Throwaway PostgreSQL database to include")
+    parser.add_argument("--no-sqlite", action="store_true", help="Only benchmark PostgreSQL")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    parser.add_argument("-o", "--output", help="Write JSON results to this file")
+    args = parser.parse_args()
+
+    scales = [int(s) for s in args.scales.split(",") if s.strip()]
+    tmpdir = tempfile.mkdtemp(prefix="repo_bench_")
+    targets = [] if args.no_sqlite else [("sqlite", lambda scale: f"sqlite:///{os.path.join(tmpdir, f'bench_{scale}.db')}")]
+    if args.postgres_url:
+        targets.append(("postgresql", lambda scale: args.postgres_url))
+
+    results: List[Dict] = []
+    try:
+        for name, url_for in targets:
+            for scale in scales:
+                print(f"[..] {name} at {scale}×", file=sys.stderr)
+                try:
+                    results.extend(bench_scale(url_for(scale), scale, args.repeat, args.messages_per_session, args.seed))
+                except Exception as exc:
+                    print(f"[ERROR] {name} at {scale}×: {exc}", file=sys.stderr)
+                    break
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        _print_table(results)
+
+
+if __name__ == "__main__":
+    main()
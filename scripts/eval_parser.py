@@ -0,0 +1,308 @@
+"""
+Offline evaluation of the message parser against logged traffic.
+
+Replays the prompts in data/user_log.jsonl (or any conversation log) through
+the same messages llm_parse_user_message sends, with each session's earlier
+turns as history. The new parse is compared field by field with the
+parsed_json recorded when the prompt was logged. Calls run concurrently on
+one event loop, bounded by --concurrency in flight and --rps per second, so
+a full log replays in minutes rather than hours.
+
+Reports agreement rates (exact and per field), latency percentiles, token
+distributions including cached prompt tokens, and a sample of disagreements.
+
+--cache-out writes the warm parse cache: the raw parser output for every
+first-turn prompt, keyed by normalized prompt and tagged with the parser
+prompt version. Point PARSE_CACHE_PATH at it and llm_parse_user_message
+answers those prompts without an API call until the parser prompt changes.
+"""
+
+import asyncio
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from openai import AsyncOpenAI
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backend import ai_agent  # noqa: E402
+from analyze_conversation_logs import DEFAULT_LOG, iter_log_rows  # noqa: E402
+
+CONCURRENCY = int(os.getenv("PARSER_EVAL_CONCURRENCY", "8"))
+REQUESTS_PER_SECOND = float(os.getenv("PARSER_EVAL_RPS", "5"))
+COMPARED_FIELDS = (
+    "intent",
+    "campuses",
+    "focus_only",
+    "required_only",
+    "domains_completed",
+    "completed_courses",
+    "categories",
+)
+
+
+# ---------- input ----------
+
+def load_turns(path: str, with_history: bool = True, limit: Optional[int] = None) -> List[Dict]:
+    """Logged turns in session order, each with the history the parser would have seen."""
+    sessions: Dict[str, List[Dict]] = defaultdict(list)
+    for row in iter_log_rows(path):
+        if not row.get("prompt") or not row.get("parsed_json"):
+            continue
+        try:
+            logged = json.loads(row["parsed_json"])
+        except (TypeError, ValueError):
+            continue
+        sessions[row.get("session_id") or ""].append({
+            "query_id": int(row.get("query_id") or 0),
+            "timestamp": str(row.get("timestamp") or ""),
+            "prompt": row["prompt"],
+            "response": row.get("response") or "",
+            "logged": logged,
+        })
+
+    turns: List[Dict] = []
+    for rows in sessions.values():
+        rows.sort(key=lambda r: (r["query_id"], r["timestamp"]))
+        history: List[Dict] = []
+        for r in rows:
+            turns.append({"prompt": r["prompt"], "logged": r["logged"], "history": list(history) if with_history else []})
+            history.append({"role": "user", "content": r["prompt"]})
+            history.append({"role": "assistant", "content": r["response"]})
+    return turns[:limit] if limit else turns
+
+
+def comparable(parsed: Dict) -> Dict:
+    params = parsed.get("parameters") or {}
+    filters = parsed.get("filters") or {}
+    campuses = params.get("campuses") or ([params["campus"]] if params.get("campus") else [])
+    return {
+        "intent": parsed.get("intent") or "find_requirements",
+        "campuses": sorted(campuses),
+        "majors": sorted(params.get("majors") or []),
+        "focus_only": filters.get("focus_only"),
+        "required_only": bool(filters.get("required_only")),
+        "domains_completed": sorted(filters.get("domains_completed") or []),
+        "completed_courses": sorted(filters.get("completed_courses") or []),
+        "categories": sorted(filters.get("categories") or []),
+    }
+
+
+# ---------- replay ----------
+
+class RateLimiter:
+    """Spaces request starts at least 1/rate seconds apart across all tasks."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self.next_at = 0.0
+        self.lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self.lock:
+            now = time.monotonic()
+            delay = self.next_at - now
+            self.next_at = max(now, self.next_at) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+async def parse_turn(client, turn: Dict, semaphore: asyncio.Semaphore, limiter: RateLimiter) -> Dict:
+    async with semaphore:
+        await limiter.acquire()
+        start = time.perf_counter()
+        try:
+            resp = await client.chat.completions.create(
+                model=ai_agent.PARSER_MODEL,
+                response_format={"type": "json_object"},
+                messages=ai_agent._parser_messages(turn["prompt"], turn["history"]),
+                temperature=0,
+            )
+        except Exception as exc:
+            return {**turn, "error": str(exc)}
+        latency = time.perf_counter() - start
+
+    raw = resp.choices[0].message.content
+    try:
+        parsed = ai_agent._normalize_parsed(json.loads(raw), turn["prompt"], turn["history"])
+    except Exception as exc:
+        return {**turn, "error": f"unparseable output: {exc}"}
+
+    usage = resp.usage
+    details = getattr(usage, "prompt_tokens_details", None)
+    return {
+        **turn,
+        "raw": raw,
+        "parsed": parsed,
+        "latency": latency,
+        "prompt_tokens": getattr(usage, "prompt_tokens", 0) or 0,
+        "completion_tokens": getattr(usage, "completion_tokens", 0) or 0,
+        "cached_tokens": getattr(details, "cached_tokens", 0) or 0,
+    }
+
+
+async def replay(turns: List[Dict], concurrency: int = CONCURRENCY, rps: float = REQUESTS_PER_SECOND) -> List[Dict]:
+    client = AsyncOpenAI()
+    semaphore = asyncio.Semaphore(concurrency)
+    limiter = RateLimiter(rps)
+    tasks = [asyncio.create_task(parse_turn(client, turn, semaphore, limiter)) for turn in turns]
+    results = []
+    for done, task in enumerate(asyncio.as_completed(tasks), 1):
+        results.append(await task)
+        if done % 50 == 0 or done == len(tasks):
+            print(f"  🔁 {done}/{len(tasks)} parsed", file=sys.stderr)
+    await client.close()
+    return results
+
+
+# ---------- report ----------
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def _distribution(values: List[float], digits: int = 1) -> Dict:
+    return {
+        "mean": round(sum(values) / len(values), digits) if values else 0.0,
+        "p50": round(_percentile(values, 50), digits),
+        "p90": round(_percentile(values, 90), digits),
+        "p95": round(_percentile(values, 95), digits),
+        "p99": round(_percentile(values, 99), digits),
+        "max": round(max(values), digits) if values else 0.0,
+    }
+
+
+def build_report(results: List[Dict], sample: int = 20) -> Dict:
+    ok = [r for r in results if "parsed" in r]
+    field_agree = dict.fromkeys(COMPARED_FIELDS, 0)
+    exact = 0
+    disagreements = []
+    for r in ok:
+        old, new = comparable(r["logged"]), comparable(r["parsed"])
+        diff = [f for f in COMPARED_FIELDS if old[f] != new[f]]
+        for field in COMPARED_FIELDS:
+            field_agree[field] += field not in diff
+        if not diff:
+            exact += 1
+        elif len(disagreements) < sample:
+            disagreements.append({
+                "prompt": r["prompt"],
+                "history_turns": len(r["history"]) // 2,
+                "logged": {f: old[f] for f in diff},
+                "new": {f: new[f] for f in diff},
+            })
+
+    n = len(ok) or 1
+    prompt_tokens = [r["prompt_tokens"] for r in ok]
+    cached_tokens = [r["cached_tokens"] for r in ok]
+    return {
+        "turns": len(results),
+        "errors": len(results) - len(ok),
+        "error_samples": [r["error"] for r in results if "error" in r][:5],
+        "prompt_version": ai_agent.PARSER_PROMPT_VERSION,
+        "exact_agreement": round(exact / n, 4),
+        "field_agreement": {f: round(c / n, 4) for f, c in field_agree.items()},
+        "latency_ms": _distribution([r["latency"] * 1000 for r in ok], digits=0),
+        "tokens": {
+            "prompt": _distribution(prompt_tokens),
+            "completion": _distribution([r["completion_tokens"] for r in ok]),
+            "cached": _distribution(cached_tokens),
+            "total_prompt": sum(prompt_tokens),
+            "total_cached": sum(cached_tokens),
+            "cached_ratio": round(sum(cached_tokens) / sum(prompt_tokens), 3) if sum(prompt_tokens) else 0.0,
+        },
+        "disagreements": disagreements,
+    }
+
+
+def build_cache_artifact(results: List[Dict]) -> Dict:
+    """Raw parser output for first-turn prompts; what PARSE_CACHE_PATH loads."""
+    entries: Dict[str, str] = {}
+    for r in results:
+        if "raw" in r and not r["history"]:
+            entries.setdefault(ai_agent.parse_cache_key(r["prompt"]), r["raw"])
+    return {
+        "prompt_version": ai_agent.PARSER_PROMPT_VERSION,
+        "model": ai_agent.PARSER_MODEL,
+        "created_at": datetime.utcnow().isoformat(timespec="seconds"),
+        "entries": entries,
+    }
+
+
+def _print_text(report: Dict) -> None:
+    print("=" * 60)
+    print(f"  Parser evaluation ({report['turns']} turns, prompt {report['prompt_version']})")
+    print("=" * 60)
+    if report["errors"]:
+        print(f"\n⚠️  {report['errors']} call(s) failed, e.g. {report['error_samples'][0][:100]}")
+    print(f"\nExact agreement with logged parse: {report['exact_agreement']:.1%}")
+    for field, rate in report["field_agreement"].items():
+        print(f"  {field:<20} {rate:.1%}")
+    lat = report["latency_ms"]
+    print(f"\nLatency (ms): p50 {lat['p50']:.0f}, p95 {lat['p95']:.0f}, p99 {lat['p99']:.0f}, max {lat['max']:.0f}")
+    tok = report["tokens"]
+    print(f"Prompt tokens: mean {tok['prompt']['mean']}, p95 {tok['prompt']['p95']}, cached {tok['cached_ratio']:.1%}")
+    print(f"Completion tokens: mean {tok['completion']['mean']}, p95 {tok['completion']['p95']}")
+    if report["disagreements"]:
+        print("\nDisagreements:")
+        for item in report["disagreements"][:10]:
+            print(f"  • {item['prompt'][:70]}")
+            for field in item["new"]:
+                print(f"      {field}: {item['logged'][field]} → {item['new'][field]}")
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Replay logged prompts through the parser and diff against the log")
+    parser.add_argument("path", nargs="?", default=DEFAULT_LOG, help=f"Conversation log (default: {DEFAULT_LOG})")
+    parser.add_argument("--concurrency", "-c", type=int, default=CONCURRENCY, help=f"Calls in flight (default: {CONCURRENCY})")
+    parser.add_argument("--rps", type=float, default=REQUESTS_PER_SECOND,
+                        help=f"Max call starts per second (default: {REQUESTS_PER_SECOND})")
+    parser.add_argument("--limit", type=int, default=None, help="Only replay the first N turns")
+    parser.add_argument("--no-history", action="store_true", help="Parse every prompt standalone (all become cacheable)")
+    parser.add_argument("--sample", type=int, default=20, help="Disagreements to include in the report")
+    parser.add_argument("--json", action="store_true", help="Print the full report as JSON")
+    parser.add_argument("--output", "-o", help="Also write the JSON report to this file")
+    parser.add_argument("--cache-out", help="Write the warm parse cache artifact here (see PARSE_CACHE_PATH)")
+    args = parser.parse_args()
+
+    if not os.getenv("OPENAI_API_KEY"):
+        print("❌ OPENAI_API_KEY not found in environment")
+        sys.exit(1)
+    if not os.path.exists(args.path):
+        print(f"❌ Log not found: {args.path}")
+        sys.exit(1)
+
+    turns = load_turns(args.path, with_history=not args.no_history, limit=args.limit)
+    if not turns:
+        print("❌ No logged turns with parsed_json found")
+        sys.exit(1)
+    print(f"📦 Replaying {len(turns)} turn(s), {args.concurrency} in flight, ≤{args.rps}/s", file=sys.stderr)
+
+    results = asyncio.run(replay(turns, concurrency=args.concurrency, rps=args.rps))
+    report = build_report(results, sample=args.sample)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    if args.cache_out:
+        artifact = build_cache_artifact(results)
+        with open(args.cache_out, "w", encoding="utf-8") as f:
+            json.dump(artifact, f, ensure_ascii=False, indent=1)
+        print(f"💾 Wrote {len(artifact['entries'])} cached parse(s) to {args.cache_out}", file=sys.stderr)
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        _print_text(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,309 @@
+"""
+Generate synthetic transfer_rules rows and chat histories at a chosen scale.
+
+The rows look like what migrate_assist_to_transfer_rules.py produces from the
+ASSIST exports (DVC course ↔ UC course within a requirement category, with a
+domain, units and a minimum_required count), but for as many campuses, majors,
+years and categories as you ask for. Everything is seeded, so the same
+arguments always give the same data.
+
+Scale 1 is roughly the data in data/archived (3 campuses, one year and major,
+a few categories of ~5 courses); --scale N multiplies the row count by about N,
+spreading it over more campuses first, then more years, then more majors.
+--campuses/--years/--majors override what the scale picks.
+
+Each campus/year also gets campus-wide rows (major NULL), and with more than one
+year the last --lagging-majors majors are not loaded for the newest year, the
+way ASSIST agreements are published at different times.
+
+    python scripts/generate_synthetic_data.py --scale 100 --jsonl rules.jsonl
+    python scripts/generate_synthetic_data.py --scale 10 --database-url sqlite:///bench.db --sessions 200
+    python scripts/generate_synthetic_data.py --campuses UCB,UCD --years 3 --majors 20 --jsonl rules.jsonl
+"""
+
+import json
+import os
+import random
+import sys
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+CAMPUS_POOL = ["UCB", "UCD", "UCSD", "UCLA", "UCI", "UCSB", "UCSC", "UCR", "UCM"]
+BASE_CAMPUSES = 3
+MAX_YEARS = 5
+FIRST_YEAR = 2025
+
+MAJOR_POOL = [
+    "Computer Science", "Mathematics", "Data Science", "Physics", "Chemistry",
+    "Biology", "Economics", "Statistics", "Electrical Engineering", "Mechanical Engineering",
+]
+
+CATEGORY_POOL = [
+    ("Computer Science Requirements", "cs", True),
+    ("Mathematics Requirements", "math", True),
+    ("Science Requirements", "science", True),
+    ("Linear Algebra Requirement", "math", True),
+    ("Major Preparation", "cs", True),
+    ("Computer Science Requirements (Highly Recommended)", "cs", False),
+    ("General Education Breadth", "other", False),
+    ("Lower Division Electives", "other", False),
+]
+
+# DVC subject prefix, UC subject prefix and title stems per domain
+SUBJECTS = {
+    "cs": [("COMSC", "COMPSCI", ["Programming Concepts", "Data Structures", "Computer Organization",
+                                 "Discrete Structures", "Software Design"])],
+    "math": [("MATH", "MATH", ["Analytic Geometry and Calculus", "Linear Algebra",
+                               "Differential Equations", "Multivariable Calculus"]),
+             ("STAT", "STAT", ["Introduction to Statistics", "Probability"])],
+    "science": [("PHYS", "PHYSICS", ["Physics for Scientists and Engineers", "Electricity and Magnetism"]),
+                ("CHEM", "CHEM", ["General College Chemistry", "Organic Chemistry"]),
+                ("BIOSC", "BIO", ["Principles of Cellular and Molecular Biology", "Ecology"])],
+    "other": [("ENGL", "ENGLISH", ["Critical Thinking", "College Composition"]),
+              ("ECON", "ECON", ["Principles of Microeconomics", "Principles of Macroeconomics"]),
+              ("PHILO", "PHILOS", ["Introduction to Logic", "Ethics"])],
+}
+
+USER_PROMPTS = [
+    "What computer science courses do I need for {campus}?",
+    "I completed COMSC 110 and MATH 192, what's left for {campus}?",
+    "Only show required math courses for {campus}",
+    "What science courses transfer to {campus}?",
+    "Which courses count for major preparation at {campus}?",
+    "what about {campus}",
+]
+
+
+def scale_profile(
+    scale: int,
+    categories: int = 4,
+    courses_per_category: int = 5,
+    campuses: Optional[List[str]] = None,
+    years: Optional[List[str]] = None,
+    majors: Optional[List[str]] = None,
+    shared_categories: int = 1,
+    lagging_majors: int = 1,
+) -> Dict:
+    """
+    Campuses × years × majors giving about `scale` times the scale-1 row count;
+    campuses, years or majors given explicitly replace the scaled ones.
+    """
+    scale = max(1, int(scale))
+    campus_count = min(len(CAMPUS_POOL), BASE_CAMPUSES * scale)
+    left = BASE_CAMPUSES * scale / campus_count
+    year_count = max(1, min(MAX_YEARS, round(left)))
+    major_count = max(1, round(left / year_count))
+    years = years or [_year_name(n) for n in range(year_count)]
+    majors = majors or [_major_name(n) for n in range(major_count)]
+    return {
+        "campuses": campuses or CAMPUS_POOL[:campus_count],
+        "years": years,
+        "majors": majors,
+        "categories": categories,
+        "courses_per_category": courses_per_category,
+        "shared_categories": shared_categories,
+        # Majors whose newest agreement isn't out yet (only meaningful with 2+ years).
+        "lagging_majors": majors[len(majors) - min(lagging_majors, len(majors)):] if len(years) > 1 else [],
+    }
+
+
+def profile_row_count(profile: Dict) -> int:
+    """Rows generate_transfer_rules yields for a profile."""
+    major_years = len(profile["majors"]) * len(profile["years"]) - len(profile["lagging_majors"])
+    shared_years = len(profile["years"]) if profile["shared_categories"] else 0
+    per_campus = major_years * profile["categories"] + shared_years * profile["shared_categories"]
+    return len(profile["campuses"]) * per_campus * profile["courses_per_category"]
+
+
+def _campus_name(n: int) -> str:
+    base = CAMPUS_POOL[n % len(CAMPUS_POOL)]
+    return base if n < len(CAMPUS_POOL) else f"{base}{n // len(CAMPUS_POOL) + 1}"
+
+
+def _year_name(n: int) -> str:
+    return f"{FIRST_YEAR - n}-{FIRST_YEAR - n + 1}"
+
+
+def _major_name(n: int) -> str:
+    base = MAJOR_POOL[n % len(MAJOR_POOL)]
+    return base if n < len(MAJOR_POOL) else f"{base} {n // len(MAJOR_POOL) + 1}"
+
+
+def generate_transfer_rules(
+    campuses: List[str],
+    years: List[str],
+    majors: List[str],
+    categories: int = 4,
+    courses_per_category: int = 5,
+    seed: int = 0,
+    shared_categories: int = 0,
+    lagging_majors: Optional[List[str]] = None,
+) -> Iterator[Dict]:
+    """
+    Yield transfer_rules rows (the dicts bulk_load_transfer_rules takes), one
+    campus/year at a time. Each campus/year first gets `shared_categories`
+    campus-wide categories (major NULL); `lagging_majors` skip the first (newest) year.
+    """
+    rng = random.Random(seed)
+    lagging = set(lagging_majors or [])
+    shared = [(name, domain, required) for name, domain, required in CATEGORY_POOL if domain == "other"]
+    for campus in campuses:
+        for n_year, year in enumerate(years):
+            scopes = [
+                (None, shared[n] if n < len(shared) else (f"Campus-wide Requirement {n + 1}", "other", False))
+                for n in range(shared_categories)
+            ]
+            for major in majors:
+                if n_year == 0 and major in lagging and len(years) > 1:
+                    continue
+                picked = rng.sample(CATEGORY_POOL, min(categories, len(CATEGORY_POOL)))
+                for n in range(max(0, categories - len(CATEGORY_POOL))):
+                    picked.append((f"Additional Requirement {n + 1}", "other", False))
+                scopes.extend((major, category) for category in picked)
+            for major, (category_name, domain, required) in scopes:
+                minimum_required = rng.randint(1, courses_per_category) if required else 0
+                for k in range(courses_per_category):
+                    dvc_prefix, uc_prefix, titles = rng.choice(SUBJECTS[domain])
+                    number = rng.randint(100, 299)
+                    yield {
+                        "source_college": "DVC",
+                        "target_college": campus,
+                        "academic_year": year,
+                        "major": major,
+                        "category_name": category_name,
+                        "minimum_required": minimum_required,
+                        "is_required": minimum_required > 0,
+                        "domain": domain,
+                        "dvc_course_code": f"{dvc_prefix}-{number}",
+                        "dvc_course_title": f"{rng.choice(titles)} {'I' * (k % 3 + 1)}",
+                        "dvc_units": rng.choice((3, 4, 5)),
+                        "uc_course_code": f"{uc_prefix}-{rng.randint(1, 199)}{rng.choice(('', 'A', 'B'))}",
+                        "uc_course_title": rng.choice(titles),
+                        "uc_units": rng.choice((3, 4)),
+                    }
+
+
+def generate_chat_histories(
+    sessions: int,
+    messages_per_session: int = 10,
+    campuses: Optional[List[str]] = None,
+    seed: int = 0,
+) -> Iterator[Tuple[str, str, str, datetime]]:
+    """Yield (session_id, role, content, timestamp), alternating user/assistant turns."""
+    rng = random.Random(seed)
+    campuses = campuses or CAMPUS_POOL[:BASE_CAMPUSES]
+    start = datetime.utcnow() - timedelta(days=30)
+    for _ in range(sessions):
+        session_id = str(uuid.UUID(int=rng.getrandbits(128)))
+        at = start + timedelta(minutes=rng.randint(0, 30 * 24 * 60))
+        campus = rng.choice(campuses)
+        for n in range(messages_per_session):
+            at += timedelta(seconds=rng.randint(5, 120))
+            if n % 2 == 0:
+                if rng.random() < 0.3:
+                    campus = rng.choice(campuses)
+                yield session_id, "user", rng.choice(USER_PROMPTS).format(campus=campus), at
+            else:
+                rows = "\n".join(
+                    f"| COMSC-{rng.randint(100, 299)} | Programming Concepts | COMPSCI-{rng.randint(1, 99)} | 4.0 |"
+                    for _ in range(rng.randint(2, 12))
+                )
+                yield session_id, "assistant", f"## Transfer Preparation for {campus}\n\n{rows}", at
+
+
+def _names(value: Optional[str], generated) -> Optional[List[str]]:
+    """--campuses/--years/--majors value: a count of generated names, or a comma-separated list."""
+    if not value:
+        return None
+    if value.strip().isdigit():
+        return [generated(n) for n in range(max(1, int(value)))]
+    return [name.strip() for name in value.split(",") if name.strip()]
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Generate synthetic transfer rules and chat histories")
+    parser.add_argument("--scale", type=int, default=1, help="Approximate multiple of the data/archived row count")
+    parser.add_argument("--campuses", help="Campus count or list (e.g. 5 or UCB,UCD); overrides --scale")
+    parser.add_argument("--years", help="Academic year count or list (e.g. 3 or 2024-2025,2025-2026)")
+    parser.add_argument("--majors", help="Major count or list (e.g. 20 or \"Computer Science,Physics\")")
+    parser.add_argument("--categories", type=int, default=4, help="Categories per campus/year/major")
+    parser.add_argument("--courses-per-category", type=int, default=5)
+    parser.add_argument("--shared-categories", type=int, default=1, help="Campus-wide (NULL major) categories per year")
+    parser.add_argument("--lagging-majors", type=int, default=1, help="Majors not loaded for the newest year")
+    parser.add_argument("--sessions", type=int, default=0, help="Chat sessions to generate")
+    parser.add_argument("--messages-per-session", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--jsonl", metavar="PATH", help="Write rules (and messages) as JSONL to PATH")
+    parser.add_argument("--database-url", help="Load into this database instead (replaces the generated campus/years)")
+    args = parser.parse_args()
+
+    if not args.jsonl and not args.database_url:
+        parser.error("give --jsonl and/or --database-url")
+
+    profile = scale_profile(
+        args.scale,
+        args.categories,
+        args.courses_per_category,
+        campuses=_names(args.campuses, _campus_name),
+        years=_names(args.years, _year_name),
+        majors=_names(args.majors, _major_name),
+        shared_categories=args.shared_categories,
+        lagging_majors=args.lagging_majors,
+    )
+    print(
+        f"{len(profile['campuses'])} campuses × {len(profile['years'])} years × {len(profile['majors'])} majors "
+        f"× {profile['categories']} categories × {profile['courses_per_category']} courses "
+        f"(+{profile['shared_categories']} campus-wide, {len(profile['lagging_majors'])} lagging) "
+        f"= {profile_row_count(profile)} rules",
+        file=sys.stderr,
+    )
+
+    def rules():
+        return generate_transfer_rules(
+            profile["campuses"], profile["years"], profile["majors"],
+            profile["categories"], profile["courses_per_category"], seed=args.seed,
+            shared_categories=profile["shared_categories"], lagging_majors=profile["lagging_majors"],
+        )
+
+    def messages():
+        return generate_chat_histories(
+            args.sessions, args.messages_per_session, profile["campuses"], seed=args.seed,
+        )
+
+    if args.jsonl:
+        with open(args.jsonl, "w", encoding="utf-8") as f:
+            for row in rules():
+                f.write(json.dumps({"table": "transfer_rules", **row}) + "\n")
+            for session_id, role, content, at in messages():
+                f.write(json.dumps({
+                    "table": "chat_history", "session_id": session_id, "role": role,
+                    "content": content, "timestamp": at.isoformat(),
+                }) + "\n")
+        print(f"[OK] Wrote {args.jsonl}", file=sys.stderr)
+
+    if args.database_url:
+        from backend.database.repository import PostgresRepository
+
+        repo = PostgresRepository(args.database_url)
+        scopes = [
+            {"source_college": "DVC", "target_college": campus, "academic_year": year}
+            for campus in profile["campuses"] for year in profile["years"]
+        ]
+        stats = repo.bulk_load_transfer_rules(rules(), replace_scopes=scopes)
+        print(f"[OK] Loaded {stats['rows']} rules in {stats['seconds']}s ({stats['method']})", file=sys.stderr)
+        saved = 0
+        for session_id, role, content, at in messages():
+            repo._write_message(session_id, role, content, None, timestamp=at)
+            saved += 1
+        if saved:
+            print(f"[OK] Saved {saved} chat messages", file=sys.stderr)
+        repo.engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,43 +1,56 @@
 """
 Load JSON files from data/archived into assist_data table.
 This preserves the original JSON structure for simple querying.
+
+Files are hashed and parsed in parallel worker processes. Files whose content
+hash matches the last load (kept in sync_checksums) are skipped. Everything
+else is upserted in a single transaction. With --stream, files are parsed
+incrementally with ijson (optional dependency), one campus block at a time,
+so memory is bounded by the largest campus block rather than the file size.
 """
 
 import os
 import sys
 import json
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from dotenv import load_dotenv
 
+try:
+    import ijson
+except ImportError:  # optional: only needed for --stream
+    ijson = None
+
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from backend.database.repository import PostgresRepository
 
+JSON_DIR = Path("data/archived")
+CHECKSUM_SCOPE = "assist_json_files"
+_HASH_CHUNK_BYTES = 1024 * 1024
+
 
-def load_json_files():
-    """Load all JSON files from data/archived directory."""
-    json_dir = Path("data/archived")
-    
+def find_json_files(json_dir=JSON_DIR):
+    """List JSON files in data/archived, sorted by name."""
     if not json_dir.exists():
         print(f"❌ Directory not found: {json_dir}")
         return []
-    
-    files = []
-    for json_file in sorted(json_dir.glob("*.json")):
-        try:
-            with open(json_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                files.append((json_file.stem, data))
-                print(f"✅ Loaded {json_file.name}")
-        except Exception as e:
-            print(f"❌ Error loading {json_file.name}: {e}")
-    
-    return files
+    return sorted(json_dir.glob("*.json"))
+
+
+def hash_file(path):
+    """sha256 of the file contents, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK_BYTES), b""):
+            digest.update(chunk)
+    return str(path), digest.hexdigest()
 
 
 def parse_filename(filename):
     """
     Parse filename to extract campus and year.
-    Examples: 
+    Examples:
       - ucb_25-26.json -> (UCB, 2025-2026)
       - ucd_24-25.json -> (UCD, 2024-2025)
     """
@@ -45,7 +58,7 @@ def parse_filename(filename):
     if len(parts) >= 2:
         campus = parts[0].upper()
         year_raw = parts[1]
-        
+
         # Convert 25-26 to 2025-2026
         year_parts = year_raw.split('-')
         if len(year_parts) == 2:
@@ -54,72 +67,142 @@ def parse_filename(filename):
             year = f"{start_year}-{end_year}"
         else:
             year = year_raw
-        
+
         return campus, year
     return None, None
 
 
+def _campus_blocks(path, stream=False):
+    """Yield (campus_name, campus_data) top-level entries of one file."""
+    with open(path, "rb") as f:
+        if stream:
+            # use_float keeps Units as float instead of Decimal so the JSON column can serialize them
+            yield from ijson.kvitems(f, "", use_float=True)
+        else:
+            yield from json.load(f).items()
+
+
+def iter_records(path, stream=False):
+    """
+    Yield assist_data records for one file.
+    The JSON structure is: { "Berkeley": [...], "Davis": [...], etc }
+    We store the entire campus array as the JSON.
+    """
+    campus, file_year = parse_filename(Path(path).stem)
+    for campus_name, campus_data in _campus_blocks(path, stream):
+        # Extract year from first element if present
+        year = file_year
+        if campus_data and isinstance(campus_data, list):
+            first_elem = campus_data[0]
+            if isinstance(first_elem, dict) and "Year" in first_elem:
+                year = first_elem["Year"]
+
+        yield {
+            "source_college": "DVC",
+            "target_college": campus,
+            "major": None,  # General education/all majors
+            "agreements_json": {
+                "campus_name": campus_name,
+                "year": year,
+                "categories": campus_data,
+            },
+        }
+
+
+def parse_file(path):
+    """Worker: parse one file into its records. Returns (path, records, error)."""
+    try:
+        return path, list(iter_records(path)), None
+    except Exception as e:
+        return path, [], str(e)
+
+
 def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Load data/archived JSON files into assist_data")
+    parser.add_argument("--force", action="store_true", help="Reload files even if their content hash is unchanged")
+    parser.add_argument("--stream", action="store_true", help="Parse incrementally with ijson (bounded memory for huge exports)")
+    parser.add_argument("--jobs", "-j", type=int, default=None, help="Worker processes (default: CPU count)")
+    args = parser.parse_args()
+
+    if args.stream and ijson is None:
+        print("❌ --stream requires ijson (pip install ijson)")
+        sys.exit(1)
+
     load_dotenv()
     database_url = os.getenv("DATABASE_URL")
-    
+
     if not database_url:
         print("❌ DATABASE_URL not found in environment")
         sys.exit(1)
-    
+
     print("="*60)
     print("  Loading JSON files into assist_data table")
     print("="*60)
-    
-    # Load JSON files
-    files = load_json_files()
-    if not files:
+
+    paths = []
+    for path in find_json_files():
+        if parse_filename(path.stem)[0]:
+            paths.append(str(path))
+        else:
+            print(f"⚠️  Skipping {path.name} (couldn't parse filename)")
+    if not paths:
         print("❌ No JSON files found")
         sys.exit(1)
-    
-    print(f"\n📦 Found {len(files)} JSON file(s)")
-    
+
+    print(f"\n📦 Found {len(paths)} JSON file(s)")
+
     # Connect to database
     print("\n🔗 Connecting to database...")
     repo = PostgresRepository(database_url)
-    
-    # Load data into assist_data table
-    print("\n💾 Saving to assist_data table...\n")
-    
-    for filename, data in files:
-        campus, year = parse_filename(filename)
-        
-        if not campus:
-            print(f"⚠️  Skipping {filename} (couldn't parse filename)")
-            continue
-        
-        # The JSON structure is: { "Berkeley": [...], "Davis": [...], etc }
-        # We store the entire campus array as the JSON
-        for campus_name, campus_data in data.items():
-            # Extract year from first element if present
-            if campus_data and isinstance(campus_data, list) and len(campus_data) > 0:
-                first_elem = campus_data[0]
-                if isinstance(first_elem, dict) and "Year" in first_elem:
-                    year = first_elem["Year"]
-            
-            # Save to assist_data
-            saved = repo.save_assist_data(
-                source_college="DVC",
-                target_college=campus,
-                major=None,  # General education/all majors
-                agreements_json={
-                    "campus_name": campus_name,
-                    "year": year,
-                    "categories": campus_data
-                }
-            )
-            
-            print(f"  ✅ {campus} ({year}): {len(campus_data)} categories")
-    
+    known = {} if args.force else repo.get_sync_checksums(CHECKSUM_SCOPE)
+
+    with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+        hashes = dict(pool.map(hash_file, paths))
+        changed = []
+        for path in paths:
+            if known.get(Path(path).name) == hashes[path]:
+                print(f"⏭️  Unchanged {Path(path).name}")
+            else:
+                changed.append(path)
+
+        if not changed:
+            print("\n✅ All files unchanged since last load")
+            return
+
+        print(f"\n💾 Upserting {len(changed)} changed file(s) into assist_data...\n")
+        checksums = []
+        if args.stream:
+            # Parsed lazily in this process while the upsert consumes them.
+            records = (record for path in changed for record in iter_records(path, stream=True))
+            checksums = [
+                {"scope": CHECKSUM_SCOPE, "source_key": Path(path).name, "content_hash": hashes[path]}
+                for path in changed
+            ]
+        else:
+            records = []
+            for path, file_records, error in pool.map(parse_file, changed):
+                if error:
+                    print(f"❌ Error loading {Path(path).name}: {error}")
+                    continue
+                records.extend(file_records)
+                checksums.append({
+                    "scope": CHECKSUM_SCOPE,
+                    "source_key": Path(path).name,
+                    "content_hash": hashes[path],
+                    "row_count": len(file_records),
+                })
+                for record in file_records:
+                    payload = record["agreements_json"]
+                    print(f"  ✅ {record['target_college']} ({payload['year']}): {len(payload['categories'])} categories")
+
+    saved = repo.upsert_assist_data(records, checksums=checksums)
+
     print("\n" + "="*60)
-    print("  ✅ Data loaded successfully!")
+    print(f"  ✅ {saved} record(s) loaded successfully!")
     print("="*60)
-    
+
     # Show summary
     print("\n📊 Database Summary:")
     all_data = repo.get_assist_data()
@@ -3,11 +3,21 @@ One-time migration: assist_data (JSON in PostgreSQL) -> transfer_rules rows.
 
 This script does NOT read local JSON files. It only reads existing database rows
 from assist_data and writes normalized SQL rows into transfer_rules.
+
+With --incremental, a content hash of each assist_data record is kept in
+sync_checksums. Unchanged records are skipped and changed ones are diffed
+against their current transfer_rules, so only affected rows are written.
+
+Running web workers cache transfer rules in memory. Both modes bump the catalog
+version row in sync_checksums, and workers check it on each course lookup, so
+they see the new rules on their next request. Edits made outside the repository
+(plain SQL) are only seen once CATALOG_CACHE_SECONDS has passed.
 """
 
+import hashlib
+import json
 import os
 import sys
-from datetime import datetime
 from decimal import Decimal
 from typing import Dict, List, Tuple
 
@@ -16,7 +26,7 @@ from sqlalchemy.orm import Session
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from backend.database.models import AssistData, TransferRule  # noqa: E402
+from backend.database.models import AssistData  # noqa: E402
 from backend.database.repository import PostgresRepository  # noqa: E402
 
 
@@ -122,10 +132,47 @@ def _iter_transfer_rows(repo: PostgresRepository, record: AssistData) -> List[Di
     return rows
 
 
-def migrate(repo: PostgresRepository, dry_run: bool = False) -> Tuple[int, int]:
-    """Return (assist_records, inserted_rows)."""
-    inserted_rows = 0
+def _dedupe_rows(rows: List[Dict]) -> List[Dict]:
+    seen = set()
+    unique = []
+    for row in rows:
+        dedupe = (
+            row["source_college"],
+            row["target_college"],
+            row["academic_year"],
+            row.get("major") or "",
+            row["category_name"],
+            row["dvc_course_code"],
+            row.get("uc_course_code") or "",
+        )
+        if dedupe in seen:
+            continue
+        seen.add(dedupe)
+        unique.append(row)
+    return unique
+
+
+CHECKSUM_SCOPE = "assist_to_transfer_rules"
+# Bump when _iter_transfer_rows changes so every record is re-diffed once.
+ROW_FORMAT_VERSION = 1
+
 
+def _source_key(rec: AssistData) -> str:
+    return f"{rec.source_college}|{rec.target_college}|{rec.major or ''}"
+
+
+def _record_hash(rec: AssistData) -> str:
+    payload = json.dumps(
+        {"v": ROW_FORMAT_VERSION, "agreements": rec.agreements_json or {}},
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _latest_records(repo: PostgresRepository) -> List[AssistData]:
+    """Newest assist_data record per (source, target, major)."""
     with Session(repo.engine) as session:
         records = (
             session.query(AssistData)
@@ -133,73 +180,72 @@ def migrate(repo: PostgresRepository, dry_run: bool = False) -> Tuple[int, int]:
             .all()
         )
 
-        if not records:
-            return 0, 0
-
-        latest_by_campus = {}
-        for rec in records:
-            key = (rec.source_college, rec.target_college, rec.major)
-            if key not in latest_by_campus:
-                latest_by_campus[key] = rec
-
-        selected = list(latest_by_campus.values())
-
-        now = datetime.utcnow()
-        for rec in selected:
-            rows = _iter_transfer_rows(repo, rec)
-
-            if dry_run:
-                inserted_rows += len(rows)
-                continue
-
-            session.query(TransferRule).filter_by(
-                source_college=rec.source_college,
-                target_college=rec.target_college,
-                major=rec.major,
-            ).delete()
-
-            seen = set()
-            for row in rows:
-                dedupe = (
-                    row["source_college"],
-                    row["target_college"],
-                    row["academic_year"],
-                    row.get("major") or "",
-                    row["category_name"],
-                    row["dvc_course_code"],
-                    row.get("uc_course_code") or "",
-                )
-                if dedupe in seen:
-                    continue
-                seen.add(dedupe)
-
-                session.add(
-                    TransferRule(
-                        source_college=row["source_college"],
-                        target_college=row["target_college"],
-                        academic_year=row["academic_year"],
-                        major=row.get("major"),
-                        category_name=row["category_name"],
-                        minimum_required=row["minimum_required"],
-                        is_required=row["is_required"],
-                        domain=row["domain"],
-                        dvc_course_code=row["dvc_course_code"],
-                        dvc_course_title=row["dvc_course_title"],
-                        dvc_units=row["dvc_units"],
-                        uc_course_code=row["uc_course_code"],
-                        uc_course_title=row["uc_course_title"],
-                        uc_units=row["uc_units"],
-                        created_at=now,
-                        updated_at=now,
-                    )
-                )
+    latest_by_campus = {}
+    for rec in records:
+        key = (rec.source_college, rec.target_college, rec.major)
+        if key not in latest_by_campus:
+            latest_by_campus[key] = rec
+    return list(latest_by_campus.values())
+
+
+def migrate(repo: PostgresRepository, dry_run: bool = False) -> Tuple[int, int, Dict]:
+    """Full reload. Return (assist_records, inserted_rows, bulk_load_stats)."""
+    selected = _latest_records(repo)
+    if not selected:
+        return 0, 0, {}
+
+    rows_by_record = [(rec, _dedupe_rows(_iter_transfer_rows(repo, rec))) for rec in selected]
+    rows = [row for _, record_rows in rows_by_record for row in record_rows]
+
+    if dry_run:
+        return len(selected), len(rows), {}
+
+    # One transaction: clear each migrated campus/major, then bulk insert.
+    stats = repo.bulk_load_transfer_rules(
+        rows,
+        replace_scopes=[
+            {"source_college": rec.source_college, "target_college": rec.target_college, "major": rec.major}
+            for rec in selected
+        ],
+    )
+    # Record hashes so a later --incremental run can skip these records.
+    for rec, record_rows in rows_by_record:
+        repo.save_sync_checksum(CHECKSUM_SCOPE, _source_key(rec), _record_hash(rec), len(record_rows))
+    return len(selected), stats["rows"], stats
+
+
+def migrate_incremental(repo: PostgresRepository, dry_run: bool = False) -> Tuple[int, int, Dict]:
+    """
+    Only migrate records whose content hash changed since the last run.
+    Return (changed_records, skipped_records, {"inserted", "updated", "deleted", "unchanged"}).
+    """
+    selected = _latest_records(repo)
+    known = repo.get_sync_checksums(CHECKSUM_SCOPE)
+    totals = {"inserted": 0, "updated": 0, "deleted": 0, "unchanged": 0}
+    changed = skipped = 0
+
+    for rec in selected:
+        source_key = _source_key(rec)
+        content_hash = _record_hash(rec)
+        if known.get(source_key) == content_hash:
+            skipped += 1
+            continue
 
-            inserted_rows += len(seen)
+        changed += 1
+        rows = _dedupe_rows(_iter_transfer_rows(repo, rec))
+        if dry_run:
+            totals["inserted"] += len(rows)  # upper bound; the diff needs a write transaction
+            continue
 
-        if not dry_run:
-            session.commit()
+        stats = repo.sync_transfer_rules(
+            {"source_college": rec.source_college, "target_college": rec.target_college, "major": rec.major},
+            rows,
+            checksum={"scope": CHECKSUM_SCOPE, "source_key": source_key, "content_hash": content_hash},
+        )
+        for key, value in stats.items():
+            totals[key] += value
 
-    return len(selected), inserted_rows
+    return changed, skipped, totals
 
 
 def main():
@@ -207,6 +253,11 @@ def main():
 
     parser = argparse.ArgumentParser(description="Migrate assist_data JSON rows into transfer_rules")
     parser.add_argument("--dry-run", action="store_true", help="Show row counts without writing")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Skip records unchanged since the last run and write only the rows that differ",
+    )
     args = parser.parse_args()
 
     load_dotenv()
@@ -217,7 +268,21 @@ def main():
 
     repo = PostgresRepository(database_url)
 
-    assist_count, row_count = migrate(repo, dry_run=args.dry_run)
+    if args.incremental:
+        changed, skipped, totals = migrate_incremental(repo, dry_run=args.dry_run)
+        mode = "DRY RUN (INCREMENTAL)" if args.dry_run else "INCREMENTAL MIGRATION COMPLETE"
+        print("=" * 60)
+        print(f"{mode}")
+        print("=" * 60)
+        print(f"AssistData records changed:   {changed}")
+        print(f"AssistData records skipped:   {skipped}")
+        print(
+            f"TransferRule rows: +{totals['inserted']} ~{totals['updated']} "
+            f"-{totals['deleted']} ={totals['unchanged']}"
+        )
+        return
+
+    assist_count, row_count, stats = migrate(repo, dry_run=args.dry_run)
 
     mode = "DRY RUN" if args.dry_run else "MIGRATION COMPLETE"
     print("=" * 60)
@@ -225,6 +290,8 @@ def main():
     print("=" * 60)
     print(f"AssistData records processed: {assist_count}")
     print(f"TransferRule rows generated:  {row_count}")
+    if stats:
+        print(f"Load: {stats['seconds']}s via {stats['method']} ({stats['rows_per_sec']:.0f} rows/sec)")
 
 
 if __name__ == "__main__":
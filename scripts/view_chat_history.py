@@ -21,21 +21,30 @@ def show_chat_history(repo, session_id=None, days=1):
         print(f"  Chat History for Session: {session_id}")
         print(f"{'='*60}")
         
-        messages = repo.get_chat_history(session_id)
+        transcript = repo.get_transcript(session_id)
+        if transcript is not None:
+            messages = [
+                (m["role"], m["content"], datetime.fromisoformat(m["timestamp"]))
+                for m in transcript["messages"]
+            ]
+        else:
+            messages = [(m.role, m.content, m.timestamp) for m in repo.get_chat_history(session_id)]
         
         if not messages:
             print(f"❌ No messages found for session: {session_id}")
             return
         
         print(f"\n📊 Total messages: {len(messages)}\n")
+        if transcript and transcript["state"]:
+            print(f"🧭 State: {transcript['state']}\n")
         
-        for msg in messages:
-            icon = "👤" if msg.role == "user" else "🤖"
-            color = "\033[96m" if msg.role == "user" else "\033[92m"
+        for role, content, timestamp in messages:
+            icon = "👤" if role == "user" else "🤖"
+            color = "\033[96m" if role == "user" else "\033[92m"
             reset = "\033[0m"
             
-            print(f"{icon} {color}[{msg.timestamp:%Y-%m-%d %H:%M:%S}] {msg.role.upper()}{reset}")
-            print(f"   {msg.content[:200]}{'...' if len(msg.content) > 200 else ''}")
+            print(f"{icon} {color}[{timestamp:%Y-%m-%d %H:%M:%S}] {role.upper()}{reset}")
+            print(f"   {content[:200]}{'...' if len(content) > 200 else ''}")
             print()
     
     else:
@@ -44,26 +53,29 @@ def show_chat_history(repo, session_id=None, days=1):
         print(f"  Recent Sessions (Last {days} day(s))")
         print(f"{'='*60}\n")
         
-        sessions = repo.get_recent_sessions(days=days)
-        
+        # One grouped query per page instead of loading every message per session
+        sessions = []
+        cursor = None
+        while True:
+            page = repo.get_session_summaries(days=days, limit=500, cursor=cursor)
+            sessions.extend(page["sessions"])
+            cursor = page["next_cursor"]
+            if not cursor:
+                break
+
         if not sessions:
             print(f"❌ No sessions found in the last {days} day(s)")
             return
-        
+
         print(f"📊 Found {len(sessions)} active session(s):\n")
-        
-        for sess_id in sessions:
-            messages = repo.get_chat_history(sess_id)
-            first_msg = messages[0] if messages else None
-            last_msg = messages[-1] if messages else None
-            
-            print(f"  🆔 {sess_id}")
-            print(f"     Messages: {len(messages)}")
-            if first_msg:
-                print(f"     Started: {first_msg.timestamp:%Y-%m-%d %H:%M:%S}")
-                print(f"     First message: {first_msg.content[:60]}...")
-            if last_msg and len(messages) > 1:
-                print(f"     Last: {last_msg.timestamp:%Y-%m-%d %H:%M:%S}")
+
+        for summary in sessions:
+            print(f"  🆔 {summary['session_id']}")
+            print(f"     Messages: {summary['message_count']}")
+            print(f"     Started: {summary['started_at']:%Y-%m-%d %H:%M:%S}")
+            print(f"     First message: {summary['preview']}...")
+            if summary["message_count"] > 1:
+                print(f"     Last: {summary['last_at']:%Y-%m-%d %H:%M:%S}")
             print()
 
 
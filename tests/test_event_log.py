@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+"""
+Event log writer: a failed append is reported through logging and retried,
+not dropped.
+"""
+
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import log_writer  # noqa: E402
+from log_writer import EventLog, iter_events  # noqa: E402
+
+
+def test_failed_batch_is_retried(tmp_path, monkeypatch, caplog):
+    real_write = os.write
+    failures = iter([OSError(28, "No space left on device")] * 2)
+
+    def flaky_write(fd, payload):
+        exc = next(failures, None)
+        if exc is not None:
+            raise exc
+        return real_write(fd, payload)
+
+    monkeypatch.setattr(log_writer.os, "write", flaky_write)
+    event_log = EventLog(str(tmp_path), flush_interval=0.01)
+    with caplog.at_level(logging.ERROR, logger="log_writer"):
+        for n in range(3):
+            event_log.log({"n": n})
+        event_log.flush(timeout=5)
+        event_log.close()
+
+    assert [entry["n"] for entry in iter_events(str(tmp_path))] == [0, 1, 2]
+    assert "event_log_write_failed" in caplog.text
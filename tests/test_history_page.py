@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+History pages: the keyset continues from the hot table into the archive table
+when a session has both, and the reads behind the /history and /admin/sessions
+endpoints run under the database health breaker, so an open circuit surfaces as
+CircuitOpenError (503) rather than a connection timeout per request.
+"""
+
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.database.repository import PostgresRepository  # noqa: E402
+from backend.resilience import OPEN, CircuitOpenError  # noqa: E402
+
+
+def test_history_reads_fail_fast_while_the_circuit_is_open(tmp_path):
+    repo = PostgresRepository(f"sqlite:///{tmp_path / 'chat.db'}")
+    repo.save_message("s1", "user", "what about UC Davis?")
+    repo.breaker.state = OPEN
+
+    with pytest.raises(CircuitOpenError):
+        repo.get_transcript_version("s1")
+    with pytest.raises(CircuitOpenError):
+        repo.get_chat_history_page("s1")
+    with pytest.raises(CircuitOpenError):
+        repo.get_session_summaries()
+
+
+def test_history_page_continues_into_the_archive(tmp_path):
+    repo = PostgresRepository(f"sqlite:///{tmp_path / 'chat.db'}")
+    for n in range(5):
+        repo.save_message("s1", "user", f"old {n}")
+    repo.move_sessions_to_archive_table(["s1"], datetime.utcnow() + timedelta(seconds=1))
+    for n in range(3):
+        repo.save_message("s1", "user", f"new {n}")
+
+    pages, before = [], None
+    while True:
+        page = repo.get_chat_history_page("s1", limit=4, before=before)
+        pages.append([m["content"] for m in page["messages"]])
+        before = page["next_cursor"]
+        if not before:
+            break
+
+    assert pages == [["old 4", "new 0", "new 1", "new 2"], ["old 0", "old 1", "old 2", "old 3"]]
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+Major extraction: a major only counts when the message states one, and the
+short aliases that are also plain words ("me", "ee") need a determiner.
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.entity_extractor import extract_entities, message_entities  # noqa: E402
+
+
+@pytest.mark.parametrize("text", [
+    "give me major requirements for UCB",
+    "show me major courses at berkeley",
+    "tell me majors at ucd",
+    "show me major prep for UCD",
+    "what ee courses transfer to UCLA?",
+])
+def test_no_major_without_one_being_stated(text):
+    assert extract_entities(text).majors == ()
+    assert "majors" not in message_entities(text)
+
+
+@pytest.mark.parametrize("text, majors", [
+    ("I'm an EE major, what do I need for UCB?", ("Electrical Engineering",)),
+    ("as my ME major, show me the requirements", ("Mechanical Engineering",)),
+    ("I'm a cs major transferring to UCD", ("Computer Science",)),
+    ("majoring in applied math at UCSD", ("Applied Mathematics",)),
+])
+def test_stated_majors(text, majors):
+    assert extract_entities(text).majors == majors
+    assert message_entities(text)["majors"] == list(majors)
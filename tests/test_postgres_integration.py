@@ -3,6 +3,7 @@
 Quick test of PostgreSQL integration by calling ai_agent.py directly
 """
 
+import json
 import subprocess
 import sys
 
@@ -14,24 +15,38 @@ test_queries = [
 
 print("=== Testing PostgreSQL Integration ===\n")
 
+# One process for all queries: imports, the OpenAI client and the engine are set up once.
+batch_input = "".join(json.dumps({"id": i, "prompt": query}) + "\n" for i, query in enumerate(test_queries, 1))
+result = subprocess.run(
+    [sys.executable, "backend/ai_agent.py", "--batch", "-"],
+    input=batch_input,
+    capture_output=True,
+    text=True,
+    cwd="."
+)
+
+# Only stdout carries results (one JSON line per query); logs go to stderr
+results = {}
+for line in result.stdout.splitlines():
+    try:
+        record = json.loads(line)
+    except json.JSONDecodeError:
+        print(line)
+        continue
+    results[record.get("id")] = record
+
 for i, query in enumerate(test_queries, 1):
     print(f"Test {i}: {query}")
     print("-" * 60)
-    
-    result = subprocess.run(
-        [sys.executable, "backend/ai_agent.py", query],
-        capture_output=True,
-        text=True,
-        cwd="."
-    )
-    
-    # Filter out stderr (logs) and only show stdout (response)
-    if result.stdout:
-        print(result.stdout)
-    
-    if result.returncode != 0:
-        print(f"❌ Error: {result.stderr}")
+
+    record = results.get(i)
+    if record is None:
+        print(f"❌ Error: no result\n{result.stderr}")
+    elif record.get("error"):
+        print(f"❌ Error: {record['error']}")
     else:
+        print(record.get("response", ""))
+        print(f"⏱️  {record.get('timings_ms')}")
         print("✅ Success\n")
 
 print("=== All Tests Complete ===")
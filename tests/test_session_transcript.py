@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Session transcripts keep a capped window of recent messages (large bodies by
+hash), while get_transcript still returns the whole conversation on request.
+"""
+
+import os
+import sys
+import zlib
+
+from sqlalchemy.orm import Session
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.database import repository  # noqa: E402
+from backend.database.models import SessionTranscript  # noqa: E402
+from backend.database.repository import PostgresRepository  # noqa: E402
+
+
+def test_transcript_keeps_a_window_and_reads_older_messages(tmp_path, monkeypatch):
+    monkeypatch.setattr(repository, "TRANSCRIPT_WINDOW_MESSAGES", 4)
+    repo = PostgresRepository(f"sqlite:///{tmp_path / 'chat.db'}")
+    table = "| COMSC-110 | Programming Concepts | COMPSCI-10 | 4.0 |\n" * 40
+    for n in range(5):
+        repo.save_message("s1", "user", f"question {n} for UC Davis")
+        repo.save_message("s1", "assistant", f"{table}answer {n}")
+
+    with Session(repo.engine) as session:
+        row = session.get(SessionTranscript, "s1")
+        stored = zlib.decompress(row.messages).decode("utf-8")
+        assert row.message_count == 10
+    # only the window is stored, and the repeated table body only as a hash
+    assert "question 2" not in stored and "question 3" in stored
+    assert "Programming Concepts" not in stored
+
+    recent = repo.get_transcript("s1", limit=2)
+    assert [m["content"] for m in recent["messages"]] == ["question 4 for UC Davis", f"{table}answer 4"]
+    assert recent["context"]["campuses"] == ["UCD"]
+
+    whole = repo.get_transcript("s1")
+    assert whole["message_count"] == 10
+    assert [m["content"] for m in whole["messages"][::2]] == [f"question {n} for UC Davis" for n in range(5)]
+
+
+def test_parser_summary_covers_only_older_turns(tmp_path, monkeypatch):
+    from backend import ai_agent
+
+    monkeypatch.setattr(repository, "TRANSCRIPT_WINDOW_MESSAGES", 4)
+    repo = PostgresRepository(f"sqlite:///{tmp_path / 'chat.db'}")
+    in_memory = []
+    turns = ["I'm a cs major looking at UC Davis", "only required courses", "I completed COMSC 110",
+             "what about UC Berkeley?", "show math only", "what about UCLA?"]
+    for n, prompt in enumerate(turns):
+        for role, content in (("user", prompt), ("assistant", f"answer {n}")):
+            repo.save_message("s1", role, content)
+            in_memory.append({"role": role, "content": content})
+
+    # the persisted window (and the context before it) gives the same prompt as the whole in-memory history
+    history, _, history_context = ai_agent._load_persisted_history(repo, "s1", limit=3)
+    persisted = ai_agent._parser_messages("and UCSD?", history, history_context)
+    assert persisted == ai_agent._parser_messages("and UCSD?", in_memory)
+    summary = persisted[1]["content"]
+    assert '"user_turns":5' in summary and '"campuses":["UCB"]' in summary
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Spill replay: messages a worker parked while the database was down are written
+back by whichever worker starts (or recovers) next, not only by the one that
+spilled them, and a claimed file is never replayed twice.
+"""
+
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.database import repository  # noqa: E402
+from backend.database.repository import PostgresRepository  # noqa: E402
+
+DEAD_PID = 4_000_000  # above Linux pid_max
+
+
+def _spill(path, *entries):
+    with open(path, "w", encoding="utf-8") as f:
+        for session_id, content, timestamp in entries:
+            f.write(json.dumps({
+                "session_id": session_id, "role": "user", "content": content, "state": None, "timestamp": timestamp,
+            }) + "\n")
+
+
+def test_startup_replays_other_workers_spills(tmp_path, monkeypatch):
+    spill_dir = tmp_path / "spill"
+    spill_dir.mkdir()
+    monkeypatch.setattr(repository, "DB_SPILL_DIR", str(spill_dir))
+    # a worker that exited before replaying, and a replayer that died mid-claim
+    _spill(spill_dir / "chat_spill-101.jsonl",
+           ("s1", "what about UC Davis?", "2026-10-19T10:00:02"))
+    _spill(spill_dir / f"chat_spill-102.jsonl.claimed-{DEAD_PID}",
+           ("s1", "classes for UC Berkeley", "2026-10-19T10:00:01"),
+           ("s2", "math for UCSD", "2026-10-19T10:00:03"))
+
+    repo = PostgresRepository(f"sqlite:///{tmp_path / 'chat.db'}")
+
+    assert [m.content for m in repo.get_chat_history("s1")] == ["classes for UC Berkeley", "what about UC Davis?"]
+    assert [m.content for m in repo.get_chat_history("s2")] == ["math for UCSD"]
+    assert sorted(os.listdir(spill_dir)) == [".lock"]
+
+
+def test_live_workers_claims_are_left_alone(tmp_path, monkeypatch):
+    spill_dir = tmp_path / "spill"
+    spill_dir.mkdir()
+    monkeypatch.setattr(repository, "DB_SPILL_DIR", str(spill_dir))
+    claimed = spill_dir / f"chat_spill-103.jsonl.claimed-{os.getppid()}"
+    _spill(claimed, ("s3", "what about UCLA?", "2026-10-19T10:00:04"))
+
+    repo = PostgresRepository(f"sqlite:///{tmp_path / 'chat.db'}")
+
+    assert repo.get_chat_history("s3") == []
+    assert claimed.exists()
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Year-aware retrieval: get_courses() reads one academic year, and its query is
+answered from idx_transfer_retrieval in index order (checked with EXPLAIN QUERY
+PLAN on SQLite; on PostgreSQL the same index is covering via INCLUDE).
+"""
+
+import os
+import sys
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.database.models import TransferRule  # noqa: E402
+from backend.database.repository import PostgresRepository  # noqa: E402
+
+
+def _rule(campus, year, category, code, **extra):
+    return TransferRule(
+        source_college="DVC",
+        target_college=campus,
+        academic_year=year,
+        category_name=category,
+        dvc_course_code=code,
+        dvc_course_title=f"{code} title",
+        domain="other",
+        **extra,
+    )
+
+
+def _repo(tmp_path):
+    repo = PostgresRepository(f"sqlite:///{tmp_path / 'rules.db'}")
+    with Session(repo.engine) as session:
+        session.add_all([
+            _rule("UCB", "2024-2025", "Major Preparation", "COMSC-110"),
+            _rule("UCB", "2025-2026", "Major Preparation", "COMSC-165"),
+            _rule("UCB", "2025-2026", "Breadth", "ENGL-122"),
+            _rule("UCD", "2024-2025", "Major Preparation", "MATH-192"),
+        ])
+        # enough rows that the planner has a reason to pick an index at all
+        session.add_all(
+            _rule(campus, f"20{y}-20{y + 1}", f"Category {i % 7}", f"XX-{i}")
+            for campus in ("UCSD", "UCLA")
+            for y in range(10, 20)
+            for i in range(20)
+        )
+        session.commit()
+        session.execute(text("ANALYZE"))
+    return repo
+
+
+def test_get_courses_defaults_to_latest_year_per_campus(tmp_path):
+    repo = _repo(tmp_path)
+
+    latest = repo.get_courses(["UCB", "UCD"])
+    assert [c["dvc_code"] for c in latest["UCB"]] == ["ENGL-122", "COMSC-165"]
+    assert [c["dvc_code"] for c in latest["UCD"]] == ["MATH-192"]
+
+    older = repo.get_courses(["UCB"], academic_year="2024-2025")
+    assert [c["dvc_code"] for c in older["UCB"]] == ["COMSC-110"]
+
+
+def test_retrieval_plan_uses_ordered_index_scan(tmp_path):
+    repo = _repo(tmp_path)
+
+    for academic_year in ("2025-2026", None):
+        with Session(repo.engine) as session:
+            statement = repo._campus_rules_query(session, "UCB", academic_year).statement
+            sql = str(statement.compile(repo.engine, compile_kwargs={"literal_binds": True}))
+            plan = [row[-1] for row in session.execute(text("EXPLAIN QUERY PLAN " + sql))]
+
+        assert any("USING INDEX idx_transfer_retrieval" in step for step in plan), plan
+        # rows come back in index order: no separate sort step
+        assert not any("TEMP B-TREE" in step for step in plan), plan
+
+
+def test_get_courses_filters_by_major_with_shared_rows(tmp_path):
+    repo = _repo(tmp_path)
+    repo.bulk_load_transfer_rules([
+        {"target_college": "UCD", "academic_year": "2024-2025", "major": "Computer Science",
+         "category_name": "Major Preparation", "dvc_course_code": "COMSC-200"},
+        {"target_college": "UCD", "academic_year": "2024-2025", "major": "Physics",
+         "category_name": "Major Preparation", "dvc_course_code": "PHYS-130"},
+    ])
+
+    # the NULL-major rule (MATH-192) is shared by every major
+    cs = repo.get_courses(["UCD"], majors=["Computer Science"])
+    assert [c["dvc_code"] for c in cs["UCD"]] == ["COMSC-200", "MATH-192"]
+    both = repo.get_courses(["UCD"], majors=["Computer Science", "Physics"])
+    assert [c["dvc_code"] for c in both["UCD"]] == ["COMSC-200", "MATH-192", "PHYS-130"]
+    # a major the campus has no rules for doesn't hide the campus's rules
+    unknown = repo.get_courses(["UCD"], majors=["Art History"])
+    assert len(unknown["UCD"]) == 3
+    assert repo.get_majors("UCD") == ["Computer Science", "Physics"]
+
+
+def test_major_lookup_plan_seeks_on_major(tmp_path):
+    repo = _repo(tmp_path)
+
+    for major, academic_year in [(m, y) for m in ("Computer Science", None) for y in ("2025-2026", None)]:
+        with Session(repo.engine) as session:
+            statement = repo._campus_rules_query(session, "UCB", academic_year, major).statement
+            sql = str(statement.compile(repo.engine, compile_kwargs={"literal_binds": True}))
+            plan = [row[-1] for row in session.execute(text("EXPLAIN QUERY PLAN " + sql))]
+
+        # one major's rows are found by index, not by scanning every major of the campus
+        assert any("major=?" in step for step in plan), plan
+        assert not any("TEMP B-TREE" in step for step in plan), plan
+
+
+def test_major_partition_uses_the_majors_latest_year(tmp_path):
+    repo = _repo(tmp_path)
+    repo.bulk_load_transfer_rules([
+        {"target_college": "UCD", "academic_year": "2024-2025", "major": "Computer Science",
+         "category_name": "Major Preparation", "dvc_course_code": "COMSC-200"},
+        {"target_college": "UCD", "academic_year": "2025-2026", "major": "Physics",
+         "category_name": "Major Preparation", "dvc_course_code": "PHYS-130"},
+    ])
+
+    # CS is only loaded for 2024-2025: its rules and that year's shared rules, not Physics
+    cs = repo.get_courses(["UCD"], majors=["Computer Science"])
+    assert [c["dvc_code"] for c in cs["UCD"]] == ["COMSC-200", "MATH-192"]
+    physics = repo.get_courses(["UCD"], majors=["Physics"])
+    assert [c["dvc_code"] for c in physics["UCD"]] == ["PHYS-130"]
+    # without a major the campus-wide latest year still applies
+    assert [c["dvc_code"] for c in repo.get_courses(["UCD"])["UCD"]] == ["PHYS-130"]
+
+
+def test_unknown_majors_do_not_grow_the_catalog_cache(tmp_path, monkeypatch):
+    from backend.database import repository
+
+    monkeypatch.setattr(repository, "CATALOG_CACHE_MAX_ENTRIES", 8)
+    repo = _repo(tmp_path)
+    for n in range(200):
+        repo.get_courses(["UCD"], majors=[f"Made Up Major {n}"])
+    # the ALL partition and the campus's major list, nothing per unknown name
+    assert len(repo._catalog_cache) == 2
+
+    for n in range(20):
+        repo.get_courses(["UCB", "UCD"], academic_year=f"20{n}-20{n + 1}")
+    assert len(repo._catalog_cache) <= 8
+
+
+def test_loads_from_another_process_drop_the_cache(tmp_path):
+    repo = _repo(tmp_path)
+    assert [c["dvc_code"] for c in repo.get_courses(["UCD"])["UCD"]] == ["MATH-192"]
+
+    # e.g. the migrate script, with its own repository and cache
+    loader = PostgresRepository(f"sqlite:///{tmp_path / 'rules.db'}")
+    loader.bulk_load_transfer_rules(
+        [{"target_college": "UCD", "academic_year": "2024-2025",
+          "category_name": "Major Preparation", "dvc_course_code": "MATH-193"}],
+    )
+
+    assert [c["dvc_code"] for c in repo.get_courses(["UCD"])["UCD"]] == ["MATH-192", "MATH-193"]